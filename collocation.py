@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+搭配统计 - 节点词 ±N 字窗口内的字/词搭配强度（对数似然、t值、互信息）
+
+解决问题：
+想知道 '震怒'、'廷杖' 周围经常出现什么，只能逐条读上下文，没有任何量化的搭配统计
+
+方法：
+1. 节点词的全部出现位置取自共享位置索引
+2. 每个命中左右各 span 字构成窗口（窗口不含节点词本身，相邻命中的窗口重叠部分只计一次），
+   窗口内完整落入的 1..max_n 字 n-gram 起点用 repeat + arange 一次展开
+3. 全语料各长度 n-gram 频次（不含非汉字）按语料哈希缓存（.npz），查表即得期望频次
+4. 2×2 列联表：O11 = 窗口内频次，R1 = 窗口内 n-gram 总数，C1 = 全语料频次，N = 全语料 n-gram 总数，
+   E11 = R1·C1/N；对全部搭配词同时计算
+   - 对数似然 G² = 2 Σ O·ln(O/E)（O11 < E11 时取负，表示排斥）
+   - t 值 = (O11 - E11) / √O11
+   - 互信息 MI = log2(O11 / E11)
+"""
+from pathlib import Path
+
+import numpy as np
+
+from positional_index import corpus_index, text_hash
+from term_discovery import is_hanzi
+
+
+DEFAULT_CACHE_DIR = Path(__file__).with_name('.cache') / 'collocation'
+
+# 每个字占用的位数（n-gram 键 = n 个字表ID 拼接）
+BITS = 21
+
+STATISTICS = ('log_likelihood', 't_score', 'mi', 'freq')
+
+# 同一进程内按语料共享频次表
+_frequencies = {}
+
+
+def ngram_keys(ids, starts, n):
+    """起点数组 → n-gram 键（uint64）"""
+    keys = np.zeros(len(starts), dtype=np.uint64)
+    for k in range(n):
+        keys = (keys << np.uint64(BITS)) | ids[starts + k].astype(np.uint64)
+    return keys
+
+
+def valid_starts(boundary_csum, starts, n):
+    """n-gram 中不含非汉字的起点"""
+    return starts[boundary_csum[starts + n] == boundary_csum[starts]]
+
+
+class CorpusFrequencies:
+    """全语料 1..max_n 字 n-gram 频次表（按键升序）"""
+
+    def __init__(self, text, tables, max_n):
+        """
+        参数:
+            tables: {n: (键数组, 计数数组)}
+        """
+        self.text = text
+        self.tables = tables
+        self.max_n = max_n
+        codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+        # 以 Unicode 码直接作字表ID（BITS=21 位可容纳全部码位）
+        self.ids = codes
+        self.boundary_csum = np.concatenate([[0], np.cumsum(~is_hanzi(codes), dtype=np.int64)])
+
+    @classmethod
+    def build(cls, text, max_n=2):
+        """统计全语料频次"""
+        freq = cls(text, {}, max_n)
+        all_starts = np.arange(len(text), dtype=np.int64)
+        for n in range(1, max_n + 1):
+            starts = valid_starts(freq.boundary_csum, all_starts[:max(len(text) - n + 1, 0)], n)
+            keys = np.sort(ngram_keys(freq.ids, starts, n))
+            if len(keys):
+                boundary = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+                freq.tables[n] = (keys[boundary], np.diff(np.append(boundary, len(keys))))
+            else:
+                freq.tables[n] = (keys, np.zeros(0, dtype=np.int64))
+        return freq
+
+    @classmethod
+    def for_text(cls, text, max_n=2, cache_dir=DEFAULT_CACHE_DIR):
+        """取得某份语料的频次表（进程内共享；按语料哈希缓存为 .npz）"""
+        key = (hash(text), len(text), max_n, str(cache_dir))
+        freq = _frequencies.get(key)
+        if freq is not None and (freq.text is text or freq.text == text):
+            return freq
+
+        path = None
+        if cache_dir is not None:
+            path = Path(cache_dir) / f"{text_hash(text)[:32]}-n{max_n}.npz"
+            if path.exists():
+                try:
+                    with np.load(path) as data:
+                        tables = {n: (data[f'keys{n}'], data[f'counts{n}']) for n in range(1, max_n + 1)}
+                    freq = cls(text, tables, max_n)
+                except (OSError, ValueError, KeyError):
+                    freq = None
+
+        if freq is None:
+            freq = cls.build(text, max_n)
+            if path is not None:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = path.with_name(path.name + '.tmp')
+                arrays = {}
+                for n, (keys, counts) in freq.tables.items():
+                    arrays[f'keys{n}'] = keys
+                    arrays[f'counts{n}'] = counts
+                with open(tmp_path, 'wb') as f:
+                    np.savez(f, **arrays)
+                tmp_path.replace(path)
+
+        _frequencies[key] = freq
+        return freq
+
+    def total(self, n):
+        """全语料 n-gram 总数"""
+        return int(self.tables[n][1].sum())
+
+    def lookup(self, n, keys):
+        """键 → 全语料频次"""
+        table_keys, table_counts = self.tables[n]
+        if len(table_keys) == 0:
+            return np.zeros(len(keys), dtype=np.int64)
+        idx = np.minimum(np.searchsorted(table_keys, keys), len(table_keys) - 1)
+        return np.where(table_keys[idx] == keys, table_counts[idx], 0)
+
+
+def decode(key, n):
+    """n-gram 键 → 字符串"""
+    key = int(key)
+    mask = (1 << BITS) - 1
+    return ''.join(chr((key >> (BITS * (n - 1 - k))) & mask) for k in range(n))
+
+
+def window_starts(positions, node_length, span, n, text_length, side='both'):
+    """
+    节点词命中周围 ±span 字窗口内、完整落入窗口的 n-gram 起点（去重）
+
+    参数:
+        side: 'both' / 'left' / 'right'
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    lows, highs = [], []
+    if side in ('both', 'left'):
+        lows.append(np.maximum(positions - span, 0))
+        highs.append(positions - n + 1)
+    if side in ('both', 'right'):
+        lows.append(positions + node_length)
+        highs.append(np.minimum(positions + node_length + span, text_length) - n + 1)
+    if not lows:
+        raise ValueError(f"不支持的窗口方向: {side}")
+
+    lows = np.concatenate(lows)
+    sizes = np.maximum(np.concatenate(highs) - lows, 0)
+    offsets = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    return np.unique(np.repeat(lows, sizes) + offsets)
+
+
+def association(observed, window_total, corpus_freq, corpus_total):
+    """
+    由列联表计算搭配统计量（全部为数组运算）
+
+    返回:
+        (期望频次, 对数似然, t值, 互信息)
+    """
+    o11 = observed.astype(np.float64)
+    r1 = float(window_total)
+    c1 = np.maximum(corpus_freq.astype(np.float64), o11)
+    n = float(corpus_total)
+
+    observed_cells = [o11, r1 - o11, c1 - o11, n - r1 - c1 + o11]
+    expected_cells = [r1 * c1 / n, r1 * (n - c1) / n, (n - r1) * c1 / n, (n - r1) * (n - c1) / n]
+
+    g2 = np.zeros(len(o11))
+    for o, e in zip(observed_cells, expected_cells):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            g2 += np.where((o > 0) & (e > 0), o * np.log(o / e), 0.0)
+    g2 *= 2
+
+    e11 = expected_cells[0]
+    g2 = np.where(o11 < e11, -g2, g2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_score = np.where(o11 > 0, (o11 - e11) / np.sqrt(o11), 0.0)
+        mi = np.where((o11 > 0) & (e11 > 0), np.log2(o11 / e11), -np.inf)
+    return e11, g2, t_score, mi
+
+
+def collocations(text, node, span=5, max_n=2, side='both', min_freq=3, sort_by='log_likelihood', top=50):
+    """
+    节点词的搭配表
+
+    参数:
+        node: 节点词
+        span: 左右窗口字数
+        max_n: 搭配词最大长度（1..max_n 字，不含非汉字）
+        side: 'both' / 'left' / 'right'
+        min_freq: 窗口内最低共现频次
+        sort_by: 'log_likelihood' / 't_score' / 'mi' / 'freq'
+
+    返回:
+        [{"collocate", "length", "freq", "corpus_freq", "expected",
+          "log_likelihood", "t_score", "mi"}, ...]，按 sort_by 降序
+    """
+    if sort_by not in STATISTICS:
+        raise ValueError(f"不支持的排序统计量: {sort_by}，可选 {', '.join(STATISTICS)}")
+    if max_n * BITS > 64:
+        raise ValueError(f"搭配词长度不能超过 {64 // BITS}")
+
+    positions = corpus_index(text, [node]).array(node).astype(np.int64)
+    freq = CorpusFrequencies.for_text(text, max_n)
+
+    rows = []
+    for n in range(1, max_n + 1):
+        starts = window_starts(positions, len(node), span, n, len(text), side)
+        starts = valid_starts(freq.boundary_csum, starts, n)
+        if len(starts) == 0:
+            continue
+
+        keys = np.sort(ngram_keys(freq.ids, starts, n))
+        boundary = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+        collocates = keys[boundary]
+        observed = np.diff(np.append(boundary, len(keys)))
+
+        expected, g2, t_score, mi = association(
+            observed, len(keys), freq.lookup(n, collocates), freq.total(n))
+
+        keep = np.flatnonzero(observed >= min_freq)
+        corpus_freq = freq.lookup(n, collocates[keep])
+        for j, i in enumerate(keep.tolist()):
+            rows.append({
+                'collocate': decode(collocates[i], n),
+                'length': n,
+                'freq': int(observed[i]),
+                'corpus_freq': int(corpus_freq[j]),
+                'expected': round(float(expected[i]), 3),
+                'log_likelihood': round(float(g2[i]), 3),
+                't_score': round(float(t_score[i]), 3),
+                'mi': round(float(mi[i]), 3)
+            })
+
+    rows.sort(key=lambda r: -r[sort_by])
+    return rows[:top] if top else rows
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+窗口共现引擎 - 人物 × 事件 共现计数
+
+解决问题：
+analyze_person_in_event 对每个事件关键词重新扫描全文，为每个命中切出上千字的窗口，
+再用 person_name in context 做子串判断；重复的子串工作，也不考虑条目（日记录）边界
+
+方法：
+1. 两组词（如人物 A、事件 B）的出现位置各自合并为一条有序数组
+2. 对每个 B 命中，在 A 的有序数组上二分定位窗口 [pos-K, pos+len+K]，
+   或定位同一日记录（条目）内的 A 命中；窗口展开为 (A命中, B命中) 配对
+3. 配对按 (A词, B词) 聚合为稀疏矩阵（CSR：indptr / indices / data）
+   整体复杂度与命中数 + 配对数成线性（外加二分的对数因子）
+"""
+import numpy as np
+
+from window_join import window_ranges
+
+
+def merge_positions(positions_by_term):
+    """
+    把 {词: 位置数组} 合并为一条有序命中流
+
+    返回:
+        (词列表, 位置数组, 词ID数组, 词长数组)，按位置升序
+    """
+    terms = list(positions_by_term)
+    arrays = [np.asarray(positions_by_term[t], dtype=np.int64) for t in terms]
+    if not arrays:
+        empty = np.zeros(0, dtype=np.int64)
+        return terms, empty, empty.astype(np.int32), empty
+
+    positions = np.concatenate(arrays)
+    term_ids = np.repeat(np.arange(len(terms), dtype=np.int32), [len(a) for a in arrays])
+    order = np.lexsort((term_ids, positions))
+    lengths = np.array([len(t) for t in terms], dtype=np.int64)
+    return terms, positions[order], term_ids[order], lengths[term_ids[order]]
+
+
+def expand_ranges(starts, ends):
+    """把每个 B 命中的区间 [start, end) 展开为 (B下标, A下标) 配对数组"""
+    sizes = ends - starts
+    b_index = np.repeat(np.arange(len(starts)), sizes)
+    offsets = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    return b_index, np.repeat(starts, sizes) + offsets
+
+
+class CooccurrenceMatrix:
+    """稀疏共现矩阵（行 = A 词，列 = B 词），可附带全部配对"""
+
+    def __init__(self, row_terms, col_terms, indptr, indices, data, pairs=None):
+        """
+        参数:
+            row_terms / col_terms: 行、列对应的词
+            indptr / indices / data: CSR 三数组
+            pairs: 可选 (A位置数组, A词ID数组, B位置数组, B词ID数组)
+        """
+        self.row_terms = list(row_terms)
+        self.col_terms = list(col_terms)
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.pairs = pairs
+
+    @classmethod
+    def from_pairs(cls, row_terms, col_terms, rows, cols, pairs=None):
+        """由配对的 (行ID, 列ID) 聚合为 CSR"""
+        n_cols = len(col_terms)
+        keys, counts = np.unique(rows.astype(np.int64) * n_cols + cols, return_counts=True)
+        key_rows = keys // max(n_cols, 1)
+        indptr = np.zeros(len(row_terms) + 1, dtype=np.int64)
+        np.add.at(indptr, key_rows + 1, 1)
+        return cls(row_terms, col_terms, np.cumsum(indptr),
+                   (keys % max(n_cols, 1)).astype(np.int32), counts.astype(np.int64), pairs)
+
+    def __getitem__(self, key):
+        """matrix[A词, B词] → 共现次数"""
+        row_term, col_term = key
+        row = self.row_terms.index(row_term)
+        col = self.col_terms.index(col_term)
+        lo, hi = self.indptr[row], self.indptr[row + 1]
+        hit = np.searchsorted(self.indices[lo:hi], col)
+        if hit < hi - lo and self.indices[lo + hit] == col:
+            return int(self.data[lo + hit])
+        return 0
+
+    @property
+    def nnz(self):
+        return len(self.data)
+
+    def toarray(self):
+        """转为稠密矩阵"""
+        dense = np.zeros((len(self.row_terms), len(self.col_terms)), dtype=np.int64)
+        rows = np.repeat(np.arange(len(self.row_terms)), np.diff(self.indptr))
+        dense[rows, self.indices] = self.data
+        return dense
+
+    def items(self):
+        """按共现次数降序给出 [(A词, B词, 次数), ...]"""
+        rows = np.repeat(np.arange(len(self.row_terms)), np.diff(self.indptr))
+        order = np.argsort(-self.data, kind='stable')
+        return [(self.row_terms[rows[i]], self.col_terms[self.indices[i]], int(self.data[i]))
+                for i in order.tolist()]
+
+    def pairs_for(self, row_term=None, col_term=None):
+        """
+        某个 A 词和/或 B 词的全部配对 [(A位置, B位置), ...]（需以 with_pairs=True 构建）
+        """
+        if self.pairs is None:
+            raise ValueError("构建时未保留配对，请使用 with_pairs=True")
+        a_pos, a_ids, b_pos, b_ids = self.pairs
+        mask = np.ones(len(a_pos), dtype=bool)
+        if row_term is not None:
+            mask &= a_ids == self.row_terms.index(row_term)
+        if col_term is not None:
+            mask &= b_ids == self.col_terms.index(col_term)
+        return list(zip(a_pos[mask].tolist(), b_pos[mask].tolist()))
+
+
+def cooccurrence(a_positions, b_positions, window=None, entry_starts=None, with_pairs=False):
+    """
+    计算 A 词组 × B 词组 的共现矩阵
+
+    参数:
+        a_positions / b_positions: {词: 出现位置数组}（如人物、事件关键词）
+        window: 字符窗口 K：A 命中完整落在 B 命中前后各 K 字的范围内，
+                即 A 起点 >= B起点 - K 且 A 终点 <= B终点 + K
+        entry_starts: 改为按条目计：A、B 落在同一条目内即共现（条目起始偏移的升序数组，
+                      如 DateIndex 日记录断点）；给出时忽略 window
+        with_pairs: 是否保留全部配对位置（供列出具体段落）
+
+    返回:
+        CooccurrenceMatrix
+    """
+    a_terms, a_pos, a_ids, a_len = merge_positions(a_positions)
+    b_terms, b_pos, b_ids, b_len = merge_positions(b_positions)
+
+    if entry_starts is not None:
+        entry_starts = np.asarray(entry_starts, dtype=np.int64)
+        a_entry = np.searchsorted(entry_starts, a_pos, side='right') - 1
+        b_entry = np.searchsorted(entry_starts, b_pos, side='right') - 1
+        starts, ends = window_ranges(a_entry, b_entry, b_entry,
+                                     lower_inclusive=True, upper_inclusive=True)
+        b_index, a_index = expand_ranges(starts, ends)
+    else:
+        if window is None:
+            raise ValueError("需要给出 window 或 entry_starts")
+        # 先按 A 起点粗定位，再按 A 终点精确过滤
+        starts, ends = window_ranges(a_pos, b_pos - window, b_pos + b_len + window,
+                                     lower_inclusive=True, upper_inclusive=True)
+        b_index, a_index = expand_ranges(starts, ends)
+        keep = a_pos[a_index] + a_len[a_index] <= b_pos[b_index] + b_len[b_index] + window
+        b_index, a_index = b_index[keep], a_index[keep]
+
+    pairs = None
+    if with_pairs:
+        pairs = (a_pos[a_index], a_ids[a_index], b_pos[b_index], b_ids[b_index])
+    return CooccurrenceMatrix.from_pairs(a_terms, b_terms, a_ids[a_index], b_ids[b_index], pairs)
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+语料管理器 - 单卷文件的按需读取与已解码卷的 LRU 缓存
+
+解决问题：
+JiajingTextAnalyzer.load_all_volumes 每次都重新 glob 目录、打开并读入全部卷，
+search_keyword、人物分析菜单等每个操作都各读一遍，再 join 出一份全文副本
+
+方法：
+1. 目录只在其修改时间变化时重新扫描；单卷访问时比对 (大小, 修改时间)，
+   文件被改写则丢弃旧的解码结果
+2. 卷文件按需一次读入并解码，不保留文件句柄或映射；解码后的 str 放入按字节数
+   限额的 LRU，超出限额时淘汰最久未用的卷
+3. 全部卷拼接后的全文（与 suffix_array.pack_volumes 相同格式）按目录签名缓存，
+   同一会话内的检索、人物统计共用这一份
+"""
+import os
+import sys
+from collections import OrderedDict
+from pathlib import Path
+
+from suffix_array import pack_volumes
+
+
+# 已解码卷的默认内存上限（字节，按 str 实际占用计）
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+VOLUME_PREFIX = 'jiajing_shilu_vol'
+
+# 每个目录一个共享管理器
+_managers = {}
+
+
+class CorpusManager:
+    """单卷语料目录的管理器"""
+
+    def __init__(self, data_dir="jiajing_data", max_bytes=DEFAULT_MAX_BYTES):
+        """
+        参数:
+            data_dir: 单卷文件所在目录（jiajing_shilu_vol<N>.txt）
+            max_bytes: 已解码卷缓存的内存上限
+        """
+        self.data_dir = Path(data_dir)
+        self.max_bytes = max_bytes
+
+        self._dir_mtime = None
+        self._files = {}            # 卷号 → 路径
+        self._texts = OrderedDict()  # 卷号 → (文件签名, 文本, 字节数)，按最近使用排序
+        self._text_bytes = 0
+        self._packed = None         # (目录签名, 全文, 各卷起始, 卷号列表)
+
+    def refresh(self):
+        """
+        目录有变化（增删文件）时重新扫描
+
+        返回:
+            bool: 是否重新扫描
+        """
+        try:
+            mtime = os.stat(self.data_dir).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._dir_mtime:
+            return False
+
+        self._dir_mtime = mtime
+        files = {}
+        if mtime is not None:
+            for f in self.data_dir.glob(f'{VOLUME_PREFIX}*.txt'):
+                # 跳过合并文件 (包含"-"的文件名)
+                if '-' in f.stem or 'complete' in f.stem:
+                    continue
+                try:
+                    files[int(f.stem.replace(VOLUME_PREFIX, ''))] = f
+                except ValueError:
+                    continue
+
+        for vol in set(self._files) - set(files):
+            self._evict(vol)
+        self._files = files
+        return True
+
+    def volumes(self):
+        """已下载的卷号（升序）"""
+        self.refresh()
+        return sorted(self._files)
+
+    def _file_signature(self, vol):
+        """(大小, 修改时间)；文件不存在时为 None"""
+        path = self._files.get(vol)
+        if path is None:
+            return None
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def signature(self):
+        """目录签名：各卷 (卷号, 大小, 修改时间)，任何一卷变化都会改变"""
+        self.refresh()
+        return tuple((vol, self._file_signature(vol)) for vol in sorted(self._files))
+
+    def _evict(self, vol):
+        """丢弃某卷的解码结果"""
+        entry = self._texts.pop(vol, None)
+        if entry is not None:
+            self._text_bytes -= entry[2]
+
+    def raw(self, vol):
+        """
+        卷文件的原始内容（UTF-8 字节，每次从磁盘读取，不缓存）；卷不存在时返回 None
+        """
+        self.refresh()
+        if self._file_signature(vol) is None:
+            self._evict(vol)
+            return None
+        try:
+            return self._files[vol].read_bytes()
+        except FileNotFoundError:
+            self._evict(vol)
+            return None
+
+    def text(self, vol):
+        """卷文本（解码结果进入 LRU 缓存）；卷不存在时返回 None"""
+        self.refresh()
+        sig = self._file_signature(vol)
+        if sig is None:
+            self._evict(vol)
+            return None
+
+        entry = self._texts.get(vol)
+        if entry is not None and entry[0] == sig:
+            self._texts.move_to_end(vol)
+            return entry[1]
+
+        self._evict(vol)
+        data = self.raw(vol)
+        if data is None:
+            return None
+        text = data.decode('utf-8')
+        size = sys.getsizeof(text)
+        self._texts[vol] = (sig, text, size)
+        self._text_bytes += size
+
+        # 淘汰最久未用的卷（至少保留刚解码的这一卷）
+        while self._text_bytes > self.max_bytes and len(self._texts) > 1:
+            _, (_, _, old_size) = self._texts.popitem(last=False)
+            self._text_bytes -= old_size
+        return text
+
+    def items(self):
+        """[(卷号, 文本), ...]，按卷号升序（与 load_all_volumes 相同）"""
+        result = []
+        for vol in self.volumes():
+            text = self.text(vol)
+            if text:
+                result.append((vol, text))
+        return result
+
+    def packed(self):
+        """
+        全部卷拼接后的全文（卷间以换行分隔，见 pack_volumes），按目录签名缓存
+
+        返回:
+            (全文, 各卷起始偏移数组, 卷号列表)
+        """
+        sig = self.signature()
+        if self._packed is None or self._packed[0] != sig:
+            self._packed = (sig,) + pack_volumes(self.items())
+        return self._packed[1:]
+
+    @property
+    def cached_bytes(self):
+        """已解码卷当前占用的字节数"""
+        return self._text_bytes
+
+
+def corpus_manager(data_dir="jiajing_data", max_bytes=DEFAULT_MAX_BYTES):
+    """取得（或创建）某目录的共享语料管理器"""
+    key = str(Path(data_dir).resolve())
+    manager = _managers.get(key)
+    if manager is None:
+        manager = _managers[key] = CorpusManager(data_dir, max_bytes)
+    return manager
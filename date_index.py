@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+实录日期索引 - 文本偏移 → 日期
+
+一次顺序扫描全文，记录"日期状态"发生变化的偏移位置（断点），
+之后任意位置的 年/月/日 都可以用二分查找得到，无需重新扫描文本
+
+日期表示：
+- 月序号: (嘉靖年 - 1) * 12 + (月 - 1)，-1 表示未知
+- 日序号: 距嘉靖元年正月初一的天数（干支推算，见 date_parser.ChineseCalendar），
+  可以为负（干支推算落在元年正月初一之前），UNKNOWN_ORDINAL 表示未知
+- 月内日: 农历日（1-30），0 表示未知
+"""
+import re
+from pathlib import Path
+
+import numpy as np
+
+from date_parser import ChineseCalendar
+
+
+# 日序号的"未知"标记：真实日序号可以为负，不能用 -1
+UNKNOWN_ORDINAL = int(np.iinfo(np.int32).min)
+
+# 日期数值约定变化时递增，使保存的日期索引失效
+FORMAT_VERSION = 2
+
+# 年月识别规则（与 MonthlyAnalyzer 的按月解析保持一致）
+YEAR_PATTERN = re.compile(r'嘉靖([元一二三四五六七八九十百]+)年')
+MONTH_PATTERN = re.compile(r'([正二三四五六七八九十冬腊][一二三四五六七八九十]?)月')
+
+# 日名：行首干支，PDF点校本形如"壬子（初一） ，朔"，维基文库形如"丙辰，……"
+DAY_PATTERN = re.compile(
+    r'\s*([甲乙丙丁戊己庚辛壬癸][子丑寅卯辰巳午未申酉戌亥])'
+    r'\s*(?:（([初十廿一二三四五六七八九]+)）|[，,]|$)'
+)
+# 月首朔日：如"嘉靖元年壬午春正月己酉朔"
+NEW_MOON_PATTERN = re.compile(r'([甲乙丙丁戊己庚辛壬癸][子丑寅卯辰巳午未申酉戌亥])朔')
+
+# 中文数字映射
+CN_NUM_MAP = {
+    '〇': 0, '零': 0, '元': 1, '一': 1, '二': 2, '三': 3,
+    '四': 4, '五': 5, '六': 6, '七': 7, '八': 8, '九': 9,
+    '十': 10, '正': 1, '冬': 11, '腊': 12
+}
+
+
+def cn_to_num(cn_str):
+    """中文数字转数字"""
+    if cn_str in CN_NUM_MAP:
+        return CN_NUM_MAP[cn_str]
+    if '十' in cn_str:
+        parts = cn_str.split('十')
+        left = CN_NUM_MAP.get(parts[0], 0) if parts[0] else 1
+        right = CN_NUM_MAP.get(parts[1], 0) if parts[1] else 0
+        return left * 10 + right
+    return 0
+
+
+def lunar_day_to_num(cn_str):
+    """农历日转数字：初一 → 1，十五 → 15，廿三 → 23"""
+    if cn_str.startswith('初'):
+        return cn_to_num(cn_str[1:])
+    if cn_str.startswith('廿'):
+        return 20 + (cn_to_num(cn_str[1:]) if len(cn_str) > 1 else 0)
+    return cn_to_num(cn_str)
+
+
+def month_index(year, month):
+    """(嘉靖年, 月) → 月序号；年或月无效时返回 -1"""
+    if not year or not month or month > 12:
+        return -1
+    return (year - 1) * 12 + (month - 1)
+
+
+class DateIndex:
+    """文本偏移 → 日期 的断点索引"""
+
+    def __init__(self, offsets, months, ordinals, mdays):
+        """
+        参数（等长数组，按偏移升序）:
+            offsets: 日期状态开始生效的偏移
+            months: 月序号
+            ordinals: 日序号
+            mdays: 月内日
+        """
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.months = np.asarray(months, dtype=np.int32)
+        self.ordinals = np.asarray(ordinals, dtype=np.int32)
+        # raw_mdays 为文本中实际标注的月内日，mdays 为补全后的值
+        self.raw_mdays = np.array(mdays, dtype=np.int8)
+        self.mdays = self.raw_mdays.copy()
+        self.final_state = None
+        self._fill_month_days()
+
+    @classmethod
+    def build(cls, text, state=None):
+        """
+        顺序扫描全文，构建日期索引
+
+        参数:
+            state: 扫描开始时的日期状态 (年, 月, 干支, 月内日)，
+                   用于接续上一个文件结束时的状态；默认全部未知
+
+        返回的索引带有 final_state 属性（扫描结束时的状态），可传给下一个文件
+        """
+        offsets, months, ordinals, mdays = [], [], [], []
+
+        current_year, current_month, current_ganzhi, current_mday = state or (None, None, None, 0)
+        ganzhi_cache = {}
+
+        pos = 0
+        total = len(text)
+
+        while pos <= total:
+            line_end = text.find('\n', pos)
+            if line_end == -1:
+                line_end = total
+
+            year_match = YEAR_PATTERN.search(text, pos, line_end)
+            if year_match:
+                current_year = cn_to_num(year_match.group(1))
+
+            month_match = MONTH_PATTERN.search(text, pos, line_end)
+            if month_match:
+                new_month = cn_to_num(month_match.group(1))
+                if new_month != current_month:
+                    # 换月后，上月的日名不再有效
+                    current_ganzhi = None
+                    current_mday = 0
+                current_month = new_month
+
+            day_match = DAY_PATTERN.match(text, pos, line_end)
+            moon_match = None if day_match else NEW_MOON_PATTERN.search(text, pos, line_end)
+            if day_match:
+                current_ganzhi = day_match.group(1)
+                current_mday = lunar_day_to_num(day_match.group(2)) if day_match.group(2) else 0
+            elif moon_match:
+                current_ganzhi = moon_match.group(1)
+                current_mday = 1
+
+            month = month_index(current_year, current_month)
+            ordinal = UNKNOWN_ORDINAL
+            if month >= 0 and current_ganzhi:
+                key = (current_ganzhi, current_year, current_month)
+                if key not in ganzhi_cache:
+                    date = ChineseCalendar.ganzhi_to_date(*key)
+                    ganzhi_cache[key] = (date - ChineseCalendar.JIAJING_START).days if date else UNKNOWN_ORDINAL
+                ordinal = ganzhi_cache[key]
+            mday = current_mday if month >= 0 else 0
+
+            # 只在日期状态变化时记录断点
+            if not months or (months[-1], ordinals[-1], mdays[-1]) != (month, ordinal, mday):
+                offsets.append(pos)
+                months.append(month)
+                ordinals.append(ordinal)
+                mdays.append(mday)
+
+            pos = line_end + 1
+
+        index = cls(offsets, months, ordinals, mdays)
+        index.final_state = (current_year, current_month, current_ganzhi, current_mday)
+        return index
+
+    @classmethod
+    def concat(cls, indexes, bases):
+        """
+        把多个文件各自的日期索引拼接为整体索引
+
+        参数:
+            bases: 每个文件在整体文本中的起始偏移
+        """
+        if not indexes:
+            return cls([], [], [], [])
+        return cls(
+            np.concatenate([idx.offsets + base for idx, base in zip(indexes, bases)]),
+            np.concatenate([idx.months for idx in indexes]),
+            np.concatenate([idx.ordinals for idx in indexes]),
+            np.concatenate([idx.raw_mdays for idx in indexes])
+        )
+
+    def _fill_month_days(self):
+        """
+        估计每月初一的日序号，用于补全未标注农历日的断点（维基文库文本只有干支）
+        """
+        known = self.ordinals != UNKNOWN_ORDINAL
+        month_start = {}
+        for month, ordinal, mday in zip(self.months[known].tolist(),
+                                        self.ordinals[known].tolist(),
+                                        self.mdays[known].tolist()):
+            start = ordinal - (mday - 1 if mday > 0 else 0)
+            if month not in month_start or start < month_start[month]:
+                month_start[month] = start
+        self.month_start = month_start
+
+        for i in np.nonzero(known & (self.mdays == 0))[0]:
+            start = month_start.get(int(self.months[i]))
+            if start is not None:
+                self.mdays[i] = min(max(int(self.ordinals[i]) - start + 1, 1), 30)
+
+    def lookup(self, positions):
+        """
+        查询一批偏移的日期
+
+        返回:
+            (月序号数组, 日序号数组, 月内日数组)；未知分别为 -1、UNKNOWN_ORDINAL、0
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        if len(self.offsets) == 0:
+            return (np.full(len(positions), -1, dtype=np.int32),
+                    np.full(len(positions), UNKNOWN_ORDINAL, dtype=np.int32),
+                    np.zeros(len(positions), dtype=np.int8))
+
+        idx = np.searchsorted(self.offsets, positions, side='right') - 1
+        before_start = idx < 0
+        idx = np.maximum(idx, 0)
+
+        months = np.where(before_start, -1, self.months[idx]).astype(np.int32)
+        ordinals = np.where(before_start, UNKNOWN_ORDINAL, self.ordinals[idx]).astype(np.int32)
+        mdays = np.where(before_start, 0, self.mdays[idx]).astype(np.int8)
+        return months, ordinals, mdays
+
+    def save(self, path):
+        """保存为 .npz"""
+        np.savez_compressed(
+            path, offsets=self.offsets, months=self.months,
+            ordinals=self.ordinals, mdays=self.raw_mdays,
+            version=np.array(FORMAT_VERSION)
+        )
+
+    @classmethod
+    def load(cls, path):
+        """读取 .npz（旧格式以 -1 表示未知日序号，不再兼容）"""
+        with np.load(Path(path)) as data:
+            if 'version' not in data or int(data['version']) != FORMAT_VERSION:
+                raise ValueError(f"日期索引格式过旧: {path}")
+            return cls(data['offsets'], data['months'], data['ordinals'], data['mdays'])
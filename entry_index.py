@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+"""
+条目索引 - 按日记录切分条目，构建 条目 × 字 n-gram 的 TF-IDF 稀疏矩阵
+
+解决问题：
+实录以"某干支日"为单位记事，但现有分析只有卷、月、固定字数窗口三种粒度；
+想找"与这条记录相似的其他记录"、比较条目之间的用语，没有条目级的向量表示
+
+方法：
+1. 一遍扫描行首：日名行（DAY_PATTERN，PDF"壬子（初一） ，朔"、维基文库"丙辰，……"）与
+   月首朔日行（NEW_MOON_PATTERN）即一个条目的起点，卷起点也作为切分点；
+   条目为 [起点, 下一起点)，记录偏移、所在卷与日期（DateIndex）
+2. 字 n-gram（默认 1..2 字，不含非汉字）的键按字码拼接为 uint64（同 collocation），
+   各长度的键互不重叠，可放进同一个词表
+3. 分块（约 1M 字一块，块边界对齐条目）计数：块内键 → 局部ID，条目×局部ID 组合为一个整数后排序计数，
+   得到 (条目, 键, 词频) 三元组；全部三元组对键排序即得文档频率与词表，按 min_df / max_df 过滤
+4. 权重 = (1 + ln tf) × (ln((1+N)/(1+df)) + 1)，每行 L2 归一化；
+   结果为 CSR 数组（indptr / indices / data，同 cooccurrence），
+   连同条目表按 语料哈希 + 参数 保存为 .npz，再次打开时直接读取
+"""
+from pathlib import Path
+
+import numpy as np
+
+from collocation import BITS, ngram_keys, valid_starts
+from date_index import UNKNOWN_ORDINAL, DateIndex, DAY_PATTERN, NEW_MOON_PATTERN
+from hit_table import bucket_label
+from partial_cache import key_hash
+from positional_index import text_hash
+from term_discovery import is_hanzi
+
+
+DEFAULT_CACHE_DIR = Path(__file__).with_name('.cache') / 'entries'
+
+# 条目表或矩阵格式变化时递增，使旧缓存失效
+FORMAT_VERSION = 2
+
+
+def entry_starts(text):
+    """
+    一遍扫描行首，返回日记录（日名行、月首朔日行）的起始偏移数组
+    """
+    starts = []
+    pos = 0
+    total = len(text)
+    while pos < total:
+        line_end = text.find('\n', pos)
+        if line_end == -1:
+            line_end = total
+        if DAY_PATTERN.match(text, pos, line_end) or NEW_MOON_PATTERN.search(text, pos, line_end):
+            starts.append(pos)
+        pos = line_end + 1
+    return np.array(starts, dtype=np.int64)
+
+
+class Entries:
+    """条目表（列式数组，按偏移升序，首尾相接覆盖全文）"""
+
+    def __init__(self, starts, ends, volumes, months, ordinals, dated):
+        """
+        参数（等长数组）:
+            starts / ends: 条目 [起点, 终点)
+            volumes: 所在卷下标
+            months / ordinals: 起点处的月序号（-1 为未知）、日序号（UNKNOWN_ORDINAL 为未知）
+            dated: 是否以日记录开头（False 为卷首、序言等段落）
+        """
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+        self.volumes = np.asarray(volumes, dtype=np.int32)
+        self.months = np.asarray(months, dtype=np.int32)
+        self.ordinals = np.asarray(ordinals, dtype=np.int32)
+        self.dated = np.asarray(dated, dtype=bool)
+
+    @classmethod
+    def build(cls, text, volume_starts=None, date_index=None):
+        """
+        切分条目
+
+        参数:
+            volume_starts: 各卷起始偏移（见 suffix_array.pack_volumes），条目不跨卷
+            date_index: 全文的日期索引，缺省时构建
+        """
+        day_starts = entry_starts(text)
+        volume_starts = (np.asarray(volume_starts, dtype=np.int64)
+                         if volume_starts is not None else np.zeros(1, dtype=np.int64))
+        starts = np.union1d(np.union1d(day_starts, volume_starts), [0])
+        starts = starts[starts < max(len(text), 1)]
+        ends = np.append(starts[1:], len(text))
+
+        # 去掉只有空白的段落（如卷首的空行）
+        keep = np.fromiter((bool(text[s:e].strip()) for s, e in zip(starts.tolist(), ends.tolist())),
+                           dtype=bool, count=len(starts))
+        starts, ends = starts[keep], ends[keep]
+
+        if date_index is None:
+            date_index = DateIndex.build(text)
+        months, ordinals, _ = date_index.lookup(starts)
+        volumes = np.searchsorted(volume_starts, starts, side='right') - 1
+        dated = np.isin(starts, day_starts)
+        return cls(starts, ends, volumes, months, ordinals, dated)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def entry_of(self, positions):
+        """位置 → 所在条目下标（第一个条目之前为 -1）"""
+        return np.searchsorted(self.starts, positions, side='right') - 1
+
+    def text(self, text, i):
+        """第 i 个条目的原文"""
+        return text[int(self.starts[i]):int(self.ends[i])]
+
+    def label(self, i):
+        """第 i 个条目的日期标签"""
+        month, ordinal = int(self.months[i]), int(self.ordinals[i])
+        if ordinal != UNKNOWN_ORDINAL:
+            return f"{bucket_label('month', month)} ({bucket_label('day', ordinal)})"
+        if month >= 0:
+            return bucket_label('month', month)
+        return "未知日期"
+
+    def arrays(self):
+        return {
+            'starts': self.starts, 'ends': self.ends, 'volumes': self.volumes,
+            'months': self.months, 'ordinals': self.ordinals, 'dated': self.dated
+        }
+
+
+def _count_block(text, codes, boundary_csum, starts, lo, hi, ngram_range):
+    """
+    条目 [lo, hi) 所覆盖文本中的 (条目, 键, 词频)，按条目、键升序
+    """
+    b0, b1 = int(starts[lo]), int(starts[hi]) if hi < len(starts) else len(text)
+    keys, docs = [], []
+    for n in range(ngram_range[0], ngram_range[1] + 1):
+        positions = valid_starts(boundary_csum, np.arange(b0, max(b1 - n + 1, b0), dtype=np.int64), n)
+        keys.append(ngram_keys(codes, positions, n))
+        docs.append(np.searchsorted(starts, positions, side='right') - 1)
+    keys = np.concatenate(keys)
+    docs = np.concatenate(docs)
+    if len(keys) == 0:
+        return docs, keys, np.zeros(0, dtype=np.int64)
+
+    local_keys, local_ids = np.unique(keys, return_inverse=True)
+    pairs, counts = np.unique((docs - lo) * len(local_keys) + local_ids.ravel(), return_counts=True)
+    return pairs // len(local_keys) + lo, local_keys[pairs % len(local_keys)], counts
+
+
+class EntryIndex:
+    """条目表 + 条目 × 字 n-gram TF-IDF 矩阵（CSR）"""
+
+    def __init__(self, text, entries, vocabulary, idf, indptr, indices, data, ngram_range):
+        """
+        参数:
+            entries: Entries
+            vocabulary: 特征键（uint64，升序；列号即下标）
+            idf: 各特征的 idf
+            indptr / indices / data: CSR 矩阵，行为条目，每行已 L2 归一化
+        """
+        self.text = text
+        self.entries = entries
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.ngram_range = tuple(ngram_range)
+        self._rows = None
+
+    @classmethod
+    def build(cls, text, volume_starts=None, ngram_range=(1, 2), min_df=2, max_df=0.5,
+              block_size=1 << 20, date_index=None):
+        """
+        切分条目并构建 TF-IDF 矩阵
+
+        参数:
+            ngram_range: 字 n-gram 长度范围（闭区间，最长 64 // BITS 字）
+            min_df: 最少出现在几个条目中
+            max_df: 出现在超过该比例的条目中的特征视为虚词，去掉
+            block_size: 每块约多少字（决定计数时的内存峰值）
+        """
+        if ngram_range[1] * BITS > 64:
+            raise ValueError(f"n-gram 长度不能超过 {64 // BITS}")
+
+        entries = Entries.build(text, volume_starts, date_index)
+        n_entries = len(entries)
+        codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+        boundary_csum = np.concatenate([[0], np.cumsum(~is_hanzi(codes), dtype=np.int64)])
+
+        # 分块计数（块边界对齐条目）
+        doc_parts, key_parts, tf_parts = [], [], []
+        lo = 0
+        while lo < n_entries:
+            hi = int(np.searchsorted(entries.starts, entries.starts[lo] + block_size, side='right'))
+            hi = max(hi, lo + 1)
+            docs, keys, counts = _count_block(text, codes, boundary_csum, entries.starts, lo, hi, ngram_range)
+            doc_parts.append(docs)
+            key_parts.append(keys)
+            tf_parts.append(counts)
+            lo = hi
+
+        docs = np.concatenate(doc_parts) if doc_parts else np.zeros(0, dtype=np.int64)
+        keys = np.concatenate(key_parts) if key_parts else np.zeros(0, dtype=np.uint64)
+        tf = np.concatenate(tf_parts) if tf_parts else np.zeros(0, dtype=np.int64)
+        del doc_parts, key_parts, tf_parts
+
+        # 词表与文档频率：每个 (条目, 键) 只出现一次，键的出现次数即 df
+        all_keys, feature, df = np.unique(keys, return_inverse=True, return_counts=True)
+        feature = feature.ravel()
+        keep = (df >= min_df) & (df <= max_df * n_entries)
+        new_ids = np.cumsum(keep) - 1
+        vocabulary = all_keys[keep]
+        idf = (np.log((1 + n_entries) / (1 + df[keep])) + 1).astype(np.float32)
+
+        mask = keep[feature]
+        docs, feature, tf = docs[mask], new_ids[feature[mask]], tf[mask]
+
+        weights = (1 + np.log(tf)) * idf[feature]
+        norms = np.sqrt(np.bincount(docs, weights=weights * weights, minlength=n_entries))
+        weights = weights / np.where(norms > 0, norms, 1)[docs]
+
+        indptr = np.zeros(n_entries + 1, dtype=np.int64)
+        np.cumsum(np.bincount(docs, minlength=n_entries), out=indptr[1:])
+        return cls(text, entries, vocabulary, idf, indptr, feature.astype(np.int32),
+                   weights.astype(np.float32), ngram_range)
+
+    @classmethod
+    def for_text(cls, text, volume_starts=None, ngram_range=(1, 2), min_df=2, max_df=0.5,
+                 cache_dir=DEFAULT_CACHE_DIR):
+        """读取已保存的条目索引，不存在时构建并保存（按 语料哈希 + 参数）"""
+        path = None
+        if cache_dir is not None:
+            starts = [] if volume_starts is None else [int(s) for s in volume_starts]
+            params = key_hash(starts, list(ngram_range), min_df, max_df, FORMAT_VERSION)
+            path = Path(cache_dir) / f"{text_hash(text)[:32]}-{params}.tfidf.npz"
+            if path.exists():
+                try:
+                    return cls.load(path, text)
+                except (OSError, ValueError, KeyError):
+                    pass
+
+        index = cls.build(text, volume_starts, ngram_range, min_df, max_df)
+        if path is not None:
+            index.save(path)
+        return index
+
+    def save(self, path):
+        """保存为 .npz（先写临时文件再改名）"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, vocabulary=self.vocabulary, idf=self.idf, indptr=self.indptr,
+                     indices=self.indices, data=self.data,
+                     ngram_range=np.array(self.ngram_range, dtype=np.int32),
+                     **{f'entry_{k}': v for k, v in self.entries.arrays().items()})
+        tmp_path.replace(path)
+        return path
+
+    @classmethod
+    def load(cls, path, text):
+        """读取 .npz（text 为构建时的语料全文）"""
+        with np.load(Path(path)) as data:
+            entries = Entries(**{k: data[f'entry_{k}'] for k in
+                                 ('starts', 'ends', 'volumes', 'months', 'ordinals', 'dated')})
+            return cls(text, entries, data['vocabulary'], data['idf'], data['indptr'],
+                       data['indices'], data['data'], tuple(data['ngram_range'].tolist()))
+
+    @property
+    def shape(self):
+        return len(self.entries), len(self.vocabulary)
+
+    @property
+    def nnz(self):
+        return len(self.data)
+
+    def row(self, i):
+        """第 i 个条目的 (特征列号数组, 权重数组)"""
+        lo, hi = int(self.indptr[i]), int(self.indptr[i + 1])
+        return self.indices[lo:hi], self.data[lo:hi]
+
+    def feature_name(self, j):
+        """列号 → n-gram 字符串"""
+        key = int(self.vocabulary[j])
+        mask = (1 << BITS) - 1
+        chars = []
+        while key:
+            chars.append(chr(key & mask))
+            key >>= BITS
+        return ''.join(reversed(chars))
+
+    def vectorize(self, query):
+        """
+        任意文本 → 与条目同一空间的稀疏向量（未收录的 n-gram 忽略）
+
+        返回:
+            (特征列号数组, 权重数组)，已 L2 归一化
+        """
+        codes = np.frombuffer(query.encode('utf-32-le'), dtype=np.uint32)
+        boundary_csum = np.concatenate([[0], np.cumsum(~is_hanzi(codes), dtype=np.int64)])
+        keys = []
+        for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+            positions = valid_starts(boundary_csum, np.arange(max(len(codes) - n + 1, 0)), n)
+            keys.append(ngram_keys(codes, positions, n))
+        keys, tf = np.unique(np.concatenate(keys), return_counts=True)
+
+        if len(self.vocabulary) == 0 or len(keys) == 0:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        columns = np.minimum(np.searchsorted(self.vocabulary, keys), len(self.vocabulary) - 1)
+        found = self.vocabulary[columns] == keys
+        columns, tf = columns[found], tf[found]
+
+        weights = (1 + np.log(tf)) * self.idf[columns]
+        norm = np.sqrt((weights * weights).sum())
+        return columns.astype(np.int32), (weights / norm if norm > 0 else weights).astype(np.float32)
+
+    def scores(self, columns, weights):
+        """稀疏查询向量与全部条目的余弦相似度"""
+        if self._rows is None:
+            self._rows = np.repeat(np.arange(len(self.entries), dtype=np.int32), np.diff(self.indptr))
+        dense = np.zeros(len(self.vocabulary), dtype=np.float32)
+        dense[columns] = weights
+        return np.bincount(self._rows, weights=self.data * dense[self.indices],
+                           minlength=len(self.entries))
+
+    def similar(self, query, top=10):
+        """
+        与查询最相似的条目
+
+        参数:
+            query: 条目下标，或任意文本
+
+        返回:
+            [{"entry": 条目下标, "score": 余弦相似度, "date": 日期标签,
+              "position": 起始偏移, "preview": 开头若干字}, ...]
+        """
+        if isinstance(query, (int, np.integer)):
+            exclude = int(query)
+            columns, weights = self.row(exclude)
+        else:
+            exclude = None
+            columns, weights = self.vectorize(query)
+
+        scores = self.scores(columns, weights)
+        if exclude is not None:
+            scores[exclude] = -1
+        count = min(top, len(scores))
+        if count <= 0:
+            return []
+        best = np.argpartition(-scores, count - 1)[:count]
+        best = best[np.argsort(-scores[best], kind='stable')]
+
+        return [{
+            'entry': int(i),
+            'score': round(float(scores[i]), 4),
+            'date': self.entries.label(i),
+            'position': int(self.entries.starts[i]),
+            'preview': self.entries.text(self.text, i)[:60].replace('\n', ' ')
+        } for i in best.tolist() if scores[i] > 0]
+
+    def top_terms(self, i, top=10):
+        """第 i 个条目权重最高的 n-gram [(n-gram, 权重), ...]"""
+        columns, weights = self.row(i)
+        order = np.argsort(-weights, kind='stable')[:top]
+        return [(self.feature_name(columns[j]), round(float(weights[j]), 4)) for j in order.tolist()]
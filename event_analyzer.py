@@ -6,6 +6,12 @@ import sys
 import re
 from pathlib import Path
 
+from collocation import collocations
+from concordance import Concordance
+from cooccurrence import cooccurrence
+from entry_index import EntryIndex
+from suffix_array import SuffixArrayIndex
+
 if hasattr(sys.stdout, 'reconfigure'):
     sys.stdout.reconfigure(encoding='utf-8')
 if hasattr(sys.stderr, 'reconfigure'):
@@ -18,6 +24,8 @@ class EventAnalyzer:
     def __init__(self, data_file):
         self.data_file = Path(data_file)
         self.content = ""
+        self._search_index = None
+        self._entry_index = None
         self.load_data()
 
     def load_data(self):
@@ -32,6 +40,31 @@ class EventAnalyzer:
         print(f"✓ 已加载数据: {len(self.content):,}字")
         return True
 
+    def search_index(self):
+        """全文后缀数组检索（按内容哈希落盘，再次打开时内存映射）"""
+        if self._search_index is None:
+            self._search_index = SuffixArrayIndex.for_text(self.content)
+        return self._search_index
+
+    def entry_index(self):
+        """日记录条目表 + 条目 × 字 n-gram TF-IDF 矩阵（按内容哈希落盘）"""
+        if self._entry_index is None:
+            self._entry_index = EntryIndex.for_text(self.content)
+        return self._entry_index
+
+    def similar_entries(self, query, top=10):
+        """
+        与查询文本（或条目下标）用语最相似的日记录条目（TF-IDF 余弦相似度）
+
+        Args:
+            query: 任意文本，或条目下标
+            top: 返回条目数
+
+        Returns:
+            list: 条目记录，按相似度降序
+        """
+        return self.entry_index().similar(query, top=top)
+
     def find_event_contexts(self, keyword, context_length=300):
         """
         查找事件关键词的所有出现位置及上下文
@@ -43,36 +76,72 @@ class EventAnalyzer:
         Returns:
             list: 上下文列表
         """
-        contexts = []
-        pos = 0
-
-        while True:
-            pos = self.content.find(keyword, pos)
-            if pos == -1:
-                break
+        # 后缀数组定位任意关键词（与 find 循环结果一致），不再线性扫描
+        return [self._context_at(pos, keyword, context_length)
+                for pos in self.search_index().locate(keyword).tolist()]
+
+    def _context_at(self, pos, keyword, context_length):
+        """位置 pos 处关键词的上下文记录"""
+        start = max(0, pos - context_length)
+        end = min(len(self.content), pos + len(keyword) + context_length)
+
+        context = self.content[start:end]
+
+        # 尝试提取日期信息
+        date_match = re.search(r'(嘉靖\w+年\w+月\w+日?)', context)
+        date = date_match.group(1) if date_match else "未知日期"
+
+        return {
+            'position': pos,
+            'date': date,
+            'before': self.content[start:pos],
+            'keyword': keyword,
+            'after': self.content[pos + len(keyword):end],
+            'full_context': context
+        }
+
+    def concordance(self, keyword, sort='right', width=30):
+        """
+        关键词的 KWIC 索引行（按左/右侧上下文排序，分页读取，见 Concordance）
+        """
+        return Concordance(self.search_index(), keyword, sort=sort, width=width)
 
-            # 提取上下文
-            start = max(0, pos - context_length)
-            end = min(len(self.content), pos + len(keyword) + context_length)
+    def collocations(self, node, span=5, max_n=2, side='both', sort_by='log_likelihood', top=30):
+        """
+        节点词 ±span 字窗口内的搭配统计（对数似然 / t值 / 互信息，见 collocation.collocations）
 
-            context = self.content[start:end]
+        Args:
+            node: 节点词，如 '震怒'、'廷杖'
+            span: 左右窗口字数
+            sort_by: 'log_likelihood' / 't_score' / 'mi' / 'freq'
 
-            # 尝试提取日期信息
-            date_match = re.search(r'(嘉靖\w+年\w+月\w+日?)', context)
-            date = date_match.group(1) if date_match else "未知日期"
+        Returns:
+            list: 搭配词记录，按 sort_by 降序
+        """
+        return collocations(self.content, node, span=span, max_n=max_n, side=side,
+                            sort_by=sort_by, top=top)
 
-            contexts.append({
-                'position': pos,
-                'date': date,
-                'before': self.content[start:pos],
-                'keyword': keyword,
-                'after': self.content[pos + len(keyword):end],
-                'full_context': context
-            })
+    def cooccurrence_matrix(self, persons, event_keywords, window=500, by_entry=False, with_pairs=False):
+        """
+        人物 × 事件关键词 共现矩阵（一次计算全部组合）
 
-            pos += len(keyword)
+        Args:
+            persons: 人物名字列表
+            event_keywords: 事件关键词列表
+            window: 人物完整落在关键词前后各 window 字以内即计一次共现
+            by_entry: True 时改为同一日记录内共现
+            with_pairs: 是否保留全部配对位置
 
-        return contexts
+        Returns:
+            CooccurrenceMatrix
+        """
+        index = self.search_index()
+        entry_starts = index.date_index().offsets if by_entry else None
+        return cooccurrence(
+            {name: index.locate(name) for name in persons},
+            {keyword: index.locate(keyword) for keyword in event_keywords},
+            window=window, entry_starts=entry_starts, with_pairs=with_pairs
+        )
 
     def analyze_event(self, event_name, keywords):
         """
@@ -129,30 +198,31 @@ class EventAnalyzer:
 
         print(f"\n✓ 详细报告已保存: {output_file}")
 
-    def analyze_person_in_event(self, person_name, event_keywords):
+    def analyze_person_in_event(self, person_name, event_keywords, by_entry=False):
         """
         分析特定人物在事件中的表现
 
         Args:
             person_name: 人物名字
             event_keywords: 事件关键词列表
+            by_entry: True 时以"同一日记录"代替前后500字窗口
         """
         print("\n" + "=" * 60)
         print(f"人物在事件中的表现: {person_name}")
         print("=" * 60)
 
-        # 找到包含人物和事件关键词的段落
+        # 共现引擎一次求出人物与各事件关键词的全部配对，再只为命中的关键词位置切上下文
+        matrix = self.cooccurrence_matrix([person_name], event_keywords, window=500,
+                                          by_entry=by_entry, with_pairs=True)
         relevant_contexts = []
 
         for keyword in event_keywords:
-            contexts = self.find_event_contexts(keyword, context_length=500)
-
-            for ctx in contexts:
-                if person_name in ctx['full_context']:
-                    relevant_contexts.append({
-                        'event_keyword': keyword,
-                        'context': ctx
-                    })
+            positions = sorted(set(b for _, b in matrix.pairs_for(col_term=keyword)))
+            for pos in positions:
+                relevant_contexts.append({
+                    'event_keyword': keyword,
+                    'context': self._context_at(pos, keyword, 500)
+                })
 
         if not relevant_contexts:
             print(f"\n❌ 未找到 '{person_name}' 在相关事件中的记录")
@@ -261,9 +331,11 @@ def main():
     print("3. 大礼议整体分析")
     print("4. 分析特定人物在事件中的表现")
     print("5. 自定义事件分析")
+    print("6. 关键词搭配统计")
+    print("7. 相似条目检索")
     print("=" * 60)
 
-    choice = input("\n请选择 (1-5): ").strip()
+    choice = input("\n请选择 (1-7): ").strip()
 
     if choice == "1":
         # 左顺门事件
@@ -313,6 +385,26 @@ def main():
 
         analyzer.analyze_event(event_name, keywords)
 
+    elif choice == "6":
+        # 搭配统计
+        node = input("\n请输入节点词 (如: 震怒, 廷杖): ").strip()
+        span = int(input("窗口字数 (默认5): ").strip() or 5)
+
+        rows = analyzer.collocations(node, span=span)
+        print(f"\n'{node}' ±{span}字 搭配 (按对数似然排序):")
+        print(f"  {'搭配':<6}{'共现':>6}{'全文':>8}{'LL':>10}{'t值':>8}{'MI':>8}")
+        for row in rows:
+            print(f"  {row['collocate']:<6}{row['freq']:>6}{row['corpus_freq']:>8}"
+                  f"{row['log_likelihood']:>10.1f}{row['t_score']:>8.2f}{row['mi']:>8.2f}")
+
+    elif choice == "7":
+        # 相似条目
+        query = input("\n请输入一段文字 (如: 廷杖 下狱 伏阙): ").strip()
+        index = analyzer.entry_index()
+        print(f"\n条目数: {index.shape[0]:,}  特征数: {index.shape[1]:,}  非零元: {index.nnz:,}")
+        for row in analyzer.similar_entries(query):
+            print(f"  [{row['score']:.3f}] {row['date']}  {row['preview']}")
+
     else:
         print("❌ 无效选择")
 
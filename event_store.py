@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+列式事件表 - 命中事件按列存放，上下文按需切片
+
+解决问题：
+每个命中都把前后数百字的上下文复制进一个 dict，
+全朝文本上是数百万个 dict、数百MB重复文本
+
+方法：
+1. 每个事件只存 5 列定长数值：偏移(4B) + 关键词ID(2B) + 页码(2B) + 权重(4B) + 日序号(4B) = 16B
+2. 上下文、日期字符串等只在报告或后续阶段真正访问时才从原文切片
+3. Event 是对某一行的只读视图，支持 event['keyword'] / event['context'] 等原有写法
+"""
+import re
+
+import numpy as np
+
+from date_index import UNKNOWN_ORDINAL
+from hit_table import bucket_label
+
+
+# 点校本页码：前言部分为"- 12 - 正文……"，正文部分为书眉"……实录"下一行行首的页码
+PAGE_PATTERN = re.compile(r'^-\s*(\d+)\s*-|实录[ \t]*\n(\d+)\s', re.MULTILINE)
+
+# 上下文中的日期（没有日序号的事件才用它兜底）
+CONTEXT_DATE_PATTERN = re.compile(r'(嘉靖\w+年\w+月\w+)')
+
+
+def build_page_index(text):
+    """
+    扫描页码行，返回 (页起始偏移数组, 页码数组)，用于偏移 → 页码的二分查找
+    """
+    offsets, pages = [], []
+    for match in PAGE_PATTERN.finditer(text):
+        group = 1 if match.group(1) else 2
+        offsets.append(match.start(group))
+        pages.append(int(match.group(group)))
+    return np.array(offsets, dtype=np.int64), np.array(pages, dtype=np.int32)
+
+
+def lookup_pages(page_index, positions):
+    """偏移 → 页码（第一页之前或无页码时为 -1）"""
+    page_offsets, pages = page_index
+    positions = np.asarray(positions, dtype=np.int64)
+    if len(page_offsets) == 0:
+        return np.full(len(positions), -1, dtype=np.int16)
+    idx = np.searchsorted(page_offsets, positions, side='right') - 1
+    return np.where(idx >= 0, pages[np.maximum(idx, 0)], -1).astype(np.int16)
+
+
+class Event:
+    """EventStore 中一行的只读视图，字段在访问时才计算"""
+
+    __slots__ = ('store', 'index')
+
+    FIELDS = ('position', 'date', 'keyword', 'ordinal', 'page', 'context')
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    def __getitem__(self, key):
+        store, i = self.store, self.index
+        if key == 'position':
+            return int(store.offsets[i])
+        if key == store.value_key:
+            return store.weight(i)
+        if key == 'keyword':
+            return store.keyword(i)
+        if key == 'ordinal':
+            return int(store.ordinals[i])
+        if key == 'page':
+            return int(store.pages[i])
+        if key == 'context':
+            return store.context(i)
+        if key == 'date':
+            return store.date(i)
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return list(self.FIELDS) + [self.store.value_key]
+
+    def to_dict(self):
+        """转为普通 dict（会切出上下文）"""
+        return {key: self[key] for key in self.keys()}
+
+    def __repr__(self):
+        return f"Event({self.store.keyword(self.index)!r} @ {int(self.store.offsets[self.index])})"
+
+
+class EventStore:
+    """列式事件表"""
+
+    def __init__(self, text, offsets, keyword_ids, weights, ordinals, pages, keywords,
+                 value_key='weight', context_length=200):
+        """
+        参数:
+            text: 原文（只保存引用，不复制）
+            offsets / keyword_ids / weights / ordinals / pages: 等长数组，每个事件一行
+            keywords: 关键词列表（关键词ID即下标）
+            value_key: 权重字段在 Event 中的名称（'weight' 或 'score'）
+            context_length: 上下文默认前后各取的字数
+        """
+        id_dtype = np.uint16 if len(keywords) <= np.iinfo(np.uint16).max else np.uint32
+        self.text = text
+        self.offsets = np.asarray(offsets, dtype=np.uint32)
+        self.keyword_ids = np.asarray(keyword_ids, dtype=id_dtype)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.ordinals = np.asarray(ordinals, dtype=np.int32)
+        self.pages = np.asarray(pages, dtype=np.int16)
+        self.keywords = keywords
+        self.value_key = value_key
+        self.context_length = context_length
+
+    @classmethod
+    def from_hits(cls, text, hits, matcher, category, date_index=None, page_index=None,
+                  value_key='weight', context_length=200):
+        """
+        由匹配结果 [(位置, 关键词ID), ...] 生成某一类别的事件表（按位置排序）
+
+        参数:
+            matcher: 带类别权重的 KeywordMatcher
+            category: 类别名，如 'toxicity'
+            date_index: DateIndex，用于标注日序号；缺省时日序号为 UNKNOWN_ORDINAL
+            page_index: build_page_index 的结果；缺省时现场扫描页码行
+        """
+        weight_vector = np.zeros(len(matcher.keywords), dtype=np.float32)
+        for kid, weight in matcher.categories[category].items():
+            weight_vector[kid] = weight
+
+        hits = np.array(sorted(hits), dtype=np.int64).reshape(-1, 2)
+        keep = weight_vector[hits[:, 1]] != 0 if len(hits) else np.zeros(0, dtype=bool)
+        offsets, keyword_ids = hits[keep, 0], hits[keep, 1]
+
+        if date_index is not None:
+            _, ordinals, _ = date_index.lookup(offsets)
+        else:
+            ordinals = np.full(len(offsets), UNKNOWN_ORDINAL, dtype=np.int32)
+        pages = lookup_pages(page_index if page_index is not None else build_page_index(text), offsets)
+
+        return cls(text, offsets, keyword_ids, weight_vector[keyword_ids], ordinals, pages,
+                   matcher.keywords, value_key, context_length)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __iter__(self):
+        for i in range(len(self.offsets)):
+            yield Event(self, i)
+
+    def __getitem__(self, key):
+        """整数下标返回 Event；切片或下标数组返回子表（共享原文）"""
+        if isinstance(key, (int, np.integer)):
+            if key < 0:
+                key += len(self.offsets)
+            if not 0 <= key < len(self.offsets):
+                raise IndexError(key)
+            return Event(self, int(key))
+        return self.take(key)
+
+    def take(self, indices):
+        """按下标（切片、布尔掩码或下标数组）取子表"""
+        return EventStore(
+            self.text, self.offsets[indices], self.keyword_ids[indices], self.weights[indices],
+            self.ordinals[indices], self.pages[indices], self.keywords,
+            self.value_key, self.context_length
+        )
+
+    @property
+    def nbytes(self):
+        """事件列占用的字节数（不含原文）"""
+        return sum(column.nbytes for column in
+                   (self.offsets, self.keyword_ids, self.weights, self.ordinals, self.pages))
+
+    def keyword(self, i):
+        return self.keywords[int(self.keyword_ids[i])]
+
+    def weight(self, i):
+        weight = float(self.weights[i])
+        return int(weight) if weight.is_integer() else weight
+
+    def total(self):
+        """权重总和"""
+        total = float(self.weights.sum(dtype=np.float64))
+        return int(total) if total.is_integer() else total
+
+    def keyword_counts(self):
+        """{关键词ID: 命中次数}"""
+        counts = np.bincount(self.keyword_ids, minlength=len(self.keywords))
+        return {kid: int(n) for kid, n in enumerate(counts.tolist()) if n}
+
+    def context(self, i, length=None):
+        """第 i 个事件前后各 length 字的上下文（从原文切片）"""
+        length = self.context_length if length is None else length
+        pos = int(self.offsets[i])
+        start = max(0, pos - length)
+        end = min(len(self.text), pos + len(self.keyword(i)) + length)
+        return self.text[start:end]
+
+    def date(self, i):
+        """
+        事件日期：有日序号时为公历日期（如 '1542-11-27'，与 hit_table.bucket_label('day') 相同），
+        否则取上下文中出现的"嘉靖X年X月X"字样，都没有时为"未知日期"
+
+        同一天的事件标签相同；按日期分组时宜直接用日序号，公历标签只用于显示
+        """
+        ordinal = int(self.ordinals[i])
+        if ordinal != UNKNOWN_ORDINAL:
+            return bucket_label('day', ordinal)
+        match = CONTEXT_DATE_PATTERN.search(self.context(i))
+        return match.group(1) if match else "未知日期"
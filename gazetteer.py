@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+实体名录 - 人名、官职、地名、事件用语的统一加载与单遍匹配
+
+解决问题：
+实体名单散落在代码里（extract_person_names 13个人名、search_palace_incident_keywords 约20个词），
+要扩充到几百上千个官员、官职、地名只能改代码；别名（张孚敬 / 张璁）也无法归并
+
+方法：
+1. 名录放在 gazetteer_data/*.tsv（每行：ID、规范名、别名、分组），文件名即实体类型
+2. 全部规范名与别名编译为一个最长匹配的 KeywordMatcher（字典树正则，按名录哈希缓存到磁盘），
+   每个词面形式映射到实体 ID —— 别名命中即归到规范名
+3. 对全文只扫描一遍（最左最长匹配：'明世宗' 不再重复计入 '世宗'），
+   得到带偏移的实体命中数组；命中结果按 语料哈希 + 名录哈希 缓存
+   名录变大只让字典树正则变大，不增加扫描遍数
+"""
+import hashlib
+import pickle
+from pathlib import Path
+
+import numpy as np
+
+from keyword_matcher import KeywordMatcher
+from positional_index import text_hash
+
+
+DEFAULT_DATA_DIR = Path(__file__).with_name('gazetteer_data')
+DEFAULT_CACHE_DIR = Path(__file__).with_name('.cache') / 'gazetteer'
+
+# KeywordMatcher 或命中缓存格式变化时递增，使旧缓存失效
+FORMAT_VERSION = 3
+
+# 进程内缓存：名录目录 -> (各文件修改时间, Gazetteer)
+_loaded = {}
+
+
+class Entity:
+    """一个实体（规范名 + 别名）"""
+
+    __slots__ = ('id', 'name', 'type', 'group', 'aliases')
+
+    def __init__(self, id, name, type, group='', aliases=()):
+        self.id = id
+        self.name = name
+        self.type = type
+        self.group = group
+        self.aliases = tuple(aliases)
+
+    @property
+    def surfaces(self):
+        """全部词面形式（规范名在前）"""
+        return (self.name,) + self.aliases
+
+    def __repr__(self):
+        return f"Entity({self.id!r}, {self.name!r}, type={self.type!r}, group={self.group!r})"
+
+
+class EntityHits:
+    """实体命中（列式数组，按位置升序）"""
+
+    def __init__(self, gazetteer, starts, ends, entity_ids):
+        self.gazetteer = gazetteer
+        self.starts = starts
+        self.ends = ends
+        self.entity_ids = entity_ids
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        """逐个产出 (起始位置, 结束位置, Entity)"""
+        entities = self.gazetteer.entities
+        for start, end, eid in zip(self.starts.tolist(), self.ends.tolist(),
+                                   self.entity_ids.tolist()):
+            yield start, end, entities[eid]
+
+    def counts(self):
+        """各实体命中次数数组（按名录中的实体下标）"""
+        return np.bincount(self.entity_ids, minlength=len(self.gazetteer.entities))
+
+    def count_dict(self):
+        """{规范名: 次数}（只含出现过的实体，按名录顺序）"""
+        entities = self.gazetteer.entities
+        return {entities[i].name: int(n) for i, n in enumerate(self.counts().tolist()) if n}
+
+    def positions(self, entity):
+        """某实体（Entity、ID 或任一词面形式）的全部命中起点"""
+        index = self.gazetteer.index_of(entity)
+        return self.starts[self.entity_ids == index]
+
+
+class Gazetteer:
+    """实体名录"""
+
+    def __init__(self, entities):
+        """
+        参数:
+            entities: Entity 列表（下标即实体下标）
+        """
+        self.entities = list(entities)
+        self._by_id = {entity.id: i for i, entity in enumerate(self.entities)}
+
+        # 词面形式 → 实体下标；同一词面出现在多个实体时以先出现者为准
+        self.surfaces = {}
+        self.conflicts = []
+        for i, entity in enumerate(self.entities):
+            for surface in entity.surfaces:
+                if not surface:
+                    continue
+                if surface in self.surfaces and self.surfaces[surface] != i:
+                    self.conflicts.append((surface, self.entities[self.surfaces[surface]].id, entity.id))
+                    continue
+                self.surfaces[surface] = i
+
+        self._matcher = None
+        self._surface_entity = None
+
+    @classmethod
+    def from_files(cls, data_dir=DEFAULT_DATA_DIR, types=None):
+        """
+        读取名录目录下的 *.tsv（文件名即实体类型）
+
+        每行：ID<TAB>规范名<TAB>别名（以|分隔）<TAB>分组；以"#"开头的行为注释
+        """
+        entities = []
+        for path in sorted(Path(data_dir).glob('*.tsv')):
+            entity_type = path.stem
+            if types is not None and entity_type not in types:
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.rstrip('\n')
+                    if not line.strip() or line.startswith('#'):
+                        continue
+                    fields = line.split('\t') + [''] * 3
+                    entity_id, name, aliases, group = (field.strip() for field in fields[:4])
+                    if not name:
+                        continue
+                    entities.append(Entity(
+                        entity_id or f"{entity_type}:{name}", name, entity_type, group,
+                        [a.strip() for a in aliases.split('|') if a.strip()]
+                    ))
+        return cls(entities)
+
+    def __len__(self):
+        return len(self.entities)
+
+    @property
+    def hash(self):
+        """名录内容哈希"""
+        canonical = repr([(e.id, e.name, e.type, e.group, e.aliases) for e in self.entities])
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+
+    def select(self, types=None, groups=None):
+        """按实体类型和/或分组取子名录"""
+        return Gazetteer([
+            entity for entity in self.entities
+            if (types is None or entity.type in types)
+            and (groups is None or entity.group in groups)
+        ])
+
+    def index_of(self, entity):
+        """Entity / 实体ID / 词面形式 → 实体下标"""
+        if isinstance(entity, Entity):
+            entity = entity.id
+        if entity in self._by_id:
+            return self._by_id[entity]
+        return self.surfaces[entity]
+
+    def lookup(self, surface):
+        """词面形式（规范名或别名）→ Entity；未收录时返回 None"""
+        index = self.surfaces.get(surface)
+        return self.entities[index] if index is not None else None
+
+    def compile(self, cache_dir=DEFAULT_CACHE_DIR):
+        """
+        编译为最左最长匹配的 KeywordMatcher（全部词面形式写成一个字典树正则）
+
+        返回:
+            (matcher, 词面ID → 实体下标 数组)；按名录哈希缓存到 cache_dir
+        """
+        if self._matcher is not None:
+            return self._matcher, self._surface_entity
+
+        cache_file = None
+        matcher = None
+        if cache_dir is not None:
+            cache_file = Path(cache_dir) / f"{self.hash}-matcher-v{FORMAT_VERSION}.pkl"
+            if cache_file.exists():
+                try:
+                    with open(cache_file, 'rb') as f:
+                        matcher = pickle.load(f)
+                except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+                    matcher = None
+
+        if matcher is None:
+            matcher = KeywordMatcher(list(self.surfaces), longest_match=True)
+            if cache_file is not None:
+                cache_file.parent.mkdir(parents=True, exist_ok=True)
+                with open(cache_file, 'wb') as f:
+                    pickle.dump(matcher, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        self._matcher = matcher
+        self._surface_entity = np.array([self.surfaces[s] for s in matcher.keywords], dtype=np.int32)
+        return self._matcher, self._surface_entity
+
+    def find(self, text):
+        """对全文遍历一遍，得到全部实体命中（EntityHits）"""
+        matcher, surface_entity = self.compile()
+        starts = []
+        kids = []
+        for pos, kid in matcher.finditer(text):
+            starts.append(pos)
+            kids.append(kid)
+
+        starts = np.array(starts, dtype=np.int64)
+        kids = np.array(kids, dtype=np.int64)
+        lengths = np.array(matcher.lengths, dtype=np.int64)
+        ends = starts + (lengths[kids] if len(kids) else 0)
+        entity_ids = surface_entity[kids] if len(kids) else np.zeros(0, dtype=np.int32)
+        return EntityHits(self, starts, ends, entity_ids)
+
+    def scan(self, text, cache_dir=DEFAULT_CACHE_DIR):
+        """
+        同 find，命中数组按 语料哈希 + 名录哈希 保存为 .npz，再次扫描同一文本时直接读取
+        """
+        if cache_dir is None:
+            return self.find(text)
+
+        path = Path(cache_dir) / f"{text_hash(text)[:32]}-{self.hash}-v{FORMAT_VERSION}.hits.npz"
+        if path.exists():
+            try:
+                with np.load(path) as data:
+                    return EntityHits(self, data['starts'], data['ends'], data['entity_ids'])
+            except (OSError, ValueError, KeyError):
+                pass
+
+        hits = self.find(text)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, starts=hits.starts, ends=hits.ends, entity_ids=hits.entity_ids)
+        tmp_path.replace(path)
+        return hits
+
+    def counts(self, text):
+        """{规范名: 次数}（别名命中计入规范名）"""
+        return self.scan(text).count_dict()
+
+
+def load_gazetteer(data_dir=DEFAULT_DATA_DIR):
+    """
+    读取名录（同一进程内按各文件修改时间缓存，多个分析器共用同一对象）
+    """
+    data_dir = Path(data_dir).resolve()
+    mtimes = tuple((p.name, p.stat().st_mtime_ns) for p in sorted(data_dir.glob('*.tsv')))
+
+    cached = _loaded.get(data_dir)
+    if cached and cached[0] == mtimes:
+        return cached[1]
+
+    gazetteer = Gazetteer.from_files(data_dir)
+    _loaded[data_dir] = (mtimes, gazetteer)
+    return gazetteer
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+关键词命中表 - 一次匹配，多粒度重采样
+
+解决问题：
+按月聚合是唯一的时间粒度，想看按日、按旬、按年的序列就得另写脚本重新扫描文本
+
+方法：
+1. 匹配阶段把每个命中记为一行：(偏移, 关键词ID, 日序号, 月序号, 月内日)
+2. 重采样只对这些数组做 np.bincount 分组求和，不再读取文本
+3. 支持 日(day) / 旬(xun) / 月(month) / 季(season) / 年(year) 五种粒度
+"""
+from datetime import timedelta
+from pathlib import Path
+
+import numpy as np
+
+from date_index import UNKNOWN_ORDINAL, DateIndex
+from date_parser import ChineseCalendar
+
+
+FREQUENCIES = ('day', 'xun', 'month', 'season', 'year')
+
+SEASON_NAMES = ['春', '夏', '秋', '冬']
+XUN_NAMES = ['上旬', '中旬', '下旬']
+
+
+class HitTable:
+    """关键词命中表（列式存储）"""
+
+    def __init__(self, offsets, keyword_ids, ordinals, months, mdays, keywords, categories):
+        """
+        参数:
+            offsets / keyword_ids / ordinals / months / mdays: 等长数组，每个命中一行
+            keywords: 关键词列表（关键词ID即下标）
+            categories: {类别名: {关键词ID: 权重}}
+        """
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.keyword_ids = np.asarray(keyword_ids, dtype=np.int32)
+        self.ordinals = np.asarray(ordinals, dtype=np.int32)
+        self.months = np.asarray(months, dtype=np.int32)
+        self.mdays = np.asarray(mdays, dtype=np.int8)
+        self.keywords = list(keywords)
+        self.categories = categories
+
+    @classmethod
+    def scan(cls, text, matcher, date_index=None):
+        """
+        对全文做一次匹配，生成命中表
+
+        参数:
+            matcher: KeywordMatcher（需带类别权重，如 Lexicon.compile() 的结果）
+            date_index: DateIndex，默认由 text 现场构建
+        """
+        if date_index is None:
+            date_index = DateIndex.build(text)
+        return cls.from_hits(matcher.finditer(text), matcher, date_index)
+
+    @classmethod
+    def from_hits(cls, hits, matcher, date_index):
+        """由已有的匹配结果 [(位置, 关键词ID), ...] 生成命中表（不再扫描文本）"""
+        hits = sorted(hits)
+        offsets = np.array([pos for pos, _ in hits], dtype=np.int64)
+        keyword_ids = np.array([kid for _, kid in hits], dtype=np.int32)
+        months, ordinals, mdays = date_index.lookup(offsets)
+
+        return cls(offsets, keyword_ids, ordinals, months, mdays,
+                   matcher.keywords, matcher.categories)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def weight_vector(self, category, weights=None):
+        """
+        某类别按关键词ID排列的权重向量
+
+        参数:
+            weights: 可选 {关键词: 权重}，覆盖编译时的权重（调权重不必重新匹配）
+        """
+        vector = np.zeros(len(self.keywords), dtype=np.float64)
+        if weights is not None:
+            for kid, keyword in enumerate(self.keywords):
+                vector[kid] = weights.get(keyword, 0)
+        else:
+            for kid, weight in self.categories[category].items():
+                vector[kid] = weight
+        return vector
+
+    def bucket_ids(self, freq):
+        """
+        每个命中所属的时间桶编号，无法确定时为 UNKNOWN_ORDINAL（日序号可以为负，不用 -1）
+
+        桶编号:
+            day: 日序号
+            xun: 月序号 * 3 + (0上旬 / 1中旬 / 2下旬)
+            month: 月序号
+            season: 月序号 // 3（嘉靖年 × 春夏秋冬）
+            year: 月序号 // 12（嘉靖年 - 1）
+        """
+        if freq == 'day':
+            return self.ordinals.astype(np.int64)
+
+        months = self.months.astype(np.int64)
+        if freq == 'month':
+            return np.where(months >= 0, months, UNKNOWN_ORDINAL)
+        if freq == 'season':
+            return np.where(months >= 0, months // 3, UNKNOWN_ORDINAL)
+        if freq == 'year':
+            return np.where(months >= 0, months // 12, UNKNOWN_ORDINAL)
+        if freq == 'xun':
+            xun = np.minimum((self.mdays.astype(np.int64) - 1) // 10, 2)
+            return np.where((months >= 0) & (self.mdays > 0), months * 3 + xun, UNKNOWN_ORDINAL)
+
+        raise ValueError(f"不支持的粒度: {freq}，可选 {', '.join(FREQUENCIES)}")
+
+    def resample(self, category, freq='month', weighted=True, weights=None):
+        """
+        按指定粒度汇总某类别的分数（或命中次数）
+
+        参数:
+            category: 类别名，如 'toxicity'
+            freq: 'day' / 'xun' / 'month' / 'season' / 'year'
+            weighted: True 为加权分数，False 为命中次数
+            weights: 可选 {关键词: 权重}，临时覆盖权重
+
+        返回:
+            (桶编号数组, 数值数组)：覆盖从最早到最晚的连续桶，空桶为 0
+        """
+        vector = self.weight_vector(category, weights)
+        values = vector[self.keyword_ids] if weighted else (vector[self.keyword_ids] != 0).astype(np.float64)
+
+        buckets = self.bucket_ids(freq)
+        keep = (buckets != UNKNOWN_ORDINAL) & (values != 0)
+        if not keep.any():
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+
+        buckets = buckets[keep]
+        first = buckets.min()
+        sums = np.bincount(buckets - first, weights=values[keep])
+        return np.arange(first, first + len(sums), dtype=np.int64), sums
+
+    def save(self, path):
+        """保存为 .npz（类别权重以 类别名/关键词ID/权重 三列保存）"""
+        cat_names, cat_kids, cat_weights = [], [], []
+        for name, weights in self.categories.items():
+            for kid, weight in weights.items():
+                cat_names.append(name)
+                cat_kids.append(kid)
+                cat_weights.append(weight)
+
+        np.savez_compressed(
+            path,
+            offsets=self.offsets, keyword_ids=self.keyword_ids,
+            ordinals=self.ordinals, months=self.months, mdays=self.mdays,
+            keywords=np.array(self.keywords),
+            cat_names=np.array(cat_names), cat_kids=np.array(cat_kids, dtype=np.int32),
+            cat_weights=np.array(cat_weights, dtype=np.float64)
+        )
+
+    @classmethod
+    def load(cls, path):
+        """读取 .npz"""
+        with np.load(Path(path)) as data:
+            categories = {}
+            for name, kid, weight in zip(data['cat_names'].tolist(),
+                                         data['cat_kids'].tolist(),
+                                         data['cat_weights'].tolist()):
+                categories.setdefault(name, {})[kid] = weight
+
+            return cls(
+                data['offsets'], data['keyword_ids'], data['ordinals'],
+                data['months'], data['mdays'],
+                [str(k) for k in data['keywords']], categories
+            )
+
+
+def bucket_label(freq, bucket):
+    """桶编号 → 可读标签，如 '嘉靖21年10月'、'嘉靖21年10月中旬'、'嘉靖21年冬'"""
+    bucket = int(bucket)
+    if freq == 'day':
+        return (ChineseCalendar.JIAJING_START + timedelta(days=bucket)).strftime('%Y-%m-%d')
+    if freq == 'xun':
+        month, xun = divmod(bucket, 3)
+        return f"嘉靖{month // 12 + 1}年{month % 12 + 1}月{XUN_NAMES[xun]}"
+    if freq == 'month':
+        return f"嘉靖{bucket // 12 + 1}年{bucket % 12 + 1}月"
+    if freq == 'season':
+        return f"嘉靖{bucket // 4 + 1}年{SEASON_NAMES[bucket % 4]}"
+    if freq == 'year':
+        return f"嘉靖{bucket + 1}年"
+    raise ValueError(f"不支持的粒度: {freq}，可选 {', '.join(FREQUENCIES)}")
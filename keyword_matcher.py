@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""
+多模式关键词匹配器 - 统一的关键词计数与定位接口
+
+解决问题：
+各分析器各自写 text.count(keyword) 循环，计数语义（是否重叠、'怒' 是否计入 '震怒'）不统一，
+需要命中位置时又要另写 find 循环
+
+方法：
+1. 词表按公共前缀编译为一个正则（字典树写成嵌套分组，较长的延伸优先），
+   无论词表多大，全文只由正则引擎（C 实现）扫描一遍，不在 Python 层逐字符遍历
+2. 默认语义与 str.count 一致（各关键词独立计数）：正则包在前瞻 (?=...) 里，
+   每个起点报告从此处开始的最长关键词，同一起点的较短关键词必是它的前缀，
+   由预先算好的前缀表展开；只有首尾能重叠的词（如'哈哈'）需要逐词记录上次结束位置，
+   保证同一关键词的出现互不重叠
+3. 可选"最长匹配"语义：'怒'不再重复计入'震怒'，'杖'不再重复计入'廷杖'；
+   同一个字典树正则直接消耗匹配，得到最左最长、互不重叠的命中
+"""
+import re
+from collections import Counter
+
+
+class KeywordMatcher:
+    """多模式关键词匹配器"""
+
+    def __init__(self, keywords, longest_match=False):
+        """
+        参数:
+            keywords: 关键词序列（顺序即关键词ID）
+            longest_match: True时采用最左最长、互不重叠的匹配语义；
+                           False时与 str.count 一致（各关键词独立计数）
+        """
+        self.keywords = []
+        self.index = {}
+        for keyword in keywords:
+            if keyword and keyword not in self.index:
+                self.index[keyword] = len(self.keywords)
+                self.keywords.append(keyword)
+
+        self.lengths = [len(k) for k in self.keywords]
+        self.longest_match = longest_match
+        self.categories = {}
+
+        self._build()
+
+    @classmethod
+    def from_categories(cls, categories, longest_match=False):
+        """
+        由分类词表构建匹配器
+
+        参数:
+            categories: {类别名: {关键词: 权重}}，如
+                        {'toxicity': {'进丹': 10, ...}, 'tyranny': {...}}
+        """
+        keywords = []
+        for weights in categories.values():
+            keywords.extend(weights.keys())
+
+        matcher = cls(keywords, longest_match=longest_match)
+        for name, weights in categories.items():
+            matcher.categories[name] = {
+                matcher.index[keyword]: weight
+                for keyword, weight in weights.items()
+            }
+        return matcher
+
+    def _build(self):
+        """
+        编译字典树正则：关键词按公共前缀组织成字典树，再写成嵌套分组，
+        结尾可选的延伸部分用贪婪 ?，同一起点总是先试更长的关键词
+
+        同时准备默认语义所需的两张表：
+            _prefixes[kid]: 是该关键词前缀的全部关键词ID（含自身，升序）
+            _self_overlapping: 自身首尾可重叠的关键词ID（需要逐词去重叠）
+        """
+        trie = {}
+        for keyword in self.keywords:
+            node = trie
+            for ch in keyword:
+                node = node.setdefault(ch, {})
+            node[''] = True
+
+        def to_regex(node):
+            branches = [re.escape(ch) + to_regex(child)
+                        for ch, child in sorted(node.items()) if ch]
+            if not branches:
+                return ''
+            body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+            if '' in node:
+                # 当前前缀本身是关键词：能延伸时优先延伸
+                return '(?:' + body + ')?'
+            return body
+
+        body = to_regex(trie) if self.keywords else None
+        self._pattern = re.compile(body) if body else None
+        # 先用首字字符集前瞻：正则引擎据此跳过不可能的起点，比逐位置尝试整个字典树快一个数量级
+        firsts = ''.join(sorted({keyword[0] for keyword in self.keywords}))
+        self._all_starts = re.compile('(?=[' + re.escape(firsts) + '])(?=(' + body + '))') if body else None
+
+        self._prefixes = [
+            sorted(self.index[keyword[:n]] for n in range(1, len(keyword) + 1) if keyword[:n] in self.index)
+            for keyword in self.keywords
+        ]
+        self._self_overlapping = {
+            kid for kid, keyword in enumerate(self.keywords)
+            if any(keyword[n:] == keyword[:len(keyword) - n] for n in range(1, len(keyword)))
+        }
+
+    def finditer(self, text, start=0, end=None):
+        """
+        查找文本 text[start:end] 中的关键词
+
+        返回:
+            生成器，按位置升序产出 (位置, 关键词ID)，位置为在 text 中的绝对偏移
+        """
+        if end is None:
+            end = len(text)
+        if not self.keywords:
+            return
+
+        if self.longest_match:
+            # 最左最长、互不重叠：正则引擎（C 实现）一次扫描
+            index = self.index
+            for match in self._pattern.finditer(text, start, end):
+                yield match.start(), index[match.group()]
+            return
+
+        # 与 str.count 一致：一遍扫描得到每个起点上的最长关键词，再展开其前缀关键词；
+        # 首尾可重叠的关键词跳过与上一次出现重叠的命中
+        index, prefixes, lengths = self.index, self._prefixes, self.lengths
+        overlapping = self._self_overlapping
+        last_end = {}
+        for match in self._all_starts.finditer(text, start, end):
+            pos = match.start()
+            for kid in prefixes[index[match.group(1)]]:
+                if kid in overlapping:
+                    if pos < last_end.get(kid, 0):
+                        continue
+                    last_end[kid] = pos + lengths[kid]
+                yield pos, kid
+
+    def count(self, text, start=0, end=None):
+        """
+        统计 text[start:end] 中每个关键词的出现次数
+
+        返回:
+            List[int]: 按关键词ID排列的计数
+        """
+        if end is None:
+            end = len(text)
+        counts = [0] * len(self.keywords)
+        if not self.keywords:
+            return counts
+
+        if not self.longest_match and not self._self_overlapping:
+            # 各关键词独立计数（与 str.count 结果一致）：按起点上的最长关键词汇总，
+            # 再把次数加到它的每个前缀关键词上
+            index, prefixes = self.index, self._prefixes
+            for keyword, n in Counter(self._all_starts.findall(text, start, end)).items():
+                for kid in prefixes[index[keyword]]:
+                    counts[kid] += n
+            return counts
+
+        for _, kid in self.finditer(text, start, end):
+            counts[kid] += 1
+        return counts
+
+    def count_spans(self, text, spans):
+        """
+        统计多个区间 [(起点, 终点), ...] 上的关键词出现次数之和
+
+        区间直接在原文上遍历，不需要先拼接成新字符串
+        """
+        counts = [0] * len(self.keywords)
+        for start, end in spans:
+            for kid, n in enumerate(self.count(text, start, end)):
+                counts[kid] += n
+        return counts
+
+    def count_dict(self, text, start=0, end=None):
+        """统计出现次数，返回 {关键词: 次数}（只含出现过的关键词）"""
+        counts = self.count(text, start, end)
+        return {self.keywords[kid]: n for kid, n in enumerate(counts) if n}
+
+    def category_counts(self, counts):
+        """按类别汇总出现次数：{类别名: 命中次数}"""
+        return {
+            name: sum(counts[kid] for kid in weights)
+            for name, weights in self.categories.items()
+        }
+
+    def category_scores(self, counts):
+        """按类别汇总加权分数：{类别名: Σ 权重 × 次数}"""
+        return {
+            name: sum(weight * counts[kid] for kid, weight in weights.items())
+            for name, weights in self.categories.items()
+        }
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+关键词词表加载器 - 统一读取 config.json
+
+解决问题：
+config.json 中定义了分组的关键词权重，但 MonthlyAnalyzer、ToxicityTyrannyAnalyzer、
+RenyinAnalyzer 各自在代码里硬编码了不同的词表，结果无法互相对照
+
+方法：
+1. 从 config.json 读取 toxicity / tyranny / control 三类分组词表及分析参数
+2. 对词表内容计算哈希，作为词表版本号
+3. 编译好的匹配自动机按哈希缓存到磁盘，词表不变时直接读取，跳过编译
+"""
+import hashlib
+import json
+import pickle
+from pathlib import Path
+
+from keyword_matcher import KeywordMatcher
+
+
+DEFAULT_CONFIG_FILE = Path(__file__).with_name('config.json')
+DEFAULT_CACHE_DIR = Path(__file__).with_name('.cache') / 'lexicon'
+
+# config.json 中的词表段 -> 类别名
+CATEGORY_SECTIONS = {
+    'toxicity': 'toxicity_keywords',
+    'tyranny': 'tyranny_keywords',
+    'control': 'control_keywords'
+}
+
+# KeywordMatcher 的序列化格式变化时递增，使旧缓存失效
+MATCHER_FORMAT_VERSION = 3
+
+# 进程内缓存：配置文件路径 -> (修改时间, Lexicon)
+_loaded = {}
+
+
+class Lexicon:
+    """分组关键词词表"""
+
+    def __init__(self, groups, parameters=None):
+        """
+        参数:
+            groups: {类别名: {分组名: {关键词: 权重}}}
+            parameters: config.json 中的 analysis_parameters
+        """
+        self.groups = groups
+        self.parameters = parameters or {}
+        self._matchers = {}
+
+    @classmethod
+    def from_config(cls, config_file=DEFAULT_CONFIG_FILE):
+        """从 config.json 读取词表（以"_"开头的键视为注释，跳过）"""
+        with open(config_file, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+
+        groups = {}
+        for category, section in CATEGORY_SECTIONS.items():
+            groups[category] = {
+                group: dict(keywords)
+                for group, keywords in config.get(section, {}).items()
+                if not group.startswith('_')
+            }
+
+        parameters = {
+            key: value
+            for key, value in config.get('analysis_parameters', {}).items()
+            if not key.startswith('_')
+        }
+        return cls(groups, parameters)
+
+    def weights(self, category, groups=None):
+        """
+        某一类别的扁平词表 {关键词: 权重}
+
+        参数:
+            groups: 只取指定分组，默认全部；同一关键词出现在多个分组时取最高权重
+        """
+        flat = {}
+        for group, keywords in self.groups.get(category, {}).items():
+            if groups is not None and group not in groups:
+                continue
+            for keyword, weight in keywords.items():
+                flat[keyword] = max(weight, flat.get(keyword, weight))
+        return flat
+
+    def categories(self):
+        """全部类别的扁平词表 {类别名: {关键词: 权重}}"""
+        return {category: self.weights(category) for category in self.groups}
+
+    @property
+    def hash(self):
+        """词表内容哈希（与键顺序、注释无关）"""
+        canonical = json.dumps(self.groups, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+
+    def compile(self, longest_match=False, cache_dir=DEFAULT_CACHE_DIR):
+        """
+        编译为 KeywordMatcher（类别名即 toxicity / tyranny / control）
+
+        编译结果缓存到 cache_dir/<词表哈希>-<匹配语义>.pkl，
+        词表未变时直接读取；cache_dir 为 None 时不使用磁盘缓存
+        """
+        mode = 'longest' if longest_match else 'all'
+        if mode in self._matchers:
+            return self._matchers[mode]
+
+        cache_file = None
+        matcher = None
+
+        if cache_dir is not None:
+            cache_file = Path(cache_dir) / f"{self.hash}-{mode}-v{MATCHER_FORMAT_VERSION}.pkl"
+            if cache_file.exists():
+                try:
+                    with open(cache_file, 'rb') as f:
+                        matcher = pickle.load(f)
+                except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+                    matcher = None
+
+        if matcher is None:
+            matcher = KeywordMatcher.from_categories(self.categories(), longest_match=longest_match)
+            if cache_file is not None:
+                cache_file.parent.mkdir(parents=True, exist_ok=True)
+                with open(cache_file, 'wb') as f:
+                    pickle.dump(matcher, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        self._matchers[mode] = matcher
+        return matcher
+
+
+def load_lexicon(config_file=DEFAULT_CONFIG_FILE):
+    """
+    读取词表（同一进程内按配置文件修改时间缓存，多个分析器共用同一对象）
+    """
+    path = Path(config_file).resolve()
+    mtime = path.stat().st_mtime_ns
+
+    cached = _loaded.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    lexicon = Lexicon.from_config(path)
+    _loaded[path] = (mtime, lexicon)
+    return lexicon
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+人物提及矩阵 - 人物 × 卷、人物 × 月 的一次性计数
+
+解决问题：
+analyze_all 先对合并全文逐个人名 text.count，再对每个高频人物逐卷 text.count；
+人名一多（几百个官员），扫描次数 = 人数 × (卷数 + 1)
+
+方法：
+1. 人名表交给共享位置索引，缺少的人名共用一个 KeywordMatcher 一遍扫出（语义同 str.count）
+2. 命中位置二分到卷（卷起始偏移）与月（DateIndex），bincount 得到稠密矩阵：
+   人物 × 卷、人物 × 月（第0列为日期未知）
+3. 也可以名录实体为行（gazetteer，别名归并到规范名）
+4. 矩阵按 语料哈希 + 人名表（或名录）/卷划分哈希 保存在位置索引旁（.npz），
+   再次打开时直接读取，分布图与排名只是矩阵切片
+"""
+from pathlib import Path
+
+import numpy as np
+
+from date_index import DateIndex
+from hit_table import bucket_label
+from partial_cache import key_hash
+from positional_index import DEFAULT_CACHE_DIR, corpus_index, text_hash
+
+
+class MentionMatrix:
+    """人物提及计数矩阵"""
+
+    def __init__(self, persons, volume_labels, by_volume, by_month):
+        """
+        参数:
+            persons: 人名列表（行）
+            volume_labels: 卷标列表（by_volume 的列）
+            by_volume: (人数, 卷数) 计数矩阵
+            by_month: (人数, 月数+1) 计数矩阵，第0列为日期未知，第 m+1 列为月序号 m
+        """
+        self.persons = list(persons)
+        self.volume_labels = list(volume_labels)
+        self.by_volume = by_volume
+        self.by_month = by_month
+        self._rows = {person: i for i, person in enumerate(self.persons)}
+
+    @classmethod
+    def build(cls, text, persons, volume_starts=None, volume_labels=None, date_index=None):
+        """
+        由全文一遍统计
+
+        参数:
+            volume_starts / volume_labels: 各卷起始偏移与卷标（见 suffix_array.pack_volumes），
+                                           缺省时视为一卷
+            date_index: 全文的日期索引，缺省时构建
+        """
+        persons = list(dict.fromkeys(persons))
+        index = corpus_index(text, persons)
+        arrays = [index.array(person).astype(np.int64) for person in persons]
+        positions = np.concatenate(arrays) if arrays else np.zeros(0, dtype=np.int64)
+        rows = np.repeat(np.arange(len(persons), dtype=np.int64), [len(a) for a in arrays])
+        return cls.from_positions(text, persons, positions, rows, volume_starts, volume_labels, date_index)
+
+    @classmethod
+    def from_positions(cls, text, persons, positions, rows, volume_starts=None, volume_labels=None,
+                       date_index=None):
+        """
+        由命中位置与其所属行（人物下标）汇总
+
+        参数:
+            positions / rows: 等长数组
+        """
+        volume_starts = (np.asarray(volume_starts, dtype=np.int64)
+                         if volume_starts is not None else np.zeros(1, dtype=np.int64))
+        volume_labels = list(volume_labels) if volume_labels is not None else [None]
+        if date_index is None:
+            date_index = DateIndex.build(text)
+        positions = np.asarray(positions, dtype=np.int64)
+        rows = np.asarray(rows, dtype=np.int64)
+
+        n_persons, n_volumes = len(persons), len(volume_starts)
+        volumes = np.searchsorted(volume_starts, positions, side='right') - 1
+        by_volume = np.bincount(rows * n_volumes + volumes,
+                                minlength=n_persons * n_volumes).reshape(n_persons, n_volumes)
+
+        months = date_index.lookup(positions)[0].astype(np.int64) + 1
+        n_months = int(max(months.max() if len(months) else 0,
+                           date_index.months.max() + 1 if len(date_index.months) else 0)) + 1
+        by_month = np.bincount(rows * n_months + months,
+                               minlength=n_persons * n_months).reshape(n_persons, n_months)
+
+        return cls(persons, volume_labels, by_volume, by_month)
+
+    @classmethod
+    def for_text(cls, text, persons, volume_starts=None, volume_labels=None,
+                 cache_dir=DEFAULT_CACHE_DIR):
+        """读取已保存的矩阵，不存在时构建并保存（与位置索引同目录）"""
+        persons = list(dict.fromkeys(persons))
+        return cls._cached(text, ('terms', persons), volume_starts, volume_labels, cache_dir,
+                           lambda: cls.build(text, persons, volume_starts, volume_labels))
+
+    @classmethod
+    def for_entities(cls, text, gazetteer, volume_starts=None, volume_labels=None,
+                     cache_dir=DEFAULT_CACHE_DIR):
+        """
+        以名录实体为行（别名命中计入规范名，见 Gazetteer.scan），读取或构建并保存
+        """
+        def build():
+            hits = gazetteer.scan(text)
+            return cls.from_positions(text, [entity.name for entity in gazetteer.entities],
+                                      hits.starts, hits.entity_ids, volume_starts, volume_labels)
+
+        return cls._cached(text, ('gazetteer', gazetteer.hash), volume_starts, volume_labels,
+                           cache_dir, build)
+
+    @classmethod
+    def _cached(cls, text, key, volume_starts, volume_labels, cache_dir, build):
+        starts = [] if volume_starts is None else [int(s) for s in volume_starts]
+        labels = [] if volume_labels is None else list(volume_labels)
+        path = None
+        if cache_dir is not None:
+            path = Path(cache_dir) / f"{text_hash(text)[:32]}-{key_hash(key, starts, labels)}.mentions.npz"
+            if path.exists():
+                try:
+                    return cls.load(path)
+                except (OSError, ValueError, KeyError):
+                    pass
+
+        matrix = build()
+        if path is not None:
+            matrix.save(path)
+        return matrix
+
+    def save(self, path):
+        """保存为 .npz（先写临时文件再改名）"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(
+                f, persons=np.array(self.persons, dtype=str),
+                volume_labels=np.array([str(v) for v in self.volume_labels], dtype=str),
+                volume_ints=np.array([isinstance(v, int) for v in self.volume_labels], dtype=bool),
+                by_volume=self.by_volume, by_month=self.by_month
+            )
+        tmp_path.replace(path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        """读取 .npz"""
+        with np.load(Path(path)) as data:
+            labels = [int(v) if is_int else v for v, is_int in
+                      zip(data['volume_labels'].tolist(), data['volume_ints'].tolist())]
+            return cls(data['persons'].tolist(), labels, data['by_volume'], data['by_month'])
+
+    def totals(self):
+        """{人名: 总提及次数}（按人名表顺序）"""
+        return dict(zip(self.persons, self.by_volume.sum(axis=1).tolist()))
+
+    def ranking(self, top=None):
+        """按总提及次数降序 [(人名, 次数), ...]，同频保持人名表顺序"""
+        totals = self.by_volume.sum(axis=1)
+        order = np.argsort(-totals, kind='stable')[:top]
+        return [(self.persons[i], int(totals[i])) for i in order.tolist()]
+
+    def volume_counts(self, person, nonzero=True):
+        """某人逐卷提及次数 [(卷标, 次数), ...]"""
+        row = self.by_volume[self._rows[person]]
+        return [(label, int(count)) for label, count in zip(self.volume_labels, row.tolist())
+                if count or not nonzero]
+
+    def month_counts(self, person, nonzero=True):
+        """某人逐月提及次数 [(月份标签, 次数), ...]，日期未知部分记为 '未知日期'"""
+        row = self.by_month[self._rows[person]]
+        result = []
+        for col, count in enumerate(row.tolist()):
+            if count or not nonzero:
+                label = bucket_label('month', col - 1) if col > 0 else "未知日期"
+                result.append((label, int(count)))
+        return result
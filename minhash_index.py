@@ -0,0 +1,403 @@
+# -*- coding: utf-8 -*-
+"""
+MinHash / LSH 相似条目检索 - "找出读起来像这一条的其他记录"
+
+解决问题：
+只有精确子串检索：想找与壬寅宫变记录（PDF第3679页）或某次廷杖记录措辞相近的其他条目，
+只能自己猜关键词；两两比较全朝两万个条目又太慢
+
+方法：
+1. 条目按日记录切分（entry_index.Entries），每个条目取字 k-gram（默认2字，不含非汉字）作为特征集合
+2. MinHash：k-gram 键先经 splitmix64 混合为 32 位，再用 num_perm 个 (a·x + b) mod p 哈希
+   （p = 2^61 - 1，a、b 取 32 位以内，a·x + b 不超过 2^64，uint64 运算不会溢出），
+   每个条目取各哈希的最小值作签名；按块（约 1M 字）计算，块内用 minimum.reduceat 按条目归并
+3. LSH 分带：签名切成 bands 段、每段 rows 个值折叠为一个桶键；两个条目在任一段桶键相同即为候选，
+   候选再用签名相同比例（Jaccard 估计）排序
+4. 每段的桶键按列排序后二分查找；新增条目先放在未排序的尾部（查询时线性比较），
+   尾部过长时才并入排序部分，已有条目的签名不重算
+5. 签名、桶键与条目信息保存为 .npz，按 语料哈希 + 参数 缓存
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from collocation import BITS, ngram_keys
+from entry_index import Entries
+from partial_cache import key_hash
+from positional_index import text_hash
+from term_discovery import is_hanzi
+
+if hasattr(sys.stdout, 'reconfigure'):
+    sys.stdout.reconfigure(encoding='utf-8')
+if hasattr(sys.stderr, 'reconfigure'):
+    sys.stderr.reconfigure(encoding='utf-8')
+
+
+DEFAULT_CACHE_DIR = Path(__file__).with_name('.cache') / 'minhash'
+
+# 签名或桶键算法变化时递增，使旧缓存失效
+FORMAT_VERSION = 3
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint32(0xFFFFFFFF)
+
+# 预览保留的字数
+PREVIEW_LENGTH = 60
+
+
+def _mix64(keys):
+    """splitmix64 终混：把 n-gram 键打散为均匀的 32 位值"""
+    z = keys + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return (z ^ (z >> np.uint64(31))) & np.uint64(0xFFFFFFFF)
+
+
+class MinHashIndex:
+    """条目 MinHash 签名 + LSH 分带索引"""
+
+    def __init__(self, num_perm=128, bands=64, shingle=2, seed=1, merge_threshold=4096):
+        """
+        参数:
+            num_perm: 签名长度（哈希函数个数）
+            bands: LSH 段数，每段 num_perm // bands 个值；
+                   相似度超过约 (1/bands)^(bands/num_perm) 的条目大概率成为候选
+            shingle: 字 k-gram 的 k（最长 64 // BITS）
+            merge_threshold: 未排序尾部超过该条数时并入排序部分
+        """
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) 需为 bands ({bands}) 的整数倍")
+        if shingle * BITS > 64:
+            raise ValueError(f"k-gram 长度不能超过 {64 // BITS}")
+
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle = shingle
+        self.seed = seed
+        self.merge_threshold = merge_threshold
+
+        rng = np.random.RandomState(seed)
+        # x < 2^32 且 a, b < 2^32，a·x + b < 2^64，取模前不会回绕
+        self._a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+        self.signatures = np.zeros((0, num_perm), dtype=np.uint32)
+        self.band_keys = np.zeros((0, bands), dtype=np.uint64)
+        self.positions = np.zeros(0, dtype=np.int64)
+        self.labels = []
+        self.previews = []
+
+        # 已排序部分：每段桶键升序及对应的条目下标；其后的条目为未排序尾部
+        self._sorted_count = 0
+        self._sorted_keys = np.zeros((bands, 0), dtype=np.uint64)
+        self._sorted_ids = np.zeros((bands, 0), dtype=np.int64)
+
+    def __len__(self):
+        return len(self.signatures)
+
+    @property
+    def params(self):
+        return (self.num_perm, self.bands, self.shingle, self.seed)
+
+    # ---- 签名 ----
+
+    def _hash_values(self, keys):
+        """k-gram 键 → (键数, num_perm) 哈希矩阵"""
+        x = _mix64(keys)[:, None]
+        y = self._a * x + self._b
+        # 模 2^61 - 1：高位折回低位，结果仍不小于 p 时再减一次
+        y = (y & MERSENNE_PRIME) + (y >> np.uint64(61))
+        y = np.where(y >= MERSENNE_PRIME, y - MERSENNE_PRIME, y)
+        return (y & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+    def signature_matrix(self, text, starts, ends, block_size=1 << 20):
+        """
+        一批条目（text 中 [starts, ends) 段，升序且不重叠）的签名矩阵
+
+        没有任何 k-gram 的条目签名全为 0xFFFFFFFF
+        """
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        signatures = np.full((len(starts), self.num_perm), MAX_HASH, dtype=np.uint32)
+        if len(starts) == 0:
+            return signatures
+
+        codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+        boundary_csum = np.concatenate([[0], np.cumsum(~is_hanzi(codes), dtype=np.int64)])
+        k = self.shingle
+        # 每块的 k-gram 数上限，控制 (键数 × num_perm) 哈希矩阵的大小
+        max_keys = max((1 << 25) // self.num_perm, 1)
+
+        lo = 0
+        while lo < len(starts):
+            hi = int(np.searchsorted(starts, starts[lo] + block_size, side='right'))
+            hi = max(hi, lo + 1)
+            # 条目内完整的 k-gram 起点
+            sizes = np.maximum(ends[lo:hi] - k + 1 - starts[lo:hi], 0)
+            offsets = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+            positions = np.repeat(starts[lo:hi], sizes) + offsets
+            rows = np.repeat(np.arange(lo, hi), sizes)
+            valid = boundary_csum[positions + k] == boundary_csum[positions]
+            positions, rows = positions[valid], rows[valid]
+
+            for s in range(0, len(positions), max_keys):
+                part_rows = rows[s:s + max_keys]
+                hashes = self._hash_values(ngram_keys(codes, positions[s:s + max_keys], k))
+                first = np.flatnonzero(np.concatenate([[True], part_rows[1:] != part_rows[:-1]]))
+                mins = np.minimum.reduceat(hashes, first, axis=0)
+                target = part_rows[first]
+                signatures[target] = np.minimum(signatures[target], mins)
+            lo = hi
+        return signatures
+
+    def signature(self, text):
+        """任意一段文字的签名"""
+        return self.signature_matrix(text, [0], [len(text)])[0]
+
+    def _band_keys(self, signatures):
+        """签名 → 每段的桶键（rows 个值按 FNV 方式折叠为 uint64）"""
+        blocks = signatures.reshape(len(signatures), self.bands, self.rows).astype(np.uint64)
+        keys = np.full((len(signatures), self.bands), 0xCBF29CE484222325, dtype=np.uint64)
+        for r in range(self.rows):
+            keys = (keys ^ blocks[:, :, r]) * np.uint64(0x100000001B3)
+        return keys
+
+    # ---- 增加条目 ----
+
+    def add(self, signatures, labels=None, positions=None, previews=None):
+        """
+        追加一批签名（不重算已有条目），返回新条目的下标数组
+
+        参数:
+            labels: 日期等标签
+            positions: 在语料中的起始偏移（语料外的条目为 -1）
+            previews: 开头若干字，用于展示结果
+        """
+        signatures = np.asarray(signatures, dtype=np.uint32).reshape(-1, self.num_perm)
+        count = len(signatures)
+        first = len(self.signatures)
+
+        self.signatures = np.concatenate([self.signatures, signatures])
+        self.band_keys = np.concatenate([self.band_keys, self._band_keys(signatures)])
+        self.positions = np.concatenate([
+            self.positions,
+            np.asarray(positions if positions is not None else [-1] * count, dtype=np.int64)
+        ])
+        self.labels.extend(labels if labels is not None else [''] * count)
+        self.previews.extend(previews if previews is not None else [''] * count)
+
+        if len(self) - self._sorted_count > self.merge_threshold:
+            self._merge()
+        return np.arange(first, first + count)
+
+    def add_entries(self, text, entries, dated_only=True):
+        """
+        由条目表追加语料中的条目
+
+        参数:
+            entries: entry_index.Entries
+            dated_only: 只收录以日记录开头的条目
+        """
+        ids = np.flatnonzero(entries.dated) if dated_only else np.arange(len(entries))
+        starts, ends = entries.starts[ids], entries.ends[ids]
+        signatures = self.signature_matrix(text, starts, ends)
+        return self.add(
+            signatures,
+            labels=[entries.label(i) for i in ids.tolist()],
+            positions=starts,
+            previews=[text[s:min(e, s + PREVIEW_LENGTH)].replace('\n', ' ')
+                      for s, e in zip(starts.tolist(), ends.tolist())]
+        )
+
+    def add_text(self, text, label='', position=-1):
+        """追加一个新条目（如新录入的一段记录），返回其下标"""
+        ids = self.add(self.signature(text)[None, :], [label], [position],
+                       [text[:PREVIEW_LENGTH].replace('\n', ' ')])
+        return int(ids[0])
+
+    def _merge(self):
+        """把未排序尾部并入各段的排序数组"""
+        count = len(self)
+        order = np.argsort(self.band_keys, axis=0, kind='stable').T
+        self._sorted_ids = order.astype(np.int64)
+        self._sorted_keys = np.take_along_axis(self.band_keys.T, order, axis=1)
+        self._sorted_count = count
+
+    # ---- 查询 ----
+
+    def candidates(self, signature):
+        """与签名在任一段桶键相同的条目下标（去重、升序）"""
+        keys = self._band_keys(np.asarray(signature, dtype=np.uint32)[None, :])[0]
+        found = []
+        if self._sorted_count:
+            lo = np.array([np.searchsorted(self._sorted_keys[j], keys[j], side='left')
+                           for j in range(self.bands)])
+            hi = np.array([np.searchsorted(self._sorted_keys[j], keys[j], side='right')
+                           for j in range(self.bands)])
+            for j in np.flatnonzero(hi > lo).tolist():
+                found.append(self._sorted_ids[j, lo[j]:hi[j]])
+        tail = self.band_keys[self._sorted_count:]
+        if len(tail):
+            found.append(self._sorted_count + np.flatnonzero((tail == keys).any(axis=1)))
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate(found))
+
+    def query(self, query, top=10, min_similarity=0.0, exclude_self=True):
+        """
+        与查询最相似的条目
+
+        参数:
+            query: 条目下标、签名数组或任意文字
+            min_similarity: Jaccard 估计下限
+
+        返回:
+            [{"entry": 下标, "similarity": Jaccard 估计, "date": 标签,
+              "position": 语料偏移, "preview": 开头若干字}, ...]，按相似度降序
+        """
+        exclude = None
+        if isinstance(query, (int, np.integer)):
+            exclude = int(query) if exclude_self else None
+            signature = self.signatures[int(query)]
+        elif isinstance(query, str):
+            signature = self.signature(query)
+        else:
+            signature = np.asarray(query, dtype=np.uint32)
+
+        if (signature == MAX_HASH).all():
+            return []
+
+        ids = self.candidates(signature)
+        if exclude is not None:
+            ids = ids[ids != exclude]
+        if len(ids) == 0:
+            return []
+
+        similarity = (self.signatures[ids] == signature).mean(axis=1)
+        keep = similarity >= min_similarity
+        ids, similarity = ids[keep], similarity[keep]
+        order = np.lexsort((ids, -similarity))[:top]
+
+        return [{
+            'entry': int(ids[i]),
+            'similarity': round(float(similarity[i]), 4),
+            'date': self.labels[ids[i]],
+            'position': int(self.positions[ids[i]]),
+            'preview': self.previews[ids[i]]
+        } for i in order.tolist()]
+
+    # ---- 保存 / 读取 ----
+
+    def save(self, path):
+        """保存为 .npz（先写临时文件再改名）；读取后可继续追加"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, params=np.array(self.params + (self.merge_threshold,), dtype=np.int64),
+                     signatures=self.signatures, band_keys=self.band_keys, positions=self.positions,
+                     labels=np.array(self.labels, dtype=str), previews=np.array(self.previews, dtype=str),
+                     sorted_count=np.int64(self._sorted_count),
+                     sorted_keys=self._sorted_keys, sorted_ids=self._sorted_ids)
+        tmp_path.replace(path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        """读取 .npz"""
+        with np.load(Path(path)) as data:
+            num_perm, bands, shingle, seed, merge_threshold = data['params'].tolist()
+            index = cls(num_perm, bands, shingle, seed, merge_threshold)
+            index.signatures = data['signatures']
+            index.band_keys = data['band_keys']
+            index.positions = data['positions']
+            index.labels = data['labels'].tolist()
+            index.previews = data['previews'].tolist()
+            index._sorted_count = int(data['sorted_count'])
+            index._sorted_keys = data['sorted_keys']
+            index._sorted_ids = data['sorted_ids']
+        if len(index.labels) != len(index.signatures):
+            raise ValueError("条目信息与签名数量不一致")
+        return index
+
+    @classmethod
+    def for_text(cls, text, volume_starts=None, num_perm=128, bands=64, shingle=2, seed=1,
+                 cache_dir=DEFAULT_CACHE_DIR):
+        """语料中全部日记录条目的索引：读取已保存的，不存在时构建并保存"""
+        path = None
+        if cache_dir is not None:
+            starts = [] if volume_starts is None else [int(s) for s in volume_starts]
+            params = key_hash(starts, num_perm, bands, shingle, seed, FORMAT_VERSION)
+            path = Path(cache_dir) / f"{text_hash(text)[:32]}-{params}.minhash.npz"
+            if path.exists():
+                try:
+                    return cls.load(path)
+                except (OSError, ValueError, KeyError):
+                    pass
+
+        index = cls(num_perm, bands, shingle, seed)
+        index.add_entries(text, Entries.build(text, volume_starts))
+        index._merge()
+        if path is not None:
+            index.save(path)
+        return index
+
+
+def main():
+    """构建条目索引并演示两个查询：壬寅宫变记录、廷杖记录"""
+    print("=" * 60)
+    print("MinHash / LSH 相似条目检索")
+    print("=" * 60)
+
+    files = [
+        Path("jiajing_data_from_pdf/complete_vol1-45.txt"),
+        Path("jiajing_data_from_pdf/renyin_gongbian_era_vol228-276.txt"),
+    ]
+    renyin_file = Path("jiajing_data_from_pdf/renyin_gongbian_EXACT_page3679.txt")
+
+    index = None
+    for path in files:
+        if not path.exists():
+            print(f"⚠️ 找不到 {path}，跳过")
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        start = time.time()
+        part = MinHashIndex.for_text(text)
+        print(f"✓ {path.name}: {len(part):,} 个条目 ({time.time() - start:.2f}s)")
+        if index is None:
+            index = part
+        else:
+            index.add(part.signatures, part.labels, [-1] * len(part), part.previews)
+
+    if index is None:
+        return
+
+    queries = []
+    if renyin_file.exists():
+        with open(renyin_file, 'r', encoding='utf-8') as f:
+            text = f.read()
+        # 宫变当日的记录（"宫婢杨金英等共谋大逆"所在条目）作为新条目追加，无需重建
+        entries = Entries.build(text)
+        pos = text.find('杨金英')
+        if pos >= 0:
+            i = int(entries.entry_of([pos])[0])
+            entry_id = index.add_text(entries.text(text, i), label=f"壬寅宫变 {entries.label(i)}")
+            queries.append(("壬寅宫变记录（PDF第3679页）", entry_id))
+    queries.append(("廷杖记录", "上怒，命锦衣卫执送镇抚司拷讯，杖于廷，多有死者"))
+
+    for title, query in queries:
+        start = time.time()
+        results = index.query(query, top=10)
+        print(f"\n【{title}】 {len(results)} 条 ({(time.time() - start) * 1000:.1f}ms)")
+        for row in results:
+            print(f"  [{row['similarity']:.3f}] {row['date']}  {row['preview']}")
+
+    print("\n" + "=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,84 +10,223 @@
 4. 可以准确定位关键月份（如嘉靖21年10月壬寅宫变）
 """
 import sys
-import re
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import json
 
+import numpy as np
+
+from date_index import FORMAT_VERSION as DATE_FORMAT_VERSION, DateIndex, YEAR_PATTERN, MONTH_PATTERN, cn_to_num
+from hit_table import HitTable
+from lexicon import DEFAULT_CONFIG_FILE, load_lexicon
+from partial_cache import PartialCache, content_hash, key_hash
+
 if hasattr(sys.stdout, 'reconfigure'):
     sys.stdout.reconfigure(encoding='utf-8')
 if hasattr(sys.stderr, 'reconfigure'):
     sys.stderr.reconfigure(encoding='utf-8')
 
 
-class MonthlyAnalyzer:
-    """月度时间序列分析器"""
+def scan_month_spans(content):
+    """
+    逐行扫描原文，按"当前年月状态"记录每行的区间
 
-    def __init__(self):
-        # 核心变量：重金属摄入（X轴）
-        self.toxicity_keywords = {
-            # 直接摄入 - 高权重
-            '进丹': 10, '赐药': 10, '服食': 10,
-            '红铅': 10, '秋石': 10, '甘露': 6,
-
-            # 炼丹人物
-            '陶仲文': 8, '邵元节': 8, '王金': 6,
-            '段朝用': 6, '顾可学': 6,
-
-            # 道教仪式（间接指标）
-            '醮': 5, '祷': 5, '祀': 3, '斋': 3,
-            '符': 4, '法': 2,
-
-            # 身体症状（中毒表现）
-            '不豫': 4, '心悸': 6, '眩晕': 5,
-            '震颤': 7, '暴躁': 5, '疾': 2
-        }
+    与 parse_text_by_month 不同，这里不丢弃年月未定的行：状态中尚未在本段文本里
+    出现过的年或月记为 None，由调用方用上一段文本结束时的状态补全。
+    这样多个文件分别扫描后，再按顺序合并，结果与整体扫描完全一致
+
+    返回:
+        (monthly_data, final_state)
+        monthly_data: {(year或None, month或None): {"spans": [...], "char_count": 字符数}}
+        final_state: 扫描结束时的 (year或None, month或None)
+    """
+    monthly_data = defaultdict(lambda: {'spans': [], 'char_count': 0})
+
+    current_year = None
+    current_month = None
+
+    # 逐行扫描原文（只移动偏移量，不切分出行列表）
+    pos = 0
+    total = len(content)
+
+    while pos <= total:
+        line_end = content.find('\n', pos)
+        if line_end == -1:
+            line_end = total
+
+        # 检测年份
+        year_match = YEAR_PATTERN.search(content, pos, line_end)
+        if year_match:
+            current_year = cn_to_num(year_match.group(1))
+
+        # 检测月份
+        month_match = MONTH_PATTERN.search(content, pos, line_end)
+        if month_match:
+            current_month = cn_to_num(month_match.group(1))
+
+        # 记录该行区间（与上一行相邻则合并）
+        data = monthly_data[(current_year, current_month)]
+        spans = data['spans']
+        if spans and spans[-1][1] + 1 == pos:
+            spans[-1] = (spans[-1][0], line_end)
+        else:
+            spans.append((pos, line_end))
+        data['char_count'] += line_end - pos
+
+        pos = line_end + 1
+
+    return dict(monthly_data), (current_year, current_month)
+
+
+# 工作进程内复用的分析器：(配置文件, 匹配语义) -> MonthlyAnalyzer
+_worker_analyzers = {}
 
-        # 核心变量：政治暴虐（Y轴）
-        self.tyranny_keywords = {
-            # 极端暴力 - 最高权重
-            '凌迟': 10, '磔': 10, '锉尸': 10,
-            '枭示': 8, '斩': 7,
 
-            # 廷杖（宫廷体罚）
-            '廷杖': 10, '杖': 5,
+def _worker_analyzer(config_file, longest_match):
+    """取得工作进程内复用的分析器"""
+    key = (str(config_file or DEFAULT_CONFIG_FILE), longest_match)
+    if key not in _worker_analyzers:
+        _worker_analyzers[key] = MonthlyAnalyzer(config_file or DEFAULT_CONFIG_FILE, longest_match)
+    return _worker_analyzers[key]
 
-            # 强制退休/降级
-            '致仕': 2, '削职': 5, '夺官': 5,
-            '罢': 3, '黜': 4,
 
-            # 情绪爆发
-            '震怒': 6, '大怒': 6, '怒': 3,
-            '斥': 4, '责': 2,
+def scan_file_hits(text_file, config_file=None, longest_match=False):
+    """
+    单个文件的关键词命中（进程池中执行）
 
-            # 宫变相关
-            '逆': 3, '谋': 2, '宫变': 10,
-            '弑': 10, '缢': 8
+    返回:
+        Dict: {"offsets": 文件内偏移数组, "keyword_ids": 关键词ID数组, "length": 文件字符数}
+    """
+    analyzer = _worker_analyzer(config_file, longest_match)
+
+    with open(text_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    hits = sorted(analyzer.matcher.finditer(content))
+    return {
+        'offsets': np.array([pos for pos, _ in hits], dtype=np.int64),
+        'keyword_ids': np.array([kid for _, kid in hits], dtype=np.int32),
+        'length': len(content)
+    }
+
+
+def count_file_partial(text_file, config_file=None, longest_match=False):
+    """
+    单个文件的部分聚合（进程池中执行）
+
+    返回:
+        Dict: {
+            "keys": [(year或None, month或None), ...],
+            "counts": int数组 (状态数, 关键词数),
+            "char_counts": int数组 (状态数,),
+            "keywords": 关键词列表,
+            "final_state": 文件结束时的 (year或None, month或None)
         }
+    """
+    analyzer = _worker_analyzer(config_file, longest_match)
+
+    with open(text_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    monthly_data, final_state = scan_month_spans(content)
+    keys = list(monthly_data.keys())
+    counts = np.zeros((len(keys), len(analyzer.matcher.keywords)), dtype=np.int64)
+    for row, state in enumerate(keys):
+        counts[row] = analyzer.matcher.count_spans(content, monthly_data[state]['spans'])
+
+    return {
+        'keys': keys,
+        'counts': counts,
+        'char_counts': np.array([monthly_data[k]['char_count'] for k in keys], dtype=np.int64),
+        'keywords': list(analyzer.matcher.keywords),
+        'final_state': final_state
+    }
+
+
+def merge_partials(partials):
+    """
+    按文件顺序合并部分聚合结果
+
+    年或月为 None 的状态用前一个文件结束时的状态补全；
+    补全后年、月都有效的行才计入（与单文件扫描的规则相同）
+
+    返回:
+        与 MonthlyAnalyzer.build_count_matrix 相同格式的计数矩阵（不含 longest_match）
+    """
+    merged = {}
+    prev_year, prev_month = None, None
+    keywords = partials[0]['keywords'] if partials else []
+
+    for partial in partials:
+        for row, (year, month) in enumerate(partial['keys']):
+            year = prev_year if year is None else year
+            month = prev_month if month is None else month
+            if not (year and month):
+                continue
+            if (year, month) not in merged:
+                merged[(year, month)] = [np.zeros(len(keywords), dtype=np.int64), 0]
+            merged[(year, month)][0] += partial['counts'][row]
+            merged[(year, month)][1] += int(partial['char_counts'][row])
+
+        final_year, final_month = partial['final_state']
+        prev_year = prev_year if final_year is None else final_year
+        prev_month = prev_month if final_month is None else final_month
+
+    keys = sorted(merged.keys())
+    return {
+        'months': np.array(keys, dtype=np.int64).reshape(-1, 2),
+        'counts': np.array([merged[k][0] for k in keys], dtype=np.int64).reshape(-1, len(keywords)),
+        'char_counts': np.array([merged[k][1] for k in keys], dtype=np.int64),
+        'keywords': keywords
+    }
+
+
+class MonthlyAnalyzer:
+    """月度时间序列分析器"""
+
+    def __init__(self, config_file=DEFAULT_CONFIG_FILE, longest_match=False):
+        """
+        参数:
+            config_file: 关键词权重配置文件（默认为项目根目录的 config.json）
+            longest_match: 是否采用最长匹配语义（'怒'不重复计入'震怒'）
+        """
+        self.lexicon_file = str(config_file)
+        self.lexicon = load_lexicon(config_file)
+        lexicon = self.lexicon
+
+        # 核心变量：重金属摄入（X轴）
+        self.toxicity_keywords = lexicon.weights('toxicity')
+
+        # 核心变量：政治暴虐（Y轴）
+        self.tyranny_keywords = lexicon.weights('tyranny')
 
         # 控制变量：外部压力因素
-        self.control_keywords = {
-            # 边防压力
-            '北虏': 5, '蒙古': 5, '倭寇': 5,
-            '边患': 4, '寇': 2, '兵': 1,
+        self.control_keywords = lexicon.weights('control')
 
-            # 自然灾害
-            '地震': 6, '洪水': 5, '旱': 4,
-            '灾': 3, '饥': 4, '疫': 5,
+        # 标准化系数：(原始分数 / 字符数) * normalization_base
+        self.normalization_base = lexicon.parameters.get('normalization_base', 10000)
 
-            # 内部反对
-            '谏': 3, '争': 3, '劝': 2
-        }
+        # 三类词表共用一个多模式匹配器（按词表哈希缓存），每月文本只扫描一遍
+        self.matcher = lexicon.compile(longest_match=longest_match)
+
+        # 决定计数结果的词表部分（关键词及其顺序、匹配语义），用作分卷缓存键
+        self.keyword_hash = key_hash(tuple(self.matcher.keywords), longest_match)
+
+        # 当前解析的原文（月份数据只保存指向它的区间）
+        self.content = ""
 
     def parse_text_by_month(self, text_file):
         """
         按月份解析文本
 
+        各月不再拼接出新的文本副本，只记录该月各行在原文中的区间；
+        原文保存在 self.content 中，供评分阶段直接按区间读取
+
         返回:
             Dict: {
                 (year, month): {
-                    "text": "该月的所有文本",
+                    "spans": [(起始偏移, 结束偏移), ...],
                     "char_count": 字符数
                 }
             }
@@ -95,141 +234,388 @@ class MonthlyAnalyzer:
         with open(text_file, 'r', encoding='utf-8') as f:
             content = f.read()
 
-        monthly_data = defaultdict(lambda: {'text': '', 'char_count': 0})
+        self.content = content
+        monthly_data, _ = scan_month_spans(content)
+
+        # 只保留年月都已确定的行
+        return {
+            key: data for key, data in monthly_data.items()
+            if key[0] and key[1]
+        }
+
+    def build_hit_table(self, content=None):
+        """
+        对原文做一次匹配，得到带日期的命中表（HitTable）
+
+        之后可用 hit_table.resample(类别, freq) 得到
+        日 / 旬 / 月 / 季 / 年 任一粒度的序列，无需再次扫描文本
+        """
+        if content is None:
+            content = self.content
+        return HitTable.scan(content, self.matcher, DateIndex.build(content))
+
+    def build_count_matrix(self, monthly_data, content=None):
+        """
+        构建 月份 × 关键词 计数矩阵（整个流程中唯一需要扫描文本的步骤）
 
-        # 正则：嘉靖X年X月
-        year_pattern = re.compile(r'嘉靖([元一二三四五六七八九十百]+)年')
-        month_pattern = re.compile(r'([正二三四五六七八九十冬腊][一二三四五六七八九十]?)月')
+        参数:
+            monthly_data: parse_text_by_month 的返回值
+            content: 区间所指向的原文，默认使用 self.content
 
-        # 中文数字映射
-        cn_num_map = {
-            '〇': 0, '零': 0, '元': 1, '一': 1, '二': 2, '三': 3,
-            '四': 4, '五': 5, '六': 6, '七': 7, '八': 8, '九': 9,
-            '十': 10, '正': 1, '冬': 11, '腊': 12
+        返回:
+            Dict: {
+                "months": int数组 (月份数, 2)，每行为 (year, month),
+                "counts": int数组 (月份数, 关键词数),
+                "char_counts": int数组 (月份数,),
+                "keywords": 关键词列表（矩阵列顺序）,
+                "longest_match": 计数所用的匹配语义
+            }
+        """
+        if content is None:
+            content = self.content
+
+        keys = sorted(monthly_data.keys())
+        counts = np.zeros((len(keys), len(self.matcher.keywords)), dtype=np.int64)
+
+        for row, key in enumerate(keys):
+            counts[row] = self.matcher.count_spans(content, monthly_data[key]['spans'])
+
+        return {
+            'months': np.array(keys, dtype=np.int64).reshape(-1, 2),
+            'counts': counts,
+            'char_counts': np.array(
+                [monthly_data[key]['char_count'] for key in keys], dtype=np.int64
+            ),
+            'keywords': list(self.matcher.keywords),
+            'longest_match': self.matcher.longest_match
         }
 
-        def cn_to_num(cn_str):
-            """中文数字转数字"""
-            if cn_str in cn_num_map:
-                return cn_num_map[cn_str]
-            if '十' in cn_str:
-                parts = cn_str.split('十')
-                left = cn_num_map.get(parts[0], 0) if parts[0] else 1
-                right = cn_num_map.get(parts[1], 0) if parts[1] else 0
-                return left * 10 + right
-            return 0
-
-        # 按行扫描
-        current_year = None
-        current_month = None
-
-        lines = content.split('\n')
-
-        for line in lines:
-            # 检测年份
-            year_match = year_pattern.search(line)
-            if year_match:
-                current_year = cn_to_num(year_match.group(1))
-
-            # 检测月份
-            month_match = month_pattern.search(line)
-            if month_match:
-                current_month = cn_to_num(month_match.group(1))
-
-            # 如果有完整的年月信息，记录该行
-            if current_year and current_month:
-                key = (current_year, current_month)
-                monthly_data[key]['text'] += line + '\n'
-                monthly_data[key]['char_count'] += len(line)
-
-        return dict(monthly_data)
-
-    def calculate_monthly_scores(self, monthly_data):
+    def save_count_matrix(self, matrix, matrix_file, source_file=None):
         """
-        计算每月的毒性、暴虐、控制变量分数
+        保存计数矩阵为 .npz；若给出 source_file，同时记录其大小和修改时间，
+        用于判断缓存是否过期
+        """
+        source_stat = Path(source_file).stat() if source_file else None
+
+        np.savez_compressed(
+            matrix_file,
+            months=matrix['months'],
+            counts=matrix['counts'],
+            char_counts=matrix['char_counts'],
+            keywords=np.array(matrix['keywords']),
+            longest_match=np.array(matrix['longest_match']),
+            source_size=np.array(source_stat.st_size if source_stat else -1),
+            source_mtime_ns=np.array(source_stat.st_mtime_ns if source_stat else -1)
+        )
+
+    def load_count_matrix(self, matrix_file, source_file=None):
+        """
+        读取计数矩阵
+
+        以下情况返回 None（需要重新扫描文本）:
+        - 文件不存在
+        - 矩阵的关键词集合与当前词表不同，或匹配语义不同
+          （最长匹配下多出的词会抢占命中，改变其余词的计数，超集矩阵也不能复用）
+        - 给出了 source_file 且其大小/修改时间与保存时不一致
+
+        权重变化不影响矩阵，可直接复用
+        """
+        matrix_file = Path(matrix_file)
+        if not matrix_file.exists():
+            return None
+
+        with np.load(matrix_file) as data:
+            matrix = {
+                'months': data['months'],
+                'counts': data['counts'],
+                'char_counts': data['char_counts'],
+                'keywords': [str(k) for k in data['keywords']],
+                'longest_match': bool(data['longest_match'])
+            }
+            source_size = int(data['source_size'])
+            source_mtime_ns = int(data['source_mtime_ns'])
+
+        if matrix['longest_match'] != self.matcher.longest_match:
+            return None
+        if set(self.matcher.keywords) != set(matrix['keywords']):
+            return None
+        if source_file:
+            stat = Path(source_file).stat()
+            if (stat.st_size, stat.st_mtime_ns) != (source_size, source_mtime_ns):
+                return None
+
+        return matrix
+
+    def weight_vectors(self, keywords):
+        """
+        按矩阵列顺序生成各类别的权重向量
+
+        返回:
+            Dict[str, np.ndarray]: {'toxicity': 权重向量, 'tyranny': ..., 'control': ...}
+        """
+        category_weights = {
+            'toxicity': self.toxicity_keywords,
+            'tyranny': self.tyranny_keywords,
+            'control': self.control_keywords
+        }
+        return {
+            name: np.array([weights.get(k, 0) for k in keywords], dtype=np.int64)
+            for name, weights in category_weights.items()
+        }
+
+    def category_totals(self, matrix):
+        """各月每个类别的命中次数（不加权）：{类别名: 数组 (月份数,)}"""
+        return {
+            name: matrix['counts'] @ (weights != 0).astype(np.int64)
+            for name, weights in self.weight_vectors(matrix['keywords']).items()
+        }
+
+    def score_count_matrix(self, matrix):
+        """
+        由计数矩阵计算月度分数（矩阵-向量乘法，不读取文本）
+
+        修改关键词权重后直接重新调用即可，毫秒级完成
 
         返回:
             List[Dict]: 按时间排序的月度数据
         """
-        results = []
+        char_counts = matrix['char_counts']
+        scores = {
+            name: matrix['counts'] @ weights
+            for name, weights in self.weight_vectors(matrix['keywords']).items()
+        }
 
-        for (year, month), data in sorted(monthly_data.items()):
-            text = data['text']
-
-            # 计算三类指标
-            toxicity_score = sum(
-                weight * text.count(keyword)
-                for keyword, weight in self.toxicity_keywords.items()
-            )
-
-            tyranny_score = sum(
-                weight * text.count(keyword)
-                for keyword, weight in self.tyranny_keywords.items()
-            )
-
-            control_score = sum(
-                weight * text.count(keyword)
-                for keyword, weight in self.control_keywords.items()
-            )
-
-            # 标准化（按字符数）
-            char_count = data['char_count']
-            if char_count > 0:
-                toxicity_normalized = (toxicity_score / char_count) * 10000
-                tyranny_normalized = (tyranny_score / char_count) * 10000
-                control_normalized = (control_score / char_count) * 10000
-            else:
-                toxicity_normalized = 0
-                tyranny_normalized = 0
-                control_normalized = 0
+        # 标准化（按字符数）
+        safe_chars = np.where(char_counts > 0, char_counts, 1)
+        normalized = {
+            name: np.where(char_counts > 0, raw / safe_chars * self.normalization_base, 0.0)
+            for name, raw in scores.items()
+        }
 
+        results = []
+        for row, (year, month) in enumerate(matrix['months']):
             results.append({
-                'year': year,
-                'month': month,
-                'toxicity_raw': toxicity_score,
-                'tyranny_raw': tyranny_score,
-                'control_raw': control_score,
-                'toxicity_norm': round(toxicity_normalized, 2),
-                'tyranny_norm': round(tyranny_normalized, 2),
-                'control_norm': round(control_normalized, 2),
-                'char_count': char_count
+                'year': int(year),
+                'month': int(month),
+                'toxicity_raw': int(scores['toxicity'][row]),
+                'tyranny_raw': int(scores['tyranny'][row]),
+                'control_raw': int(scores['control'][row]),
+                'toxicity_norm': round(float(normalized['toxicity'][row]), 2),
+                'tyranny_norm': round(float(normalized['tyranny'][row]), 2),
+                'control_norm': round(float(normalized['control'][row]), 2),
+                'char_count': int(char_counts[row])
             })
 
         return results
 
-    def analyze_file(self, text_file, output_dir="analysis_results"):
-        """完整分析流程"""
+    def calculate_monthly_scores(self, monthly_data, content=None):
+        """
+        计算每月的毒性、暴虐、控制变量分数
+
+        参数:
+            monthly_data: parse_text_by_month 的返回值
+            content: 区间所指向的原文，默认使用 self.content
+
+        返回:
+            List[Dict]: 按时间排序的月度数据
+        """
+        matrix = self.build_count_matrix(monthly_data, content)
+        return self.score_count_matrix(matrix)
+
+    def analyze_file(self, text_file, output_dir="analysis_results", use_cache=True):
+        """
+        完整分析流程
+
+        首次运行时把 月份 × 关键词 计数矩阵保存到 output_dir/monthly_counts.npz；
+        之后只要原文件和词表未变，仅调整权重时直接复用矩阵，不再扫描文本
+        """
 
         print("="*60)
         print(f"月度时间序列分析: {Path(text_file).name}")
         print("="*60)
 
-        # 1. 按月解析
-        monthly_data = self.parse_text_by_month(text_file)
-        print(f"\n✓ 解析完成，共 {len(monthly_data)} 个月份的数据")
+        output_path = Path(output_dir)
+        output_path.mkdir(parents=True, exist_ok=True)
+        matrix_file = output_path / "monthly_counts.npz"
 
-        if not monthly_data:
-            print("✗ 无数据")
-            return None
+        matrix = self.load_count_matrix(matrix_file, text_file) if use_cache else None
 
-        # 获取时间范围
-        years = [y for y, m in monthly_data.keys()]
-        print(f"✓ 时间范围: 嘉靖{min(years)}年 - 嘉靖{max(years)}年")
+        if matrix is not None:
+            print(f"\n✓ 复用计数矩阵: {matrix_file}，共 {len(matrix['months'])} 个月份的数据")
+        else:
+            # 1. 按月解析
+            monthly_data = self.parse_text_by_month(text_file)
+            print(f"\n✓ 解析完成，共 {len(monthly_data)} 个月份的数据")
+
+            if not monthly_data:
+                print("✗ 无数据")
+                return None
+
+            # 2. 扫描一次文本，构建并保存计数矩阵
+            matrix = self.build_count_matrix(monthly_data)
+            self.save_count_matrix(matrix, matrix_file, text_file)
+            print(f"✓ 计数矩阵保存: {matrix_file}")
+
+        return self.report_count_matrix(matrix, output_path)
+
+    def _map_volumes(self, stage, worker, text_files, workers=None, cache=None):
+        """
+        对每个文件执行 worker（进程池并行），按 阶段 + 内容哈希 + 词表哈希 复用缓存
+
+        返回:
+            与 text_files 顺序一致的部分结果列表
+        """
+        results = [None] * len(text_files)
+        hashes = [content_hash(f) for f in text_files] if cache else None
+
+        todo = []
+        for i in range(len(text_files)):
+            if cache:
+                results[i] = cache.load(stage, hashes[i], self.keyword_hash)
+            if results[i] is None:
+                todo.append(i)
+
+        if todo:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    i: executor.submit(worker, str(text_files[i]), self.lexicon_file,
+                                       self.matcher.longest_match)
+                    for i in todo
+                }
+                for i, future in futures.items():
+                    results[i] = future.result()
+                    if cache:
+                        cache.store(stage, hashes[i], results[i], self.keyword_hash)
+                    print(f"  ✓ {text_files[i].name}")
 
-        # 2. 计算月度指标
-        monthly_scores = self.calculate_monthly_scores(monthly_data)
+        print(f"✓ [{stage}] 复用缓存 {len(text_files) - len(todo)} 个文件，重新计算 {len(todo)} 个")
+        return results
+
+    @staticmethod
+    def _expand_files(text_files):
+        """文件路径列表，或 glob 模式 -> 排序后的 Path 列表"""
+        if isinstance(text_files, (str, Path)):
+            pattern = Path(text_files)
+            return sorted(pattern.parent.glob(pattern.name))
+        return [Path(f) for f in text_files]
+
+    def analyze_volumes(self, text_files, output_dir="analysis_results/full_566_volumes",
+                        workers=None, use_cache=True):
+        """
+        多文件（如全部566卷）并行分析：map-reduce
+
+        1. map: 进程池中逐文件做部分聚合（count_file_partial）
+        2. reduce: 按文件顺序合并，跨文件延续年月状态（merge_partials）
+
+        结果与把全部文件按顺序以换行拼接后调用 analyze_file 完全一致。
+        每个文件的部分结果按 内容哈希 + 词表哈希 缓存，
+        重跑时只重新计算有变化的文件
+
+        参数:
+            text_files: 文件路径列表，或 glob 模式如 "jiajing_data_full/vol*.txt"
+            workers: 进程数，默认为CPU核数
+            use_cache: 是否使用分卷缓存
+        """
+        text_files = self._expand_files(text_files)
+
+        print("="*60)
+        print(f"月度时间序列分析（并行）: {len(text_files)} 个文件")
+        print("="*60)
+
+        if not text_files:
+            print("✗ 无数据")
+            return None
 
-        # 3. 输出结果
         output_path = Path(output_dir)
         output_path.mkdir(parents=True, exist_ok=True)
 
+        longest_match = self.matcher.longest_match
+        cache = PartialCache() if use_cache else None
+        partials = self._map_volumes('monthly', count_file_partial, text_files, workers, cache)
+
+        matrix = merge_partials(partials)
+        matrix['longest_match'] = longest_match
+        print(f"\n✓ 合并完成，共 {len(matrix['months'])} 个月份的数据")
+
+        if len(matrix['months']) == 0:
+            print("✗ 无数据")
+            return None
+
+        matrix_file = output_path / "monthly_counts.npz"
+        self.save_count_matrix(matrix, matrix_file)
+        print(f"✓ 计数矩阵保存: {matrix_file}")
+
+        return self.report_count_matrix(matrix, output_path)
+
+    def build_volume_hit_table(self, text_files, workers=None, use_cache=True):
+        """
+        多文件的整体命中表（偏移为各文件按换行拼接后的整体偏移）
+
+        - 关键词命中: 按卷并行匹配，按 内容哈希 + 词表哈希 缓存
+        - 日期索引: 需要接续上一卷结束时的日期状态，按 内容哈希 + 初始状态 缓存，
+          上一卷结束状态不变时直接复用
+        """
+        text_files = self._expand_files(text_files)
+        cache = PartialCache() if use_cache else None
+
+        partials = self._map_volumes('hits', scan_file_hits, text_files, workers, cache)
+
+        bases = []
+        base = 0
+        for partial in partials:
+            bases.append(base)
+            base += partial['length'] + 1
+
+        date_indexes = []
+        state = None
+        for text_file in text_files:
+            file_hash = content_hash(text_file) if cache else None
+            cached = cache.load('dates', file_hash, state, DATE_FORMAT_VERSION) if cache else None
+            if cached is None:
+                with open(text_file, 'r', encoding='utf-8') as f:
+                    index = DateIndex.build(f.read(), state)
+                cached = {
+                    'offsets': index.offsets, 'months': index.months,
+                    'ordinals': index.ordinals, 'mdays': index.raw_mdays,
+                    'final_state': index.final_state
+                }
+                if cache:
+                    cache.store('dates', file_hash, cached, state, DATE_FORMAT_VERSION)
+            date_indexes.append(DateIndex(
+                cached['offsets'], cached['months'], cached['ordinals'], cached['mdays']
+            ))
+            state = cached['final_state']
+
+        date_index = DateIndex.concat(date_indexes, bases)
+        offsets = np.concatenate(
+            [p['offsets'] + b for p, b in zip(partials, bases)] or [np.zeros(0, dtype=np.int64)]
+        )
+        keyword_ids = np.concatenate(
+            [p['keyword_ids'] for p in partials] or [np.zeros(0, dtype=np.int32)]
+        )
+        months, ordinals, mdays = date_index.lookup(offsets)
+
+        return HitTable(offsets, keyword_ids, ordinals, months, mdays,
+                        self.matcher.keywords, self.matcher.categories)
+
+    def report_count_matrix(self, matrix, output_path):
+        """由计数矩阵计算月度指标，保存 monthly_timeseries.json 并显示统计摘要"""
+
+        # 获取时间范围
+        years = matrix['months'][:, 0]
+        print(f"✓ 时间范围: 嘉靖{years.min()}年 - 嘉靖{years.max()}年")
+
+        # 3. 由计数矩阵计算月度指标
+        monthly_scores = self.score_count_matrix(matrix)
+
+        # 4. 输出结果
         result_file = output_path / "monthly_timeseries.json"
         with open(result_file, 'w', encoding='utf-8') as f:
             json.dump(monthly_scores, f, ensure_ascii=False, indent=2)
 
         print(f"\n✓ 结果保存: {result_file}")
 
-        # 4. 显示统计摘要
+        # 5. 显示统计摘要
         print(f"\n{'='*60}")
         print("统计摘要")
         print("="*60)
@@ -247,7 +633,7 @@ class MonthlyAnalyzer:
         print(f"\n毒性峰值: 嘉靖{max_toxicity_month['year']}年{max_toxicity_month['month']}月 ({max_toxicity_month['toxicity_norm']:.2f})")
         print(f"暴虐峰值: 嘉靖{max_tyranny_month['year']}年{max_tyranny_month['month']}月 ({max_tyranny_month['tyranny_norm']:.2f})")
 
-        # 5. 特别关注壬寅宫变月份（嘉靖21年10月）
+        # 6. 特别关注壬寅宫变月份（嘉靖21年10月）
         gongbian_month = next((m for m in monthly_scores if m['year'] == 21 and m['month'] == 10), None)
 
         if gongbian_month:
@@ -282,3 +668,12 @@ if __name__ == "__main__":
             renyin_file,
             output_dir="analysis_results/monthly_renyin"
         )
+
+    # 分析全部566卷（多进程并行，跨文件延续年月状态）
+    full_files = sorted(Path("jiajing_data_full").glob("vol*.txt"))
+    if full_files:
+        print("\n\n📊 全朝分析（嘉靖1-45年，566卷）\n")
+        full_results = analyzer.analyze_volumes(
+            full_files,
+            output_dir="analysis_results/full_566_volumes"
+        )
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+流式 n-gram 计数 - 定长内存的高频词统计
+
+解决问题：
+keyword_frequency 把每个 2/3/4 字子串都生成为 Python 字符串放进列表，
+逐个用 any(c in stop_words ...) 判断后交给 Counter；
+48万字就是上百万个字符串对象，全朝文本直接内存不足
+
+方法：
+1. 文本转为整数码数组，字符映射为 16 位字表ID（出现时动态分配）
+2. 停用字用一次向量化的布尔掩码标出，含停用字的 n-gram 用累加和一次性剔除
+3. n 个字表ID 拼成一个 uint64 键，按块（默认100万字）排序计数后归并入汇总表
+4. 汇总表超过容量时只保留计数最高的部分（累加每次裁剪丢弃的最大计数作为误差上界），
+   内存不随文本长度增长；未超容量时结果与 Counter 完全一致（同频按首次出现先后）
+"""
+import numpy as np
+
+
+class NGramCounter:
+    """流式 n-gram 计数器"""
+
+    # 每个字占用的位数（4字 × 16位 = 64位）
+    BITS = 16
+
+    def __init__(self, lengths=(2, 3, 4), stop_chars='', capacity=1 << 20, chunk_size=1 << 20):
+        """
+        参数:
+            lengths: 统计的 n-gram 长度
+            stop_chars: 停用字，含停用字的 n-gram 不计
+            capacity: 每种长度汇总表保留的最多不同 n-gram 数
+            chunk_size: 每块处理的起始位置数
+        """
+        if max(lengths) * self.BITS > 64:
+            raise ValueError(f"n-gram 长度不能超过 {64 // self.BITS}")
+
+        self.lengths = tuple(lengths)
+        self.capacity = capacity
+        self.chunk_size = chunk_size
+
+        self._char_ids = {}
+        self._chars = []
+        self._stop_codes = np.array(sorted(ord(c) for c in set(stop_chars)), dtype=np.uint32)
+
+        # 每种长度一张汇总表：(键, 计数, 首次出现位置)，键升序
+        self._tables = {n: (np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int64),
+                            np.zeros(0, dtype=np.int64)) for n in self.lengths}
+        self.dropped = {n: 0 for n in self.lengths}
+        self.total_chars = 0
+
+    def _encode(self, codes):
+        """Unicode 码 → 字表ID（新字动态分配）"""
+        unique = np.unique(codes)
+        for code in unique.tolist():
+            if code not in self._char_ids:
+                if len(self._chars) >= (1 << self.BITS) - 1:
+                    raise ValueError("不同字符数超过字表容量")
+                self._char_ids[code] = len(self._chars)
+                self._chars.append(chr(code))
+        mapping = np.array([self._char_ids[code] for code in unique.tolist()], dtype=np.uint64)
+        return mapping[np.searchsorted(unique, codes)]
+
+    def encode(self, text):
+        """文本 → 字表ID数组（np.uint64），新字动态分配"""
+        if not text:
+            return np.zeros(0, dtype=np.uint64)
+        return self._encode(np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32))
+
+    def update(self, text):
+        """
+        累加一段文本的 n-gram 计数（n-gram 不跨越两次 update 的边界）
+        """
+        base = self.total_chars
+        self.total_chars += len(text)
+        if not text:
+            return
+
+        codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+        stop = np.isin(codes, self._stop_codes)
+        stop_csum = np.concatenate([[0], np.cumsum(stop, dtype=np.int64)])
+
+        for chunk_start in range(0, len(codes), self.chunk_size):
+            chunk_end = min(chunk_start + self.chunk_size + max(self.lengths) - 1, len(codes))
+            ids = self._encode(codes[chunk_start:chunk_end])
+
+            for n in self.lengths:
+                starts = np.arange(chunk_start, min(chunk_start + self.chunk_size, len(codes) - n + 1))
+                if len(starts) == 0:
+                    continue
+                valid = stop_csum[starts + n] == stop_csum[starts]
+                local = starts[valid] - chunk_start
+
+                keys = np.zeros(len(local), dtype=np.uint64)
+                for k in range(n):
+                    keys = (keys << np.uint64(self.BITS)) | ids[local + k]
+
+                if len(keys) == 0:
+                    continue
+                order = np.argsort(keys)
+                sorted_keys = keys[order]
+                boundary = np.flatnonzero(np.concatenate([[True], sorted_keys[1:] != sorted_keys[:-1]]))
+                counts = np.diff(np.append(boundary, len(keys)))
+                firsts = np.minimum.reduceat(local[order], boundary) + chunk_start + base
+                self._merge(n, sorted_keys[boundary], counts, firsts)
+
+    def _merge(self, n, keys, counts, firsts):
+        """把一块的计数并入汇总表，超出容量时裁剪"""
+        old_keys, old_counts, old_firsts = self._tables[n]
+        all_keys = np.concatenate([old_keys, keys])
+
+        # 两段各自有序，稳定排序只需一次归并
+        order = np.argsort(all_keys, kind='stable')
+        all_keys = all_keys[order]
+        boundary = np.flatnonzero(np.concatenate([[True], all_keys[1:] != all_keys[:-1]]))
+
+        merged = all_keys[boundary]
+        merged_counts = np.add.reduceat(np.concatenate([old_counts, counts])[order], boundary)
+        merged_firsts = np.minimum.reduceat(np.concatenate([old_firsts, firsts])[order], boundary)
+
+        if len(merged) > self.capacity:
+            order = np.lexsort((merged_firsts, -merged_counts))
+            # 同一 n-gram 可能在多次裁剪中被丢弃，误差上界按次累加
+            self.dropped[n] += int(merged_counts[order[self.capacity]])
+            keep = np.sort(order[:self.capacity])
+            merged, merged_counts, merged_firsts = merged[keep], merged_counts[keep], merged_firsts[keep]
+
+        self._tables[n] = (merged, merged_counts, merged_firsts)
+
+    def table(self, n):
+        """
+        某长度的汇总表
+
+        返回:
+            (键数组, 计数数组)，键升序；键由 n 个字表ID 各占 BITS 位拼成
+        """
+        keys, counts, _ = self._tables[n]
+        return keys, counts
+
+    def decode(self, key, n):
+        """键 → n-gram 字符串"""
+        mask = (1 << self.BITS) - 1
+        key = int(key)
+        return ''.join(self._chars[(key >> (self.BITS * (n - 1 - k))) & mask] for k in range(n))
+
+    def most_common(self, top_n=50):
+        """
+        频次最高的 top_n 个 n-gram [(词, 次数), ...]
+
+        同频时短词在前、再按首次出现先后（与按长度依次放入 Counter 的结果一致）
+        """
+        candidates = []
+        for order, n in enumerate(self.lengths):
+            keys, counts, firsts = self._tables[n]
+            if len(keys) == 0:
+                continue
+            top = np.lexsort((firsts, -counts))[:top_n]
+            candidates.extend((int(counts[i]), order, int(firsts[i]), keys[i], n) for i in top.tolist())
+
+        candidates.sort(key=lambda c: (-c[0], c[1], c[2]))
+        return [(self.decode(key, n), count) for count, _, _, key, n in candidates[:top_n]]
+
+    @property
+    def error_bound(self):
+        """因裁剪可能少计的最大次数（未发生裁剪时为0）"""
+        return max(self.dropped.values()) if self.dropped else 0
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+分卷部分结果缓存 - 增量重算
+
+解决问题：
+新增或重新提取一卷文本后，所有分析都要在全部文本上重跑一遍
+
+方法：
+1. 每个分析阶段（月度计数、关键词命中、日期索引）按卷保存部分结果
+2. 缓存键 = 阶段名 + 该卷内容哈希 + 词表哈希（及其他影响结果的参数）
+3. 重跑时只重新计算内容或词表变化过的卷，其余直接读取缓存后合并
+"""
+import hashlib
+import pickle
+from pathlib import Path
+
+
+DEFAULT_CACHE_DIR = Path(__file__).with_name('.cache') / 'partials'
+
+
+def content_hash(path, chunk_size=1 << 20):
+    """文件内容的 SHA-256（分块读取）"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def key_hash(*parts):
+    """把若干参数（词表哈希、初始状态等）合成一个短哈希"""
+    return hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()[:16]
+
+
+class PartialCache:
+    """按 阶段/内容哈希/参数哈希 保存的部分结果缓存"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, stage, file_hash, *params):
+        return self.cache_dir / stage / f"{file_hash[:32]}-{key_hash(*params)}.pkl"
+
+    def load(self, stage, file_hash, *params):
+        """读取部分结果，不存在或损坏时返回 None"""
+        path = self._path(stage, file_hash, *params)
+        if path.exists():
+            try:
+                with open(path, 'rb') as f:
+                    value = pickle.load(f)
+                self.hits += 1
+                return value
+            except (OSError, pickle.UnpicklingError, EOFError):
+                pass
+        self.misses += 1
+        return None
+
+    def store(self, stage, file_hash, value, *params):
+        """保存部分结果（先写临时文件再改名，避免中断时留下半个文件）"""
+        path = self._path(stage, file_hash, *params)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_path.replace(path)
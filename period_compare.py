@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+多时期对比引擎 - 任意命名时期的归一化指标与变化率
+
+解决问题：
+RenyinAnalyzer.compare_with_early_jiajing 的嘉靖初期基线是写死的数字
+（683965字、84个毒性事件……），词表一改就对不上；而且为了对比又把全部提取重跑一遍
+
+方法：
+1. 每份语料（文件）只汇总一次：月序号 × 关键词 的命中计数矩阵 + 每月字数，
+   命中取自共享位置索引，汇总结果按 内容哈希 + 词表哈希 + 关键词列顺序 缓存（PartialCache）
+2. 时期可按在位年月（嘉靖X年X月 至 嘉靖Y年Y月）或卷号范围定义
+3. 任一时期的指标 = 对应行（或对应语料）求和，再按每10万字归一化；
+   对比任意多个时期都只是矩阵切片求和，不再扫描文本
+"""
+import re
+from pathlib import Path
+
+import numpy as np
+
+from date_index import DateIndex, month_index
+from lexicon import DEFAULT_CONFIG_FILE, load_lexicon
+from partial_cache import PartialCache, content_hash, key_hash
+from positional_index import corpus_index
+
+
+# 文件名中的卷号范围，如 vol12.txt、renyin_gongbian_era_vol228-276.txt
+VOLUME_RANGE_PATTERN = re.compile(r'vol(\d+)(?:-(\d+))?')
+
+# 归一化基数：每10万字
+NORMALIZE_BASE = 100000
+
+
+class Period:
+    """一个命名时期"""
+
+    def __init__(self, name, months=None, volumes=None, sources=None):
+        """
+        参数:
+            name: 时期名称，如 '壬寅时期'
+            months: (起始月序号, 结束月序号)，闭区间
+            volumes: (起始卷, 结束卷)，闭区间；选取卷号范围完全落在其中的语料
+            sources: 只统计这些语料（名称列表），默认全部
+        """
+        self.name = name
+        self.months = months
+        self.volumes = volumes
+        self.sources = sources
+
+    @classmethod
+    def reign(cls, name, start, end, sources=None):
+        """
+        按在位年月定义时期
+
+        参数:
+            start / end: (嘉靖年, 月)，如 (19, 1)、(23, 12)
+        """
+        return cls(name, months=(month_index(*start), month_index(*end)), sources=sources)
+
+    @classmethod
+    def volume_range(cls, name, first, last, sources=None):
+        """按卷号范围定义时期"""
+        return cls(name, volumes=(first, last), sources=sources)
+
+    def __repr__(self):
+        return f"Period({self.name!r}, months={self.months}, volumes={self.volumes})"
+
+
+class SourceSummary:
+    """一份语料的汇总：每月字数 + 月 × 关键词命中计数"""
+
+    def __init__(self, name, month_chars, counts, volumes=None):
+        """
+        参数:
+            month_chars: 长度为 月数+1 的数组，第0项为日期未知部分的字数，第 m+1 项为月序号 m
+            counts: (月数+1, 关键词数) 的命中计数矩阵，行含义同上
+            volumes: (起始卷, 结束卷)，未知时为 None
+        """
+        self.name = name
+        self.month_chars = month_chars
+        self.counts = counts
+        self.volumes = volumes
+
+    @classmethod
+    def build(cls, name, text, matcher, volumes=None):
+        """由全文汇总（命中取自共享位置索引）"""
+        date_index = DateIndex.build(text)
+        lengths = np.diff(np.append(date_index.offsets, len(text)))
+        rows = date_index.months.astype(np.int64) + 1
+        n_rows = int(rows.max()) + 1 if len(rows) else 1
+
+        month_chars = np.bincount(rows, weights=lengths, minlength=n_rows).astype(np.int64)
+        # 第一个断点之前的文字计入"日期未知"
+        if len(date_index.offsets):
+            month_chars[0] += int(date_index.offsets[0])
+        else:
+            month_chars[0] += len(text)
+
+        hits = corpus_index(text, matcher.keywords).hits(matcher.keywords)
+        counts = np.zeros((n_rows, len(matcher.keywords)), dtype=np.int64)
+        if hits:
+            positions = np.array([pos for pos, _ in hits], dtype=np.int64)
+            kids = np.array([kid for _, kid in hits], dtype=np.int64)
+            hit_months, _, _ = date_index.lookup(positions)
+            np.add.at(counts, (hit_months.astype(np.int64) + 1, kids), 1)
+
+        return cls(name, month_chars, counts, volumes)
+
+    def select(self, period):
+        """
+        时期在本语料中的 (字数, 各关键词命中数)；本语料不属于该时期时返回 None
+        """
+        if period.sources is not None and self.name not in period.sources:
+            return None
+
+        if period.volumes is not None:
+            if self.volumes is None:
+                return None
+            first, last = period.volumes
+            if not (first <= self.volumes[0] and self.volumes[1] <= last):
+                return None
+            rows = slice(None)
+        elif period.months is not None:
+            start, end = period.months
+            rows = slice(max(start, 0) + 1, end + 2)
+        else:
+            rows = slice(None)
+
+        return int(self.month_chars[rows].sum()), self.counts[rows].sum(axis=0)
+
+
+def volumes_from_name(path):
+    """从文件名解析卷号范围，如 vol228-276 → (228, 276)"""
+    match = VOLUME_RANGE_PATTERN.search(Path(path).stem)
+    if not match:
+        return None
+    first = int(match.group(1))
+    return first, int(match.group(2) or first)
+
+
+class PeriodComparator:
+    """多时期对比"""
+
+    def __init__(self, config_file=DEFAULT_CONFIG_FILE, normalize=NORMALIZE_BASE, use_cache=True):
+        """
+        参数:
+            normalize: 归一化基数（每多少字）
+            use_cache: 是否按 内容哈希 + 词表哈希 缓存每份语料的汇总
+        """
+        self.lexicon = load_lexicon(config_file)
+        self.matcher = self.lexicon.compile()
+        # 汇总矩阵的列按 matcher.keywords 排列，词表哈希不区分关键词顺序，需一并计入
+        self.summary_key = key_hash(self.lexicon.hash, tuple(self.matcher.keywords))
+        self.normalize = normalize
+        self.cache = PartialCache() if use_cache else None
+        self.sources = []
+
+    def add_file(self, path, name=None, volumes=None, text=None):
+        """
+        加入一份语料文件（卷号范围默认从文件名解析）
+
+        参数:
+            text: 已读入的文件内容（可省去再读一次）
+        """
+        path = Path(path)
+        name = name or path.name
+        volumes = volumes or volumes_from_name(path)
+
+        file_hash = content_hash(path)
+        summary = None
+        if self.cache is not None:
+            summary = self.cache.load('period', file_hash, self.summary_key)
+
+        if summary is None:
+            if text is None:
+                with open(path, 'r', encoding='utf-8') as f:
+                    text = f.read()
+            summary = SourceSummary.build(name, text, self.matcher, volumes)
+            if self.cache is not None:
+                self.cache.store('period', file_hash, summary, self.summary_key)
+
+        summary.name = name
+        summary.volumes = volumes
+        self.sources.append(summary)
+        return summary
+
+    def add_text(self, text, name, volumes=None):
+        """加入一段已读入的文本（不缓存）"""
+        summary = SourceSummary.build(name, text, self.matcher, volumes)
+        self.sources.append(summary)
+        return summary
+
+    def metrics(self, period):
+        """
+        某时期的指标
+
+        返回:
+            Dict: {"chars": 字数, "<类别>_events": 命中次数, "<类别>_weight": 加权分数}
+        """
+        chars = 0
+        counts = np.zeros(len(self.matcher.keywords), dtype=np.int64)
+        for source in self.sources:
+            selected = source.select(period)
+            if selected is None:
+                continue
+            chars += selected[0]
+            counts += selected[1]
+
+        metrics = {'chars': chars}
+        for category, weights in self.matcher.categories.items():
+            kids = np.array(list(weights.keys()), dtype=np.int64)
+            values = np.array(list(weights.values()), dtype=np.float64)
+            weight = float(counts[kids] @ values) if len(kids) else 0.0
+            metrics[f'{category}_events'] = int(counts[kids].sum()) if len(kids) else 0
+            metrics[f'{category}_weight'] = int(weight) if weight.is_integer() else weight
+        return metrics
+
+    def normalized(self, metrics):
+        """除字数外的指标换算为每 normalize 字"""
+        chars = metrics['chars']
+        return {
+            key: (value / chars * self.normalize if chars else 0.0)
+            for key, value in metrics.items() if key != 'chars'
+        }
+
+    def compare(self, periods, baseline=0):
+        """
+        对比若干时期
+
+        参数:
+            baseline: 作为变化率基准的时期下标
+
+        返回:
+            Dict: {
+                "periods": [时期名, ...],
+                "raw": [各时期原始指标, ...],
+                "normalized": [各时期归一化指标, ...],
+                "change": [各时期相对基准的变化率（%），基准为0时为 None, ...]
+            }
+        """
+        raw = [self.metrics(period) for period in periods]
+        normalized = [self.normalized(m) for m in raw]
+
+        base = normalized[baseline]
+        change = [
+            {key: ((value - base[key]) / base[key] * 100 if base[key] > 0 else None)
+             for key, value in values.items()}
+            for values in normalized
+        ]
+        return {
+            'periods': [period.name for period in periods],
+            'raw': raw,
+            'normalized': normalized,
+            'change': change
+        }
+
+
+def format_change(change):
+    """变化率 → '+12.3%' / '-4.5%' / 'N/A'"""
+    if change is None:
+        return "N/A"
+    return f"+{change:.1f}%" if change > 0 else f"{change:.1f}%"
@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+"""
+位置倒排索引 - 词 → 全部出现位置，全语料共享、落盘后内存映射
+
+解决问题：
+毒性/暴虐分析、壬寅分析、事件分析、宫人检索、人物上下文各自对全文做 str.find 循环，
+一次完整的分析会话要把同一份文本扫描几十上百遍
+
+方法：
+1. 每份语料（按内容哈希区分）一个索引：词 → 升序 array('I') 位置数组
+2. 缺少的词一次性交给 KeywordMatcher 扫描（全部缺失的词共用一遍正则扫描），
+   位置语义与 str.find 循环一致
+3. 索引保存为 .cache/positions/<哈希>.idx，再次打开时 mmap 映射，位置数组零拷贝读取；
+   文件由若干段组成，之后新增的词只追加一段，不重写已有内容
+4. 同一进程内最近使用的几份语料的索引共享（LRU），不会无限持有旧语料
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from keyword_matcher import KeywordMatcher
+
+
+DEFAULT_CACHE_DIR = Path(__file__).with_name('.cache') / 'positions'
+
+# 文件格式：
+#   文件头：魔数 + 头部长度 + JSON头部（版本、语料长度）+ 对齐填充
+#   若干段：段头长度 + JSON段头（词 → [段内起始, 个数]）+ 对齐填充 + uint32 位置数据 + 对齐填充
+# 末尾不完整的段（写入中断）在打开时忽略
+MAGIC = b'PIDX'
+VERSION = 2
+
+# 同一进程内共享的索引个数上限（按最近使用淘汰）
+MAX_SHARED_INDEXES = 4
+
+# 同一进程内按语料共享索引（各分析器拿到的是同一个对象）
+_indexes = OrderedDict()
+
+
+def text_hash(text):
+    """语料内容的 SHA-256"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class PositionalIndex:
+    """词 → 出现位置 的倒排索引"""
+
+    def __init__(self, text, cache_dir=DEFAULT_CACHE_DIR):
+        """
+        参数:
+            text: 语料全文
+            cache_dir: 索引文件目录；None 表示不落盘
+        """
+        self.text = text
+        self.hash = text_hash(text)
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.postings = {}
+        self._mmap = None
+        self._views = []
+        self._pending = []          # 尚未写盘的新增词
+        self._file_size = None      # 已读入（或已写出）的有效文件长度；None 表示需整体重写
+
+        if self.path is not None and self.path.exists():
+            self._open()
+
+    @property
+    def path(self):
+        if self.cache_dir is None:
+            return None
+        return self.cache_dir / f"{self.hash[:32]}.idx"
+
+    def _open(self):
+        """映射已保存的索引文件，位置数组为 memoryview('I') 切片（不复制）"""
+        with open(self.path, 'rb') as f:
+            try:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                return
+
+        data = self._mmap
+        size = len(data)
+        header = _read_block(data, 0)
+        if data[:4] != MAGIC or header is None:
+            self._close()
+            return
+        header, pos = header
+        if header.get('version') != VERSION or header.get('length') != len(self.text):
+            self._close()
+            return
+
+        base = memoryview(data)
+        self._views.append(base)
+        while pos < size:
+            block = _read_block(data, pos)
+            if block is None:
+                break
+            segment, data_start = block
+            total = sum(count for _, count in segment['terms'].values())
+            data_end = data_start + total * 4
+            if data_end > size:
+                break
+            view = base[data_start:data_end].cast('I')
+            self._views.append(view)
+            for term, (start, count) in segment['terms'].items():
+                self.postings[term] = view[start:start + count]
+            pos = _aligned(data_end)
+
+        # 末尾有不完整的段时，下次保存整体重写
+        self._file_size = pos if pos == size else None
+
+    def _close(self):
+        """
+        关闭映射：映射中的位置数组先复制为 array('I')，释放全部视图后再关闭文件
+        （Windows 上文件仍被映射时不能被替换）
+
+        返回:
+            是否已关闭（调用方仍持有 np.frombuffer 等导出视图时为 False）
+        """
+        if self._mmap is None:
+            return True
+        for term, positions in self.postings.items():
+            if isinstance(positions, memoryview):
+                copied = array('I')
+                copied.frombytes(positions.tobytes())
+                self.postings[term] = copied
+                _release(positions)
+        for view in reversed(self._views):
+            _release(view)
+        self._views = []
+        try:
+            self._mmap.close()
+        except BufferError:
+            return False
+        self._mmap = None
+        return True
+
+    def __contains__(self, term):
+        return term in self.postings
+
+    def __len__(self):
+        return len(self.postings)
+
+    def add_terms(self, terms):
+        """
+        为尚未索引的词建立位置数组（全部缺失的词共用一遍扫描）
+
+        返回:
+            新增的词数
+        """
+        missing = [t for t in dict.fromkeys(terms) if t and t not in self.postings]
+        if not missing:
+            return 0
+
+        matcher = KeywordMatcher(missing)
+        buckets = [array('I') for _ in matcher.keywords]
+        for pos, kid in matcher.finditer(self.text):
+            buckets[kid].append(pos)
+
+        for term, positions in zip(matcher.keywords, buckets):
+            self.postings[term] = positions
+        self._pending.extend(matcher.keywords)
+        return len(missing)
+
+    def positions(self, term):
+        """某个词的全部出现位置（升序，不重叠，与 str.find 循环结果一致）"""
+        if term not in self.postings:
+            self.add_terms([term])
+        return self.postings[term]
+
+    def count(self, term):
+        """某个词的出现次数（与 str.count 一致）"""
+        return len(self.positions(term))
+
+    def array(self, term):
+        """某个词的位置数组（np.uint32，零拷贝视图）"""
+        positions = self.positions(term)
+        if len(positions) == 0:
+            return np.zeros(0, dtype=np.uint32)
+        return np.frombuffer(positions, dtype=np.uint32)
+
+    def hits(self, terms):
+        """
+        多个词的全部命中，按位置合并
+
+        参数:
+            terms: 词序列（下标即关键词ID，如 KeywordMatcher.keywords）
+
+        返回:
+            [(位置, 关键词ID), ...]，按位置升序
+        """
+        self.add_terms(terms)
+        arrays = [self.array(term).astype(np.int64) for term in terms]
+        if not arrays:
+            return []
+        positions = np.concatenate(arrays)
+        kids = np.repeat(np.arange(len(arrays)), [len(a) for a in arrays])
+        order = np.lexsort((kids, positions))
+        return list(zip(positions[order].tolist(), kids[order].tolist()))
+
+    def save(self):
+        """
+        保存新增的词（仅在有新增词时写盘）
+
+        文件完好且自上次读写后未被改动时，只在末尾追加一段；
+        否则先写临时文件再整体替换
+        """
+        if self.path is None or not self._pending:
+            return None
+
+        try:
+            current_size = os.path.getsize(self.path)
+        except OSError:
+            current_size = None
+
+        if self._file_size is not None and current_size == self._file_size:
+            with open(self.path, 'ab') as f:
+                self._file_size += _write_segment(f, self._file_size, self._pending, self.postings)
+            self._pending = []
+            return self.path
+
+        return self._rewrite()
+
+    def _rewrite(self):
+        """整体重写索引文件（文件头 + 全部词一段）"""
+        header = json.dumps({'version': VERSION, 'length': len(self.text)}).encode('utf-8')
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<I', len(header)))
+            f.write(header)
+            size = 8 + len(header)
+            padding = _aligned(size) - size
+            f.write(b'\0' * padding)
+            size += padding
+            size += _write_segment(f, size, list(self.postings), self.postings)
+
+        # 先释放旧文件的映射再替换；仍被外部视图占用时旧映射保持打开，
+        # 替换失败（Windows）则保留新增词，下次保存时重试
+        self._close()
+        try:
+            tmp_path.replace(self.path)
+        except OSError:
+            return None
+
+        self._file_size = size
+        self._pending = []
+        return self.path
+
+
+def _read_block(data, pos):
+    """
+    读取 pos 处的 (长度 + JSON) 块（文件头从魔数之后读起）
+
+    返回:
+        (JSON对象, 块后对齐的偏移)；块不完整或损坏时为 None
+    """
+    if pos == 0:
+        pos = len(MAGIC)
+    if pos + 4 > len(data):
+        return None
+    length, = struct.unpack_from('<I', data, pos)
+    end = pos + 4 + length
+    if end > len(data):
+        return None
+    try:
+        block = json.loads(data[pos + 4:end].decode('utf-8'))
+    except ValueError:
+        return None
+    return block, _aligned(end)
+
+
+def _write_segment(f, offset, terms, postings):
+    """
+    在文件偏移 offset 处写入一段（terms 的位置数组），返回写入的字节数（含对齐填充）
+    """
+    table = {}
+    start = 0
+    for term in terms:
+        table[term] = [start, len(postings[term])]
+        start += len(postings[term])
+
+    header = json.dumps({'terms': table}, ensure_ascii=False).encode('utf-8')
+    head_size = 4 + len(header)
+    head_padding = _aligned(offset + head_size) - offset - head_size
+    f.write(struct.pack('<I', len(header)))
+    f.write(header)
+    f.write(b'\0' * head_padding)
+
+    data_size = 0
+    for term in terms:
+        chunk = bytes(postings[term])
+        f.write(chunk)
+        data_size += len(chunk)
+    end = offset + head_size + head_padding + data_size
+    tail_padding = _aligned(end) - end
+    f.write(b'\0' * tail_padding)
+    return head_size + head_padding + data_size + tail_padding
+
+
+def _release(view):
+    """释放 memoryview；仍有 numpy 数组引用它时保持原样（由垃圾回收释放）"""
+    try:
+        view.release()
+    except BufferError:
+        pass
+
+
+def _aligned(offset, alignment=8):
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def corpus_index(text, terms=(), cache_dir=DEFAULT_CACHE_DIR):
+    """
+    取得某份语料的共享索引，并确保 terms 均已建立索引（有新增时写盘）
+
+    同一进程内对同一文本多次调用返回同一个对象；
+    最多共享 MAX_SHARED_INDEXES 份语料，最久未用的先被淘汰
+    """
+    key = (hash(text), len(text), str(cache_dir))
+    index = _indexes.get(key)
+    if index is None or not (index.text is text or index.text == text):
+        index = PositionalIndex(text, cache_dir)
+        _indexes[key] = index
+    _indexes.move_to_end(key)
+    while len(_indexes) > MAX_SHARED_INDEXES:
+        _indexes.popitem(last=False)
+
+    if index.add_terms(terms):
+        index.save()
+    return index
@@ -4,11 +4,16 @@
 验证"炼丹→重金属中毒→暴虐→宫变"的因果链
 """
 import sys
-import re
 from pathlib import Path
-from collections import defaultdict
 import json
 
+from date_index import DateIndex
+from event_store import EventStore, build_page_index
+from gazetteer import load_gazetteer
+from lexicon import DEFAULT_CONFIG_FILE, load_lexicon
+from period_compare import Period, PeriodComparator, format_change
+from positional_index import corpus_index
+
 if hasattr(sys.stdout, 'reconfigure'):
     sys.stdout.reconfigure(encoding='utf-8')
 if hasattr(sys.stderr, 'reconfigure'):
@@ -18,9 +23,18 @@ if hasattr(sys.stderr, 'reconfigure'):
 class RenyinAnalyzer:
     """壬寅宫变专项分析器"""
 
-    def __init__(self, data_file):
+    def __init__(self, data_file, config_file=DEFAULT_CONFIG_FILE):
         self.data_file = Path(data_file)
+        self.config_file = config_file
         self.content = ""
+
+        # 词表统一来自 config.json，与其他分析器共用同一个匹配自动机
+        self.lexicon = load_lexicon(config_file)
+        self.matcher = self.lexicon.compile()
+        self._hits = None
+        self._date_index = None
+        self._page_index = None
+
         self.load_data()
 
     def load_data(self):
@@ -35,33 +49,58 @@ class RenyinAnalyzer:
         print(f"✓ 已加载数据: {len(self.content):,}字")
         return True
 
+    def lexicon_hits(self):
+        """全文关键词命中 [(位置, 关键词ID), ...]，只扫描一遍并缓存"""
+        if self._hits is None:
+            # 位置取自全语料共享的倒排索引（已落盘时直接映射，不再扫描文本）
+            self._hits = corpus_index(self.content, self.matcher.keywords).hits(self.matcher.keywords)
+        return self._hits
+
+    def date_index(self):
+        """全文日期索引（偏移 → 日序号），只构建一次"""
+        if self._date_index is None:
+            self._date_index = DateIndex.build(self.content)
+        return self._date_index
+
+    def page_index(self):
+        """全文页码索引（偏移 → 点校本页码），只构建一次"""
+        if self._page_index is None:
+            self._page_index = build_page_index(self.content)
+        return self._page_index
+
+    def _extract_category(self, category, value_key, context_length=300):
+        """
+        提取某一类别的全部命中事件（列式事件表），并打印各关键词的命中次数
+
+        参数:
+            category: 'toxicity' 或 'tyranny'
+            value_key: 事件中存放权重的字段名（'weight' 或 'score'）
+            context_length: 上下文前后各取的字数（访问 event['context'] 时才切片）
+        """
+        events = EventStore.from_hits(
+            self.content, self.lexicon_hits(), self.matcher, category,
+            date_index=self.date_index(), page_index=self.page_index(),
+            value_key=value_key, context_length=context_length
+        )
+
+        label = '权重' if value_key == 'weight' else '分数'
+        counts = events.keyword_counts()
+        for kid, weight in self.matcher.categories[category].items():
+            if counts.get(kid, 0) > 0:
+                print(f"  [{self.matcher.keywords[kid]}]: {counts[kid]}次 ({label}={weight})")
+
+        return events
+
     def search_palace_incident_keywords(self):
         """搜索宫变相关的所有可能关键词"""
         print("\n" + "="*60)
         print("第一步：搜索宫变事件关键词")
         print("="*60)
 
-        # 宫变可能的各种说法
-        keywords = {
-            # 直接说法
-            '宫变': 0, '杨金英': 0, '弑': 0, '弑君': 0,
-
-            # 委婉说法
-            '宫人': 0, '逆谋': 0, '内变': 0, '宫闱': 0,
-            '妖妇': 0, '妖人': 0, '叛逆': 0,
-
-            # 相关人物
-            '方皇后': 0, '曹端妃': 0, '王宁嫔': 0,
-
-            # 地点
-            '端本宫': 0, '永寿宫': 0, '长春宫': 0,
-
-            # 事件线索
-            '勒死': 0, '缢': 0, '谋害': 0, '逆宫人': 0
-        }
-
-        for keyword in keywords.keys():
-            keywords[keyword] = self.content.count(keyword)
+        # 宫变可能的各种说法：事件用语、相关人物、地点（名录中"壬寅宫变"分组，含别名）
+        palace = load_gazetteer().select(groups=['壬寅宫变'])
+        counts = palace.scan(self.content).counts()
+        keywords = {entity.name: int(n) for entity, n in zip(palace.entities, counts.tolist())}
 
         print("\n关键词统计:")
         found_any = False
@@ -85,70 +124,10 @@ class RenyinAnalyzer:
         print("第二步：提取重金属摄入/修道活动指标（增强版）")
         print("="*60)
 
-        # 扩展关键词库
-        keywords = {
-            # 直接代理（高权重）
-            '进丹': 10, '赐药': 10, '红铅': 10, '秋石': 10,
-            '金丹': 10, '灵药': 8, '仙药': 8,
-
-            # 道士名字（嘉靖中期重要道士）
-            '陶仲文': 10, '邵元节': 10, '段朝用': 8,
-
-            # 间接代理（修道活动）
-            '醮': 5, '祷': 5, '祀': 3, '斋': 3,
-            '建醮': 7, '祷祀': 6, '雷坛': 6,
-            '修斋': 5, '斋戒': 4,
-
-            # 宫殿（专门修道的地方）
-            '玄极宝殿': 8, '钦安殿': 6,
-
-            # 病理反应（重金属中毒症状）
-            '不豫': 5, '甚至': 2, '心悸': 7,
-            '不能视朝': 6, '寝疾': 5, '躁': 6,
-
-            # 宫女相关（炼丹需要宫女采集甘露）
-            '采露': 8, '甘露': 6, '露水': 5
-        }
-
-        toxicity_events = []
-
-        for keyword, weight in keywords.items():
-            pos = 0
-            count = 0
-
-            while True:
-                pos = self.content.find(keyword, pos)
-                if pos == -1:
-                    break
-
-                # 提取上下文
-                start = max(0, pos - 300)
-                end = min(len(self.content), pos + len(keyword) + 300)
-                context = self.content[start:end]
-
-                # 提取日期
-                date_match = re.search(r'(嘉靖\w+年\w+月\w+)', context)
-                date = date_match.group(1) if date_match else "未知日期"
-
-                toxicity_events.append({
-                    'position': pos,
-                    'date': date,
-                    'keyword': keyword,
-                    'weight': weight,
-                    'context': context
-                })
-
-                count += 1
-                pos += len(keyword)
-
-            if count > 0:
-                print(f"  [{keyword}]: {count}次 (权重={weight})")
-
-        # 按位置排序
-        toxicity_events.sort(key=lambda x: x['position'])
+        toxicity_events = self._extract_category('toxicity', 'weight')
 
         print(f"\n✓ 共找到 {len(toxicity_events)} 个重金属/修道活动指标")
-        total_weight = sum(e['weight'] for e in toxicity_events)
+        total_weight = toxicity_events.total()
         print(f"✓ 累积毒性权重: {total_weight}")
 
         return toxicity_events
@@ -159,124 +138,69 @@ class RenyinAnalyzer:
         print("第三步：提取政治暴虐指标（增强版）")
         print("="*60)
 
-        keywords = {
-            # 一级暴虐（致死/肉体伤害）
-            '廷杖': 10, '毙于杖下': 10, '弃市': 10,
-            '斩': 10, '绞': 10, '凌迟': 10,
-            '下诏狱': 9, '锦衣卫': 7,
-
-            # 二级暴虐（政治清洗）
-            '削籍': 5, '为民': 4, '致仕': 2,
-            '褫夺': 6, '切责': 5, '罢黜': 4,
-            '贬谪': 5, '戍边': 6, '充军': 6,
-
-            # 三级暴虐（情绪宣泄）
-            '震怒': 4, '大怒': 5, '掷表': 3,
-            '叱退': 2, '责骂': 3,
-
-            # 针对宫女的暴虐（壬寅宫变特有）
-            '杖宫人': 10, '责宫人': 7, '罚宫人': 5
-        }
-
-        tyranny_events = []
-
-        for keyword, score in keywords.items():
-            pos = 0
-            count = 0
-
-            while True:
-                pos = self.content.find(keyword, pos)
-                if pos == -1:
-                    break
-
-                # 提取上下文
-                start = max(0, pos - 300)
-                end = min(len(self.content), pos + len(keyword) + 300)
-                context = self.content[start:end]
-
-                # 提取日期
-                date_match = re.search(r'(嘉靖\w+年\w+月\w+)', context)
-                date = date_match.group(1) if date_match else "未知日期"
-
-                tyranny_events.append({
-                    'position': pos,
-                    'date': date,
-                    'keyword': keyword,
-                    'score': score,
-                    'context': context
-                })
-
-                count += 1
-                pos += len(keyword)
-
-            if count > 0:
-                print(f"  [{keyword}]: {count}次 (分数={score})")
-
-        tyranny_events.sort(key=lambda x: x['position'])
+        tyranny_events = self._extract_category('tyranny', 'score')
 
         print(f"\n✓ 共找到 {len(tyranny_events)} 个暴虐事件指标")
-        total_score = sum(e['score'] for e in tyranny_events)
+        total_score = tyranny_events.total()
         print(f"✓ 累积暴虐分数: {total_score}")
 
         return tyranny_events
 
-    def compare_with_early_jiajing(self):
-        """与嘉靖初期数据对比"""
-        print("\n" + "="*60)
-        print("第四步：与嘉靖初期对比分析")
-        print("="*60)
+    # 对比表中展示的指标
+    COMPARISON_METRICS = {
+        'toxicity_events': '修道活动频次',
+        'toxicity_weight': '累积毒性权重',
+        'tyranny_events': '暴虐事件频次',
+        'tyranny_weight': '累积暴虐分数'
+    }
 
-        # 嘉靖初期数据（来自之前的分析）
-        early_data = {
-            'chars': 683965,
-            'toxicity_events': 84,
-            'toxicity_weight': 305,
-            'tyranny_events': 540,
-            'tyranny_score': 3041
-        }
-
-        # 当前数据
-        current_chars = len(self.content)
-
-        # 重新提取用于对比
-        tox = self.extract_toxicity_enhanced()
-        tyr = self.extract_tyranny_enhanced()
-
-        current_data = {
-            'chars': current_chars,
-            'toxicity_events': len(tox),
-            'toxicity_weight': sum(e['weight'] for e in tox),
-            'tyranny_events': len(tyr),
-            'tyranny_score': sum(e['score'] for e in tyr)
-        }
-
-        print("\n对比结果:\n")
-        print(f"{'指标':<20} {'嘉靖初期(1-3年)':<20} {'壬寅时期(19-23年)':<20} {'变化率':<15}")
-        print("-" * 80)
+    def compare_with_early_jiajing(self, early_file="jiajing_data_from_pdf/complete_vol1-45.txt",
+                                   periods=None):
+        """
+        与嘉靖初期数据对比（指标由多时期对比引擎现算，不再使用写死的基线）
 
-        # 归一化到每10万字
-        normalize = 100000
+        参数:
+            early_file: 嘉靖初期语料
+            periods: [Period, ...]，默认 嘉靖初期(1-3年) 与 本语料所在卷；第一个时期为变化率基准
 
-        for key in ['toxicity_events', 'toxicity_weight', 'tyranny_events', 'tyranny_score']:
-            early_val = early_data[key] / early_data['chars'] * normalize
-            current_val = current_data[key] / current_data['chars'] * normalize
+        返回:
+            PeriodComparator.compare 的对比表
+        """
+        print("\n" + "="*60)
+        print("第四步：与嘉靖初期对比分析")
+        print("="*60)
 
-            if early_val > 0:
-                change = ((current_val - early_val) / early_val) * 100
-                change_str = f"+{change:.1f}%" if change > 0 else f"{change:.1f}%"
+        comparator = PeriodComparator(self.config_file)
+        early_file = Path(early_file)
+        if early_file.exists():
+            comparator.add_file(early_file)
+        else:
+            print(f"⚠️ 找不到嘉靖初期语料 {early_file}，基准时期将为空")
+        current = comparator.add_file(self.data_file, text=self.content)
+
+        if periods is None:
+            periods = [Period.reign('嘉靖初期(1-3年)', (1, 1), (3, 12), sources=[early_file.name])]
+            if current.volumes:
+                first, last = current.volumes
+                periods.append(Period.volume_range(f'壬寅时期(卷{first}-{last})', first, last))
             else:
-                change_str = "N/A"
+                periods.append(Period('壬寅时期', sources=[current.name]))
+
+        comparison = comparator.compare(periods)
 
-            label = {
-                'toxicity_events': '修道活动频次',
-                'toxicity_weight': '累积毒性权重',
-                'tyranny_events': '暴虐事件频次',
-                'tyranny_score': '累积暴虐分数'
-            }[key]
+        print("\n对比结果（归一化到每10万字）:\n")
+        header = f"{'指标':<16}" + ''.join(f"{name:<22}" for name in comparison['periods'])
+        print(header + f"{'变化率':<15}")
+        print("-" * 80)
 
-            print(f"{label:<20} {early_val:<20.1f} {current_val:<20.1f} {change_str:<15}")
+        for key, label in self.COMPARISON_METRICS.items():
+            values = ''.join(f"{values[key]:<22.1f}" for values in comparison['normalized'])
+            changes = ' / '.join(format_change(change[key]) for change in comparison['change'][1:])
+            print(f"{label:<16}{values}{changes:<15}")
 
-        return early_data, current_data
+        print("\n字数: " + ', '.join(f"{name} {raw['chars']:,}字"
+                                    for name, raw in zip(comparison['periods'], comparison['raw'])))
+        return comparison
 
     def generate_renyin_report(self, palace_keywords, tox_events, tyr_events, comparison):
         """生成壬寅宫变专项报告"""
@@ -314,38 +238,23 @@ class RenyinAnalyzer:
 
             f.write("## X轴：重金属摄入指标\n\n")
             f.write(f"- 总事件数: {len(tox_events)}\n")
-            f.write(f"- 累积权重: {sum(e['weight'] for e in tox_events)}\n\n")
+            f.write(f"- 累积权重: {tox_events.total()}\n\n")
 
             f.write("## Y轴：政治暴虐指标\n\n")
             f.write(f"- 总事件数: {len(tyr_events)}\n")
-            f.write(f"- 累积分数: {sum(e['score'] for e in tyr_events)}\n\n")
+            f.write(f"- 累积分数: {tyr_events.total()}\n\n")
 
             f.write("## 与嘉靖初期对比\n\n")
-            f.write("（归一化到每10万字）\n\n")
-            f.write("| 指标 | 嘉靖初期 | 壬寅时期 | 变化率 |\n")
-            f.write("|------|----------|----------|--------|\n")
-
-            early, current = comparison
-            normalize = 100000
-
-            metrics = {
-                'toxicity_events': '修道活动频次',
-                'toxicity_weight': '累积毒性权重',
-                'tyranny_events': '暴虐事件频次',
-                'tyranny_score': '累积暴虐分数'
-            }
-
-            for key, label in metrics.items():
-                early_val = early[key] / early['chars'] * normalize
-                current_val = current[key] / current['chars'] * normalize
+            f.write("（归一化到每10万字，变化率相对于第一个时期）\n\n")
 
-                if early_val > 0:
-                    change = ((current_val - early_val) / early_val) * 100
-                    change_str = f"+{change:.1f}%" if change > 0 else f"{change:.1f}%"
-                else:
-                    change_str = "N/A"
+            names = comparison['periods']
+            f.write("| 指标 | " + " | ".join(names) + " | 变化率 |\n")
+            f.write("|------|" + "----------|" * len(names) + "--------|\n")
 
-                f.write(f"| {label} | {early_val:.1f} | {current_val:.1f} | {change_str} |\n")
+            for key, label in self.COMPARISON_METRICS.items():
+                values = " | ".join(f"{values[key]:.1f}" for values in comparison['normalized'])
+                changes = " / ".join(format_change(change[key]) for change in comparison['change'][1:])
+                f.write(f"| {label} | {values} | {changes} |\n")
 
         print(f"\n✓ 报告已保存: {report_file}")
         return report_file
@@ -365,29 +274,27 @@ def main():
     # 步骤1: 搜索宫变关键词
     palace_keywords = analyzer.search_palace_incident_keywords()
 
-    # 步骤2&3: 提取毒性和暴虐指标（在对比函数中完成）
-
-    # 步骤4: 对比分析
-    early_data, current_data = analyzer.compare_with_early_jiajing()
-
-    # 重新提取用于报告
+    # 步骤2&3: 提取毒性和暴虐指标
     tox_events = analyzer.extract_toxicity_enhanced()
     tyr_events = analyzer.extract_tyranny_enhanced()
 
+    # 步骤4: 对比分析（由位置索引汇总，不再重复提取）
+    comparison = analyzer.compare_with_early_jiajing()
+
     # 步骤5: 生成报告
     report_file = analyzer.generate_renyin_report(
         palace_keywords,
         tox_events,
         tyr_events,
-        (early_data, current_data)
+        comparison
     )
 
     print("\n" + "="*60)
     print("✅ 分析完成!")
     print("="*60)
     print(f"\n📊 核心数据:")
-    print(f"  - 修道活动: {len(tox_events)}次 (累积权重{sum(e['weight'] for e in tox_events)})")
-    print(f"  - 暴虐事件: {len(tyr_events)}次 (累积分数{sum(e['score'] for e in tyr_events)})")
+    print(f"  - 修道活动: {len(tox_events)}次 (累积权重{tox_events.total()})")
+    print(f"  - 暴虐事件: {len(tyr_events)}次 (累积分数{tyr_events.total()})")
     print(f"\n📄 详细报告: {report_file}")
 
 
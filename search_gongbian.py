@@ -3,6 +3,8 @@
 import sys
 import re
 
+from positional_index import corpus_index
+
 if hasattr(sys.stdout, 'reconfigure'):
     sys.stdout.reconfigure(encoding='utf-8')
 
@@ -16,14 +18,10 @@ print("搜索'宫人'相关上下文")
 print("="*60)
 
 pattern = '宫人'
-pos = 0
 count = 0
 
-while True:
-    pos = content.find(pattern, pos)
-    if pos == -1:
-        break
-
+# 位置取自共享倒排索引（与其他分析脚本共用同一份索引文件）
+for pos in corpus_index(content, [pattern]).positions(pattern):
     count += 1
     start = max(0, pos - 500)
     end = min(len(content), pos + 500)
@@ -38,6 +36,4 @@ while True:
     print(context)
     print("-" * 60)
 
-    pos += len(pattern)
-
 print(f"\n共找到{count}处'宫人'")
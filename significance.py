@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+滞后相关显著性检验 - 循环移位置换检验 + 分块自助法
+
+解决问题：
+毒性-暴虐假设目前只有原始计数和人工挑选的"高相关案例"，
+无法回答"这个滞后相关是否只是偶然"
+
+方法：
+1. 循环移位置换检验：把 y 整体循环平移随机步数，保留各自的自相关结构，
+   只破坏两者的时间对应关系，得到各滞后相关系数的零分布 → p 值；
+   平移步数避开 ±2·max_lag 以内，免得真实关系只是换了个滞后又出现在零分布里
+2. 循环分块自助法：按固定长度的块重抽时间下标，配对 (x[t], y[t+lag]) 取自原序列（不回绕），
+   重算与 cross_correlation 相同的统计量，得到各滞后相关系数的置信区间；
+   方差为0的退化重抽不计入分位数
+3. 每批数百条序列一次FFT向量化计算；批次分发到进程池，
+   每批的随机种子由 SeedSequence 派生，结果与进程数无关、可复现
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from timeseries_stats import cross_correlation
+
+
+def _batch_sizes(total, batch_size):
+    """把 total 次重抽切分为若干批"""
+    return [min(batch_size, total - start) for start in range(0, total, batch_size)]
+
+
+def _permutation_batch(x, y, max_lag, count, seed_seq, observed):
+    """
+    一批循环移位置换
+
+    返回:
+        (各滞后 |零分布| >= |观测| 的次数, 全滞后最大 |相关| >= 观测最大值 的次数)
+    """
+    rng = np.random.default_rng(seed_seq)
+    n = len(y)
+    # 平移步数不超过 2·max_lag（模 n）时，真实的滞后关系只是移到另一个被检验的滞后上，
+    # 不能作为零分布的样本；序列太短无法避开时退回任意非零平移
+    low, high = (2 * max_lag + 1, n - 2 * max_lag) if n > 4 * max_lag + 1 else (1, n)
+    shifts = rng.integers(low, high, size=count) if high > low else np.zeros(count, dtype=np.int64)
+    shifted = y[(np.arange(n)[None, :] + shifts[:, None]) % n]
+
+    _, null = cross_correlation(x, shifted, max_lag)
+    abs_null = np.abs(null)
+    abs_obs = np.abs(observed)
+
+    exceed = (abs_null >= abs_obs[None, :] - 1e-12).sum(axis=0)
+    exceed_max = int((abs_null.max(axis=1) >= abs_obs.max() - 1e-12).sum())
+    return exceed, exceed_max
+
+
+def _block_sums(values, block_length):
+    """循环意义下以每个位置为起点、长度为 block_length 的块内求和（最后一维）"""
+    extended = np.concatenate([values, values[..., :block_length - 1]], axis=-1)
+    csum = np.cumsum(extended, axis=-1)
+    csum = np.concatenate([np.zeros(csum.shape[:-1] + (1,)), csum], axis=-1)
+    return csum[..., block_length:] - csum[..., :-block_length]
+
+
+def _bootstrap_batch(x, y, max_lag, count, seed_seq, block_length):
+    """
+    一批循环分块自助重抽，返回 (count, 滞后数) 的相关系数矩阵，退化的重抽（方差为0）记为 NaN
+
+    重抽的是时间下标 t（循环分块），统计量与 cross_correlation 相同：
+        r*[lag] = Σ (x[t] - x̄*)(y[t+lag] - ȳ*) / (N·σx*·σy*)
+    x̄*、σx*、ȳ*、σy* 取自重抽到的全部 N 个时点，配对 (x[t], y[t+lag]) 始终取自原序列，
+    t+lag 越界的配对不计入（与 cross_correlation 的补零一致），不会产生回绕的虚假配对；
+    不重抽（t 依次取 0..n-1）时 r* 正好等于 cross_correlation 的结果。
+    每个起点的块内和预先算好，重抽时只需对选中块的和再求和
+    """
+    rng = np.random.default_rng(seed_seq)
+    n = len(x)
+    lags = np.arange(-max_lag, max_lag + 1)
+
+    # 各滞后的 有效标记、x、y[t+lag]、x·y[t+lag]（越界处为0）
+    lagged = np.zeros((len(lags), 4, n))
+    for j, lag in enumerate(lags.tolist()):
+        lo, hi = max(0, -lag), n - max(0, lag)
+        lagged[j, 0, lo:hi] = 1.0
+        lagged[j, 1, lo:hi] = x[lo:hi]
+        lagged[j, 2, lo:hi] = y[lo + lag:hi + lag]
+        lagged[j, 3, lo:hi] = x[lo:hi] * y[lo + lag:hi + lag]
+
+    base = _block_sums(np.stack([x, x * x, y, y * y]), block_length)
+    lagged = _block_sums(lagged, block_length)
+
+    starts = rng.integers(0, n, size=(count, -(-n // block_length)))
+    total = starts.shape[1] * block_length
+
+    mx, mxx, my, myy = base[:, starts].sum(axis=-1) / total
+    valid, sx, sy, sxy = lagged[:, :, starts].sum(axis=-1).transpose(1, 2, 0)
+
+    mx, my = mx[:, None], my[:, None]
+    cov = sxy - my * sx - mx * sy + mx * my * valid
+    denom = total * np.sqrt(np.maximum(mxx - mx[:, 0] ** 2, 0.0) * np.maximum(myy - my[:, 0] ** 2, 0.0))
+    denom = denom[:, None]
+    return np.divide(cov, denom, out=np.full_like(cov, np.nan), where=denom > 0)
+
+
+def _run_batches(func, args_list, workers):
+    """workers == 1 时在本进程内执行，否则分发到进程池"""
+    if workers == 1 or len(args_list) <= 1:
+        return [func(*args) for args in args_list]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(func, *args) for args in args_list]
+        return [future.result() for future in futures]
+
+
+def permutation_test(x, y, max_lag, n_perm=10000, seed=0, batch_size=500, workers=None):
+    """
+    循环移位置换检验
+
+    参数:
+        x, y: 等长一维序列（如日度毒性、暴虐分数）
+        max_lag: 最大滞后
+        n_perm: 置换次数
+        seed: 随机种子（相同种子结果完全相同，与 workers 无关）
+        workers: 进程数，默认CPU核数；1 表示不启用进程池
+
+    返回:
+        Dict: {
+            "lags": 滞后数组,
+            "corr": 观测相关系数,
+            "p_values": 各滞后双侧 p 值,
+            "p_max": 全滞后最大|相关|的 p 值（已校正多重比较）
+        }
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    lags, observed = cross_correlation(x, y, max_lag)
+
+    seeds = np.random.SeedSequence(seed).spawn(len(_batch_sizes(n_perm, batch_size)))
+    args_list = [
+        (x, y, max_lag, count, seed_seq, observed)
+        for count, seed_seq in zip(_batch_sizes(n_perm, batch_size), seeds)
+    ]
+    results = _run_batches(_permutation_batch, args_list, workers or os.cpu_count())
+
+    exceed = sum(r[0] for r in results)
+    exceed_max = sum(r[1] for r in results)
+    return {
+        'lags': lags,
+        'corr': observed,
+        'p_values': (exceed + 1) / (n_perm + 1),
+        'p_max': (exceed_max + 1) / (n_perm + 1)
+    }
+
+
+def block_bootstrap_ci(x, y, max_lag, n_boot=2000, block_length=None, alpha=0.05,
+                       seed=0, batch_size=200, workers=None):
+    """
+    循环分块自助法置信区间
+
+    参数:
+        block_length: 块长度，默认 max(max_lag + 1, √n)，保证块内保留所检验的滞后结构
+        alpha: 置信区间为 (1 - alpha)
+
+    返回:
+        Dict: {"lags": 滞后数组, "corr": 观测相关系数, "ci_low": 下界, "ci_high": 上界}
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    lags, observed = cross_correlation(x, y, max_lag)
+
+    n = len(x)
+    if block_length is None:
+        block_length = max(len(lags) // 2 + 1, int(np.sqrt(n)))
+    block_length = max(1, min(block_length, n))
+
+    seeds = np.random.SeedSequence(seed).spawn(len(_batch_sizes(n_boot, batch_size)))
+    args_list = [
+        (x, y, len(lags) // 2, count, seed_seq, block_length)
+        for count, seed_seq in zip(_batch_sizes(n_boot, batch_size), seeds)
+    ]
+    boot = np.concatenate(_run_batches(_bootstrap_batch, args_list, workers or os.cpu_count()))
+
+    return {
+        'lags': lags,
+        'corr': observed,
+        'ci_low': _nanquantile(boot, alpha / 2),
+        'ci_high': _nanquantile(boot, 1 - alpha / 2)
+    }
+
+
+def _nanquantile(values, q):
+    """逐列分位数，忽略 NaN（退化的重抽）；整列都是 NaN 时结果为 NaN"""
+    result = np.full(values.shape[1], np.nan)
+    usable = ~np.isnan(values).all(axis=0)
+    if usable.any():
+        result[usable] = np.nanquantile(values[:, usable], q, axis=0)
+    return result
+
+
+def lagged_significance(x, y, max_lag, n_perm=10000, n_boot=2000, alpha=0.05, seed=0, workers=None):
+    """
+    置换检验 + 分块自助法，合并为一张逐滞后结果表
+
+    返回:
+        Dict: {"lags", "corr", "p_values", "p_max", "ci_low", "ci_high"}
+    """
+    perm = permutation_test(x, y, max_lag, n_perm=n_perm, seed=seed, workers=workers)
+    boot = block_bootstrap_ci(x, y, max_lag, n_boot=n_boot, alpha=alpha, seed=seed + 1, workers=workers)
+    perm.update(ci_low=boot['ci_low'], ci_high=boot['ci_high'])
+    return perm
@@ -0,0 +1,661 @@
+# -*- coding: utf-8 -*-
+"""
+双源对齐 - 维基文库抓取本与 PDF 提取本逐字对齐：各卷一致率、错误片段、择优合并文本
+
+解决问题：
+卷1-45 有两份独立来源：jiajing_data/jiajing_shilu_vol*.txt（维基文库）与
+jiajing_data_from_pdf/complete_vol1-45.txt（PyPDF2 提取），从来没有互相核对过；
+直接对两份百万字文本做 difflib 既慢（平方复杂度）又会被版式差异（标点、条目编号、页眉、注码）淹没
+
+方法：
+1. 两边都只保留汉字（记录每个汉字在原文中的偏移），标点、编号、注码、空白不参与比较
+2. 锚点：两边都恰好出现一次的 k 字片段（默认 k=12，多项式滚动哈希，排序后查重），
+   按 A 侧位置排列后取 B 侧位置的最长递增子序列，去掉乱序锚点；同一对角线上相接的锚点合并为相同段
+3. 锚点之间的空隙：小空隙做带状编辑距离（只算对角线附近 |Δ| + pad 宽的带，逐行向量化），
+   大空隙在空隙内用更短的 k 重新找唯一锚点递归切分；仍找不到锚点的记为整块不对应
+4. 结果是 difflib 风格的操作表（equal / replace / delete / insert），总代价近似线性
+5. 报告：各卷一致率、全部差异片段（单字异文 / 单侧缺文 / 整块不对应）、高频异文对；
+   合并文本逐卷生成（一致率过低的卷跳过），以 A（维基文库）为底本，差异处用一致部分统计的
+   字二元组频率判断哪一侧更通顺；B 侧多出的短片段（不跨卷/章、非反复出现的页眉）补入
+"""
+import json
+import re
+import sys
+from bisect import bisect_left
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from corpus_manager import corpus_manager
+from suffix_array import pack_volumes
+from term_discovery import is_hanzi
+
+if hasattr(sys.stdout, 'reconfigure'):
+    sys.stdout.reconfigure(encoding='utf-8')
+if hasattr(sys.stderr, 'reconfigure'):
+    sys.stderr.reconfigure(encoding='utf-8')
+
+
+TAGS = ('equal', 'replace', 'delete', 'insert')
+EQUAL, REPLACE, DELETE, INSERT = range(4)
+
+# 带状编辑距离中表示"带外"的大数
+INF = 1 << 40
+
+# 字二元组键：前一字码 << BITS | 后一字码
+BITS = 21
+
+# 卷首标题行：PDF 正文"13 卷一（正德十六年四月）"、维基文库"明世宗实录 卷1"（目录行带页码，不匹配）
+CHAPTER_PATTERN = re.compile(
+    r'^[ \t]*(?:\d+[ \t]*)?(?:明世宗实录[ \t]*)?卷[〇一二三四五六七八九十百\d]+(?:（[^）\n]*）)?[ \t]*$',
+    re.MULTILINE
+)
+
+# 一致率低于该值的卷不生成合并文本（两侧并非同一段文字）
+MIN_MERGE_AGREEMENT = 0.8
+
+
+def normalize(text):
+    """
+    只保留汉字
+
+    返回:
+        (字码数组 uint32, 各字在原文中的偏移数组)
+    """
+    codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+    offsets = np.flatnonzero(is_hanzi(codes))
+    return codes[offsets], offsets
+
+
+def kgram_hashes(codes, k):
+    """每个起点的 k 字片段 → 64 位多项式哈希（溢出回绕）"""
+    count = len(codes) - k + 1
+    if count <= 0:
+        return np.zeros(0, dtype=np.uint64)
+    values = codes.astype(np.uint64)
+    hashes = np.zeros(count, dtype=np.uint64)
+    base = np.uint64(0x100000001B3)
+    for i in range(k):
+        hashes = hashes * base + values[i:i + count]
+    return hashes
+
+
+def _unique_kgrams(codes, k):
+    """只出现一次的 k 字片段：(哈希升序数组, 对应起点)"""
+    hashes = kgram_hashes(codes, k)
+    order = np.argsort(hashes, kind='stable')
+    hashes = hashes[order]
+    if len(hashes) == 0:
+        return hashes, order
+    distinct = np.ones(len(hashes), dtype=bool)
+    same = hashes[1:] == hashes[:-1]
+    distinct[1:] &= ~same
+    distinct[:-1] &= ~same
+    return hashes[distinct], order[distinct]
+
+
+def longest_increasing(values):
+    """严格递增的最长子序列的下标（耐心排序，O(n log n)）"""
+    tails, tail_ids = [], []
+    previous = [-1] * len(values)
+    for i, v in enumerate(values):
+        j = bisect_left(tails, v)
+        if j == len(tails):
+            tails.append(v)
+            tail_ids.append(i)
+        else:
+            tails[j] = v
+            tail_ids[j] = i
+        previous[i] = tail_ids[j - 1] if j > 0 else -1
+
+    result = []
+    i = tail_ids[-1] if tail_ids else -1
+    while i >= 0:
+        result.append(i)
+        i = previous[i]
+    return np.array(result[::-1], dtype=np.int64)
+
+
+def anchors(a, b, k):
+    """
+    两边都唯一、且顺序一致的 k 字片段
+
+    返回:
+        (A 起点数组, B 起点数组)，两者都严格递增
+    """
+    a_hashes, a_pos = _unique_kgrams(a, k)
+    b_hashes, b_pos = _unique_kgrams(b, k)
+    _, a_idx, b_idx = np.intersect1d(a_hashes, b_hashes, assume_unique=True, return_indices=True)
+    a_pos, b_pos = a_pos[a_idx], b_pos[b_idx]
+
+    order = np.argsort(a_pos)
+    a_pos, b_pos = a_pos[order], b_pos[order]
+    # 排除哈希碰撞
+    if len(a_pos):
+        offsets = np.arange(k)
+        same = (a[a_pos[:, None] + offsets] == b[b_pos[:, None] + offsets]).all(axis=1)
+        a_pos, b_pos = a_pos[same], b_pos[same]
+
+    keep = longest_increasing(b_pos.tolist())
+    return a_pos[keep], b_pos[keep]
+
+
+def anchor_runs(a_pos, b_pos, k):
+    """
+    锚点 → 不重叠的相同段 [(a0, a1, b0, b1), ...]
+
+    同一对角线上相接或重叠的锚点合并；与前一段交叉的锚点丢弃
+    """
+    runs = []
+    for i, j in zip(a_pos.tolist(), b_pos.tolist()):
+        if runs:
+            a0, a1, b0, b1 = runs[-1]
+            if i - j == a0 - b0 and i <= a1:
+                runs[-1] = (a0, i + k, b0, j + k)
+                continue
+            if i < a1 or j < b1:
+                continue
+        runs.append((i, i + k, j, j + k))
+    return runs
+
+
+def banded_diff(a, b, pad=32, max_cells=1 << 22):
+    """
+    带状编辑距离（只计算对角线 j - i ∈ [min(0, n-m) - pad, max(0, n-m) + pad] 的格子）
+
+    每行内"左移"一项用 j + 累计最小值(tmp - j) 向量化
+
+    返回:
+        [(tag, i1, i2, j1, j2), ...]；格子数超过 max_cells 时返回 None
+    """
+    m, n = len(a), len(b)
+    if m == 0 or n == 0:
+        if m == 0 and n == 0:
+            return []
+        return [(INSERT if m == 0 else DELETE, 0, m, 0, n)]
+
+    d_lo = min(0, n - m) - pad
+    d_hi = max(0, n - m) + pad
+    if (m + 1) * (d_hi - d_lo + 1) > max_cells:
+        return None
+
+    rows = []
+    j_hi = min(n, d_hi)
+    rows.append((0, np.arange(j_hi + 1, dtype=np.int64)))
+
+    def values(row, js):
+        j_lo, vals = row
+        idx = js - j_lo
+        inside = (idx >= 0) & (idx < len(vals))
+        return np.where(inside, vals[np.clip(idx, 0, len(vals) - 1)], INF)
+
+    for i in range(1, m + 1):
+        j_lo, j_hi = max(0, i + d_lo), min(n, i + d_hi)
+        js = np.arange(j_lo, j_hi + 1, dtype=np.int64)
+        prev = rows[-1]
+        up = values(prev, js) + 1
+        cost = np.where(js >= 1, b[np.maximum(js - 1, 0)] != a[i - 1], 1)
+        diag = np.where(js >= 1, values(prev, js - 1) + cost, INF)
+        tmp = np.minimum(up, diag)
+        rows.append((j_lo, np.minimum.accumulate(tmp - js) + js))
+
+    def cell(i, j):
+        j_lo, vals = rows[i]
+        idx = j - j_lo
+        return int(vals[idx]) if 0 <= idx < len(vals) else INF
+
+    # 回溯，得到逐字操作
+    steps = []
+    i, j = m, n
+    while i > 0 or j > 0:
+        current = cell(i, j)
+        if i > 0 and j > 0 and current == cell(i - 1, j - 1) + (a[i - 1] != b[j - 1]):
+            steps.append(EQUAL if a[i - 1] == b[j - 1] else REPLACE)
+            i, j = i - 1, j - 1
+        elif i > 0 and current == cell(i - 1, j) + 1:
+            steps.append(DELETE)
+            i -= 1
+        else:
+            steps.append(INSERT)
+            j -= 1
+    steps.reverse()
+
+    # 逐字操作 → 片段：相同的连续字为 equal，其余连续的非相同操作合为一个片段
+    opcodes = []
+    i = j = 0
+    for step in steps:
+        di, dj = int(step != INSERT), int(step != DELETE)
+        kind = EQUAL if step == EQUAL else REPLACE
+        if opcodes and (opcodes[-1][0] == EQUAL) == (kind == EQUAL):
+            tag, i1, _, j1, _ = opcodes[-1]
+            opcodes[-1] = (tag, i1, i + di, j1, j + dj)
+        else:
+            opcodes.append((kind, i, i + di, j, j + dj))
+        i, j = i + di, j + dj
+
+    return [(EQUAL if tag == EQUAL else (REPLACE if i2 > i1 and j2 > j1 else (DELETE if i2 > i1 else INSERT)),
+             i1, i2, j1, j2) for tag, i1, i2, j1, j2 in opcodes]
+
+
+class Alignment:
+    """两份文本的逐字对齐结果（A、B 均为只含汉字的字码序列）"""
+
+    def __init__(self, a_text, b_text, opcodes, a_volume_starts=None, a_volume_labels=None):
+        """
+        参数:
+            opcodes: [(tag, a0, a1, b0, b1), ...]，坐标为只含汉字序列中的下标
+            a_volume_starts / a_volume_labels: A 侧各卷在原文中的起始偏移与卷标
+        """
+        self.a_text = a_text
+        self.b_text = b_text
+        self.a_codes, self.a_offsets = normalize(a_text)
+        self.b_codes, self.b_offsets = normalize(b_text)
+
+        ops = np.array(opcodes, dtype=np.int64).reshape(-1, 5)
+        self.tags = ops[:, 0].astype(np.int8)
+        self.a0, self.a1, self.b0, self.b1 = ops[:, 1], ops[:, 2], ops[:, 3], ops[:, 4]
+
+        self.volume_starts = (np.asarray(a_volume_starts, dtype=np.int64)
+                              if a_volume_starts is not None else np.zeros(1, dtype=np.int64))
+        self.volume_labels = list(a_volume_labels) if a_volume_labels is not None else [None]
+        self._bigrams = None
+
+        # 各侧卷/章起点（汉字下标）：B 独有片段不能跨越这些位置补入
+        a_breaks = [m.start() for m in CHAPTER_PATTERN.finditer(a_text)] + self.volume_starts.tolist()
+        b_breaks = [m.start() for m in CHAPTER_PATTERN.finditer(b_text)]
+        self.a_breaks = np.unique(np.searchsorted(self.a_offsets, np.array(a_breaks, dtype=np.int64)))
+        self.b_breaks = np.unique(np.searchsorted(self.b_offsets, np.array(b_breaks, dtype=np.int64)))
+
+    def __len__(self):
+        return len(self.tags)
+
+    def opcodes(self):
+        """[(tag, a0, a1, b0, b1), ...]，tag 为 'equal' / 'replace' / 'delete' / 'insert'"""
+        return [(TAGS[t], a0, a1, b0, b1) for t, a0, a1, b0, b1 in zip(
+            self.tags.tolist(), self.a0.tolist(), self.a1.tolist(), self.b0.tolist(), self.b1.tolist())]
+
+    @property
+    def matches(self):
+        equal = self.tags == EQUAL
+        return int((self.a1[equal] - self.a0[equal]).sum())
+
+    def ratio(self):
+        """整体一致率 2·相同字数 / (A 字数 + B 字数)"""
+        total = len(self.a_codes) + len(self.b_codes)
+        return 2 * self.matches / total if total else 1.0
+
+    def _a_to_b(self, positions):
+        """A 侧汉字下标 → B 侧对应下标（相同段内逐字对应，其他片段取片段起点，越过片段终点取终点）"""
+        positions = np.asarray(positions, dtype=np.int64)
+        if len(self.a0) == 0:
+            return np.zeros(len(positions), dtype=np.int64)
+        op = np.maximum(np.searchsorted(self.a0, positions, side='right') - 1, 0)
+        inside = np.minimum(positions - self.a0[op], self.a1[op] - self.a0[op])
+        return np.where(self.tags[op] == EQUAL, self.b0[op] + inside,
+                        np.where(positions >= self.a1[op], self.b1[op], self.b0[op]))
+
+    def volume_report(self):
+        """
+        A 侧各卷的一致情况
+
+        返回:
+            [{"volume", "a_chars", "b_chars", "matched", "agreement", "a_coverage",
+              "b_start", "b_end", "replace", "delete", "insert"}, ...]
+            agreement = 2·相同字数 / (本卷 A 字数 + 对应 B 段字数)；b_start / b_end 为 B 原文偏移
+        """
+        bounds = np.searchsorted(self.a_offsets, np.append(self.volume_starts, len(self.a_text)))
+        b_bounds = self._a_to_b(bounds)
+
+        report = []
+        for v, label in enumerate(self.volume_labels):
+            lo, hi = int(bounds[v]), int(bounds[v + 1])
+            b_lo, b_hi = int(b_bounds[v]), int(b_bounds[v + 1])
+            overlap = np.clip(np.minimum(self.a1, hi) - np.maximum(self.a0, lo), 0, None)
+            in_volume = ((self.a0 < hi) & (self.a1 > lo)) | ((self.a0 == self.a1) & (self.a0 >= lo) & (self.a0 < hi))
+            matched = int(overlap[self.tags == EQUAL].sum())
+            a_chars, b_chars = hi - lo, b_hi - b_lo
+            report.append({
+                'volume': label,
+                'a_chars': a_chars,
+                'b_chars': b_chars,
+                'matched': matched,
+                'agreement': round(2 * matched / (a_chars + b_chars), 4) if a_chars + b_chars else 1.0,
+                'a_coverage': round(matched / a_chars, 4) if a_chars else 1.0,
+                'b_start': int(self.b_offsets[b_lo]) if b_lo < len(self.b_offsets) else len(self.b_text),
+                'b_end': int(self.b_offsets[b_hi - 1]) + 1 if 0 < b_hi <= len(self.b_offsets) else 0,
+                'replace': int((in_volume & (self.tags == REPLACE)).sum()),
+                'delete': int((in_volume & (self.tags == DELETE)).sum()),
+                'insert': int((in_volume & (self.tags == INSERT)).sum())
+            })
+        return report
+
+    def _span(self, codes, offsets, text, lo, hi):
+        """汉字下标区间 → (汉字串, 原文起点, 原文终点)"""
+        if hi <= lo:
+            pos = int(offsets[lo]) if lo < len(offsets) else len(text)
+            return '', pos, pos
+        chars = ''.join(map(chr, codes[lo:hi].tolist()))
+        return chars, int(offsets[lo]), int(offsets[hi - 1]) + 1
+
+    def error_spans(self, context=8, max_variant=2):
+        """
+        全部差异片段
+
+        返回:
+            [{"kind", "volume", "a_text", "b_text", "a_start", "a_end", "b_start", "b_end", "context"}, ...]
+            kind: 'variant' 单字异文（两侧都不超过 max_variant 字）、'a_only' / 'b_only' 单侧缺文、
+                  'block' 整块不对应；起止为各自原文偏移；context 为差异前的相同文字
+        """
+        spans = []
+        for op in np.flatnonzero(self.tags != EQUAL).tolist():
+            tag = int(self.tags[op])
+            a0, a1, b0, b1 = (int(x[op]) for x in (self.a0, self.a1, self.b0, self.b1))
+            a_chars, a_start, a_end = self._span(self.a_codes, self.a_offsets, self.a_text, a0, a1)
+            b_chars, b_start, b_end = self._span(self.b_codes, self.b_offsets, self.b_text, b0, b1)
+            if tag == DELETE:
+                kind = 'a_only'
+            elif tag == INSERT:
+                kind = 'b_only'
+            elif a1 - a0 <= max_variant and b1 - b0 <= max_variant:
+                kind = 'variant'
+            else:
+                kind = 'block'
+            volume = int(np.searchsorted(self.volume_starts, a_start, side='right') - 1)
+            spans.append({
+                'kind': kind,
+                'volume': self.volume_labels[max(volume, 0)],
+                'a_text': a_chars,
+                'b_text': b_chars,
+                'a_start': a_start, 'a_end': a_end,
+                'b_start': b_start, 'b_end': b_end,
+                'context': ''.join(map(chr, self.a_codes[max(0, a0 - context):a0].tolist()))
+            })
+        return spans
+
+    def variant_pairs(self, top=30):
+        """等长异文的逐字替换对频次 [((A字, B字), 次数), ...]（系统性的提取错误会排在前面）"""
+        pairs = Counter()
+        replace = np.flatnonzero((self.tags == REPLACE) & (self.a1 - self.a0 == self.b1 - self.b0))
+        for op in replace.tolist():
+            a_chars = self.a_codes[self.a0[op]:self.a1[op]]
+            b_chars = self.b_codes[self.b0[op]:self.b1[op]]
+            for x, y in zip(a_chars.tolist(), b_chars.tolist()):
+                if x != y:
+                    pairs[(chr(x), chr(y))] += 1
+        return pairs.most_common(top)
+
+    # ---- 合并文本 ----
+
+    def bigram_model(self):
+        """两侧一致部分的字二元组与单字计数（用于判断差异处哪一侧更通顺）"""
+        if self._bigrams is None:
+            equal = np.flatnonzero(self.tags == EQUAL)
+            sizes = (self.a1[equal] - self.a0[equal]).astype(np.int64)
+            offsets = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+            positions = np.repeat(self.a0[equal], sizes) + offsets
+            run_end = np.repeat(self.a1[equal], sizes)
+
+            chars = self.a_codes[positions].astype(np.uint64)
+            pairs = positions[positions + 1 < run_end]
+            keys = (self.a_codes[pairs].astype(np.uint64) << np.uint64(BITS)) | \
+                self.a_codes[pairs + 1].astype(np.uint64)
+            self._bigrams = (np.unique(keys, return_counts=True), np.unique(chars, return_counts=True))
+        return self._bigrams
+
+    def _plausibility(self, chars, left, right):
+        """left + chars + right 的平均字二元组对数概率（加 0.1 平滑）"""
+        (bigram_keys, bigram_counts), (char_keys, char_counts) = self.bigram_model()
+        sequence = np.array([c for c in [left] + list(chars) + [right] if c is not None], dtype=np.uint64)
+        if len(sequence) < 2:
+            return 0.0
+
+        def lookup(table_keys, table_counts, keys):
+            if len(table_keys) == 0:
+                return np.zeros(len(keys))
+            idx = np.minimum(np.searchsorted(table_keys, keys), len(table_keys) - 1)
+            return np.where(table_keys[idx] == keys, table_counts[idx], 0).astype(np.float64)
+
+        keys = (sequence[:-1] << np.uint64(BITS)) | sequence[1:]
+        joint = lookup(bigram_keys, bigram_counts, keys)
+        prior = lookup(char_keys, char_counts, sequence[:-1])
+        vocabulary = max(len(char_keys), 1)
+        return float(np.mean(np.log((joint + 0.1) / (prior + 0.1 * vocabulary))))
+
+    def _crosses_break(self, op):
+        """B 独有片段是否跨卷/章：B 段内含卷首，或补入位置正是 A 的卷/章起点"""
+        b0, b1, a0 = int(self.b0[op]), int(self.b1[op]), int(self.a0[op])
+        b_hit = np.searchsorted(self.b_breaks, b0) < np.searchsorted(self.b_breaks, b1)
+        a_hit = np.searchsorted(self.a_breaks, a0) < np.searchsorted(self.a_breaks, a0, side='right')
+        return bool(b_hit or a_hit)
+
+    def choices(self, margin=0.5, max_replace=8, max_insert=20, boilerplate_repeats=3, min_insert=2):
+        """
+        每个差异片段取哪一侧
+
+        返回:
+            与操作表等长的布尔数组，True 表示取 B 侧
+            - replace：两侧都不超过 max_replace 字时，B 侧通顺度高出 margin 则取 B；
+              更长的整块不对应（两侧并非同一段文字）保留 A
+            - insert（B 独有）：min_insert..max_insert 字、不跨卷/章、不是反复出现的版式文字（页眉等，
+              同一字串作为 B 独有片段出现 boilerplate_repeats 次以上），且补入后通顺度不降低 margin 时取 B；
+              更长的 B 独有片段多为 A 未收录的条目或前言，不补入
+            - delete（A 独有）：保留 A
+        """
+        use_b = np.zeros(len(self.tags), dtype=bool)
+        inserts = np.flatnonzero(self.tags == INSERT)
+        insert_text = {op: ''.join(map(chr, self.b_codes[self.b0[op]:self.b1[op]].tolist()))
+                       for op in inserts.tolist()}
+        repeats = Counter(insert_text.values())
+
+        short = (self.a1 - self.a0 <= max_replace) & (self.b1 - self.b0 <= max_replace)
+        for op in np.flatnonzero(((self.tags == REPLACE) & short) | (self.tags == INSERT)).tolist():
+            a0, a1, b0, b1 = (int(x[op]) for x in (self.a0, self.a1, self.b0, self.b1))
+            if self.tags[op] == INSERT:
+                chars = insert_text[op]
+                if not min_insert <= len(chars) <= max_insert or repeats[chars] >= boilerplate_repeats:
+                    continue
+                if self._crosses_break(op):
+                    continue
+            left = int(self.a_codes[a0 - 1]) if a0 > 0 else None
+            right = int(self.a_codes[a1]) if a1 < len(self.a_codes) else None
+            score_a = self._plausibility(self.a_codes[a0:a1].tolist(), left, right)
+            score_b = self._plausibility(self.b_codes[b0:b1].tolist(), left, right)
+            if self.tags[op] == INSERT:
+                use_b[op] = score_b >= score_a - margin
+            else:
+                use_b[op] = score_b > score_a + margin
+        return use_b
+
+    def merged_text(self, start=0, end=None, use_b=None, **kwargs):
+        """
+        择优合并文本：以 A 原文 [start, end)（含标点、分行）为底本，取 B 的差异片段替换或补入
+        （参数见 choices）；等长替换逐字改写以保留其间标点
+        """
+        end = len(self.a_text) if end is None else end
+        if use_b is None:
+            use_b = self.choices(**kwargs)
+        lo, hi = np.searchsorted(self.a_offsets, [start, end])
+        # 只取落在该段内的片段（补入位置在段首的 B 独有片段已被 choices 排除）
+        selected = use_b & (self.a0 >= lo) & (self.a1 <= hi) & ((self.a0 > lo) | (self.a1 > self.a0))
+
+        parts = []
+        cursor = start
+        for op in np.flatnonzero(selected).tolist():
+            a0, a1, b0, b1 = (int(x[op]) for x in (self.a0, self.a1, self.b0, self.b1))
+            b_chars = self.b_codes[b0:b1].tolist()
+            if a1 - a0 == b1 - b0:
+                for offset, code in zip(self.a_offsets[a0:a1].tolist(), b_chars):
+                    parts.append(self.a_text[cursor:offset])
+                    parts.append(chr(code))
+                    cursor = offset + 1
+                continue
+
+            begin = int(self.a_offsets[a0]) if a0 < len(self.a_offsets) else len(self.a_text)
+            if a1 > a0:
+                stop = int(self.a_offsets[a1 - 1]) + 1
+            else:
+                # 补入位置：紧接前一个汉字之后
+                begin = stop = int(self.a_offsets[a0 - 1]) + 1 if a0 > 0 else 0
+            parts.append(self.a_text[cursor:begin])
+            parts.append(''.join(map(chr, b_chars)))
+            cursor = stop
+        parts.append(self.a_text[cursor:end])
+        return ''.join(parts)
+
+    def merged_volumes(self, min_agreement=MIN_MERGE_AGREEMENT, **kwargs):
+        """
+        逐卷择优合并，一致率低于 min_agreement 的卷跳过
+
+        返回:
+            {卷标: 合并文本}
+        """
+        use_b = self.choices(**kwargs)
+        bounds = np.append(self.volume_starts, len(self.a_text))
+        merged = {}
+        for v, row in enumerate(self.volume_report()):
+            if row['agreement'] < min_agreement:
+                continue
+            merged[row['volume']] = self.merged_text(int(bounds[v]), int(bounds[v + 1]), use_b)
+        return merged
+
+
+def _align_gap(a, b, a_base, b_base, k, min_k, pad, max_cells, opcodes):
+    """对齐 a、b 两段（下标加上 a_base / b_base 写入 opcodes）"""
+    ops = banded_diff(a, b, pad, max_cells)
+    if ops is not None:
+        opcodes.extend((t, i1 + a_base, i2 + a_base, j1 + b_base, j2 + b_base) for t, i1, i2, j1, j2 in ops)
+        return
+
+    # 空隙太大：用更短的唯一片段再切分
+    while k >= min_k:
+        a_pos, b_pos = anchors(a, b, k)
+        if len(a_pos):
+            _align_runs(a, b, a_base, b_base, anchor_runs(a_pos, b_pos, k), k // 2,
+                        min_k, pad, max_cells, opcodes)
+            return
+        k //= 2
+
+    opcodes.append((REPLACE, a_base, a_base + len(a), b_base, b_base + len(b)))
+
+
+def _align_runs(a, b, a_base, b_base, runs, k, min_k, pad, max_cells, opcodes):
+    """相同段之间的空隙逐个对齐"""
+    i = j = 0
+    for a0, a1, b0, b1 in runs:
+        if a0 > i or b0 > j:
+            _align_gap(a[i:a0], b[j:b0], a_base + i, b_base + j, k, min_k, pad, max_cells, opcodes)
+        opcodes.append((EQUAL, a_base + a0, a_base + a1, b_base + b0, b_base + b1))
+        i, j = a1, b1
+    if i < len(a) or j < len(b):
+        _align_gap(a[i:], b[j:], a_base + i, b_base + j, k, min_k, pad, max_cells, opcodes)
+
+
+def _merge_equal(opcodes):
+    """合并相邻的 equal 片段"""
+    merged = []
+    for op in opcodes:
+        if merged and op[0] == EQUAL and merged[-1][0] == EQUAL and merged[-1][2] == op[1] and merged[-1][4] == op[3]:
+            merged[-1] = (EQUAL, merged[-1][1], op[2], merged[-1][3], op[4])
+        else:
+            merged.append(op)
+    return merged
+
+
+def align(a_text, b_text, a_volume_starts=None, a_volume_labels=None, k=12, min_k=3,
+          pad=32, max_cells=1 << 22, clip=True):
+    """
+    逐字对齐两份文本（只比较汉字）
+
+    参数:
+        k: 全局锚点长度（两侧各自唯一的 k 字片段）
+        min_k: 大空隙内递归找锚点时的最短长度
+        pad: 带状编辑距离在长度差之外的带宽
+        max_cells: 单个空隙带状计算的格子上限，超过时递归切分
+        clip: B 比 A 长得多时（如 PDF 含前言、目录），只对齐第一个到最后一个锚点之间的 B 段，
+              两端多出的 B 文字不计入差异
+
+    返回:
+        Alignment
+    """
+    a, _ = normalize(a_text)
+    b, _ = normalize(b_text)
+    a_pos, b_pos = anchors(a, b, k)
+    runs = anchor_runs(a_pos, b_pos, k)
+
+    opcodes = []
+    if clip and runs:
+        # A 开头在第一个锚点之前的部分，对应 B 中同样长度（加带宽）的一段
+        b_lo = max(0, runs[0][2] - runs[0][0] - pad)
+        last = runs[-1]
+        b_hi = min(len(b), last[3] + (len(a) - last[1]) + pad)
+    else:
+        b_lo, b_hi = 0, len(b)
+
+    shifted = [(a0, a1, b0 - b_lo, b1 - b_lo) for a0, a1, b0, b1 in runs]
+    _align_runs(a, b[b_lo:b_hi], 0, b_lo, shifted, k // 2, min_k, pad, max_cells, opcodes)
+    return Alignment(a_text, b_text, _merge_equal(opcodes), a_volume_starts, a_volume_labels)
+
+
+def main():
+    """维基文库卷1-45 与 PDF 提取本对齐，输出一致率报告、差异片段与合并文本"""
+    print("="*60)
+    print("双源对齐：维基文库 × PDF 提取本")
+    print("="*60)
+
+    wiki_dir = Path(sys.argv[1] if len(sys.argv) > 1 else "jiajing_data")
+    pdf_file = Path(sys.argv[2] if len(sys.argv) > 2 else "jiajing_data_from_pdf/complete_vol1-45.txt")
+    output_dir = Path("analysis_results") / "source_alignment"
+
+    volumes = corpus_manager(wiki_dir).items()
+    if not volumes or not pdf_file.exists():
+        print("❌ 找不到维基文库分卷或 PDF 提取本")
+        return
+    wiki_text, starts, labels = pack_volumes(volumes)
+    with open(pdf_file, 'r', encoding='utf-8') as f:
+        pdf_text = f.read()
+    print(f"✓ 维基文库: {len(volumes)}卷 {len(wiki_text):,}字")
+    print(f"✓ PDF提取本: {len(pdf_text):,}字")
+
+    alignment = align(wiki_text, pdf_text, starts, labels)
+    print(f"\n整体: 相同 {alignment.matches:,} 字  一致率 {alignment.ratio():.2%}")
+
+    report = alignment.volume_report()
+    print(f"\n{'卷':>4}{'维基字数':>10}{'PDF字数':>10}{'一致率':>10}{'异文':>6}{'维基独有':>8}{'PDF独有':>8}")
+    for row in report:
+        print(f"{row['volume']:>4}{row['a_chars']:>10,}{row['b_chars']:>10,}{row['agreement']:>10.2%}"
+              f"{row['replace']:>6}{row['delete']:>8}{row['insert']:>8}")
+
+    spans = alignment.error_spans()
+    kinds = Counter(span['kind'] for span in spans)
+    print(f"\n差异片段: {len(spans):,} 个 " + '  '.join(f"{k}={v}" for k, v in kinds.most_common()))
+    print("\n高频异文对 (维基 → PDF):")
+    for (x, y), count in alignment.variant_pairs(20):
+        print(f"  {x} → {y}: {count}")
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with open(output_dir / "alignment_report.json", 'w', encoding='utf-8') as f:
+        json.dump({
+            'sources': {'a': str(wiki_dir), 'b': str(pdf_file)},
+            'matched': alignment.matches,
+            'ratio': round(alignment.ratio(), 4),
+            'volumes': report,
+            'variant_pairs': [[x, y, n] for (x, y), n in alignment.variant_pairs(200)],
+            'spans': spans
+        }, f, ensure_ascii=False, indent=2)
+
+    print(f"\n✓ 报告: {output_dir / 'alignment_report.json'}")
+
+    merged = alignment.merged_volumes()
+    for label, text in merged.items():
+        merged_file = output_dir / f"merged_vol{label}.txt"
+        with open(merged_file, 'w', encoding='utf-8') as f:
+            f.write(text)
+        print(f"✓ 合并文本: {merged_file} ({len(text):,}字)")
+    skipped = [str(row['volume']) for row in report if row['volume'] not in merged]
+    if skipped:
+        print(f"⚠️ 一致率低于 {MIN_MERGE_AGREEMENT:.0%}，未合并: 卷{', '.join(skipped)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""
+后缀数组检索 - 任意子串的毫秒级计数与定位
+
+解决问题：
+search_keyword 每次查询都重新读入全部卷并逐卷扫描，
+find_event_contexts 对每个词做一遍线性 find；词表以外的临时检索没有任何索引
+
+方法：
+1. 各卷拼接为一份语料（卷间以换行分隔），对全文构建后缀数组（NumPy 倍增排序）
+2. 后缀数组按语料内容哈希保存为 .cache/suffix/<哈希>.npy，再次打开时内存映射
+3. 查询 = 在后缀数组上两次二分查找，得到所有以该子串开头的后缀区间 [lo, hi)：
+   计数 O(m·log n)，定位再加 O(k) 读取
+4. 命中位置可按卷、按日期分组（DateIndex）
+5. 逆序文本后缀数组的逆数组（左侧上下文名次）按需构建并同样落盘，供索引行按左侧排序
+"""
+from pathlib import Path
+
+import numpy as np
+
+from date_index import UNKNOWN_ORDINAL, DateIndex
+from hit_table import bucket_label
+from positional_index import text_hash
+
+
+DEFAULT_CACHE_DIR = Path(__file__).with_name('.cache') / 'suffix'
+
+# 拼接各卷时使用的分隔符（不会出现在检索词中）
+VOLUME_SEPARATOR = '\n'
+
+
+def build_suffix_array(text):
+    """
+    构建后缀数组（前缀倍增：每轮按 (rank[i], rank[i+k]) 排序，k 每轮翻倍）
+
+    返回:
+        np.int32 数组，sa[j] 为字典序第 j 小的后缀的起始位置（按码位比较，与 str 比较一致）
+    """
+    n = len(text)
+    if n == 0:
+        return np.zeros(0, dtype=np.int32)
+
+    codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+    rank = np.unique(codes, return_inverse=True)[1].astype(np.int64).reshape(-1)
+
+    k = 1
+    while True:
+        # 后半段越界记 0，排在任何字符之前（较短的后缀更小）
+        following = np.zeros(n, dtype=np.int64)
+        if k < n:
+            following[:n - k] = rank[k:] + 1
+        key = rank * (n + 1) + following
+
+        sa = np.argsort(key, kind='stable')
+        sorted_key = key[sa]
+        rank = np.empty(n, dtype=np.int64)
+        rank[sa] = np.concatenate([[0], np.cumsum(sorted_key[1:] != sorted_key[:-1])])
+
+        if rank[sa[-1]] == n - 1 or k >= n:
+            break
+        k *= 2
+
+    return sa.astype(np.int32)
+
+
+def pack_volumes(volumes):
+    """
+    把 [(卷标, 文本), ...] 拼接为一份语料
+
+    返回:
+        (语料全文, 各卷起始偏移数组, 卷标列表)
+    """
+    starts, labels, parts = [], [], []
+    offset = 0
+    for label, text in volumes:
+        starts.append(offset)
+        labels.append(label)
+        parts.append(text)
+        offset += len(text) + len(VOLUME_SEPARATOR)
+    return VOLUME_SEPARATOR.join(parts), np.array(starts, dtype=np.int64), labels
+
+
+class SuffixArrayIndex:
+    """语料后缀数组检索"""
+
+    def __init__(self, text, suffix_array, volume_starts=None, volume_labels=None):
+        """
+        参数:
+            text: 语料全文
+            suffix_array: build_suffix_array(text) 的结果（可为内存映射数组）
+            volume_starts / volume_labels: 各卷起始偏移与卷标（见 pack_volumes），缺省时视为一卷
+        """
+        self.text = text
+        self.sa = suffix_array
+        self.volume_starts = (np.asarray(volume_starts, dtype=np.int64)
+                              if volume_starts is not None else np.zeros(1, dtype=np.int64))
+        self.volume_labels = list(volume_labels) if volume_labels is not None else [None]
+        self._date_index = None
+        self._left_ranks = None
+        self._cache_dir = None
+
+    @classmethod
+    def for_text(cls, text, volume_starts=None, volume_labels=None, cache_dir=DEFAULT_CACHE_DIR):
+        """读取已保存的后缀数组（内存映射），不存在时构建并保存"""
+        path = Path(cache_dir) / f"{text_hash(text)[:32]}.npy"
+        suffix_array = None
+        if path.exists():
+            try:
+                suffix_array = np.load(path, mmap_mode='r')
+                if len(suffix_array) != len(text):
+                    suffix_array = None
+            except (OSError, ValueError):
+                suffix_array = None
+
+        if suffix_array is None:
+            suffix_array = build_suffix_array(text)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix('.tmp.npy')
+            np.save(tmp_path, suffix_array)
+            tmp_path.replace(path)
+
+        index = cls(text, suffix_array, volume_starts, volume_labels)
+        index._cache_dir = Path(cache_dir)
+        return index
+
+    @classmethod
+    def for_volumes(cls, volumes, cache_dir=DEFAULT_CACHE_DIR):
+        """由 [(卷标, 文本), ...] 拼接语料并取得其后缀数组检索"""
+        text, starts, labels = pack_volumes(volumes)
+        return cls.for_text(text, starts, labels, cache_dir)
+
+    def range(self, pattern):
+        """以 pattern 开头的后缀在后缀数组中的区间 [lo, hi)"""
+        text, sa, m = self.text, self.sa, len(pattern)
+        if m == 0:
+            return 0, 0
+
+        lo, hi = 0, len(sa)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            pos = int(sa[mid])
+            if text[pos:pos + m] < pattern:
+                lo = mid + 1
+            else:
+                hi = mid
+        start = lo
+
+        hi = len(sa)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            pos = int(sa[mid])
+            if text[pos:pos + m] <= pattern:
+                lo = mid + 1
+            else:
+                hi = mid
+        return start, lo
+
+    def count(self, pattern, overlapping=True):
+        """子串出现次数；overlapping=False 时与 str.count 一致（不重叠计数）"""
+        if overlapping:
+            lo, hi = self.range(pattern)
+            return hi - lo
+        return len(self.locate(pattern, overlapping=False))
+
+    def locate(self, pattern, overlapping=False):
+        """
+        子串的全部出现位置（升序）
+
+        参数:
+            overlapping: False 时与 str.find 循环一致，跳过与前一次命中重叠的位置
+        """
+        lo, hi = self.range(pattern)
+        positions = np.sort(np.asarray(self.sa[lo:hi], dtype=np.int64))
+        if overlapping or len(positions) < 2 or len(pattern) < 2:
+            return positions
+
+        keep = []
+        next_allowed = -1
+        for pos in positions.tolist():
+            if pos >= next_allowed:
+                keep.append(pos)
+                next_allowed = pos + len(pattern)
+        return np.array(keep, dtype=np.int64)
+
+    def left_ranks(self):
+        """
+        左侧上下文的排序名次：left_ranks[p] 为 text[:p] 倒读后在全部倒读前缀中的字典序名次
+        （即逆序文本后缀数组的逆数组），p=0 时为 -1
+
+        首次调用时由逆序文本构建，随后缀数组一起保存为 <哈希>.left.npy 并内存映射
+        """
+        if self._left_ranks is not None:
+            return self._left_ranks
+
+        n = len(self.text)
+        path = None
+        if self._cache_dir is not None:
+            path = self._cache_dir / f"{text_hash(self.text)[:32]}.left.npy"
+            if path.exists():
+                try:
+                    ranks = np.load(path, mmap_mode='r')
+                    if len(ranks) == n + 1:
+                        self._left_ranks = ranks
+                        return ranks
+                except (OSError, ValueError):
+                    pass
+
+        reverse_sa = build_suffix_array(self.text[::-1])
+        inverse = np.empty(n, dtype=np.int32)
+        inverse[reverse_sa] = np.arange(n, dtype=np.int32)
+        ranks = np.empty(n + 1, dtype=np.int32)
+        ranks[0] = -1
+        # text[:p] 倒读 = 逆序文本从 n-p 开始的后缀
+        ranks[1:] = inverse[::-1]
+
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix('.tmp.npy')
+            np.save(tmp_path, ranks)
+            tmp_path.replace(path)
+        self._left_ranks = ranks
+        return ranks
+
+    def date_index(self):
+        """语料的日期索引（首次按日期分组时构建）"""
+        if self._date_index is None:
+            self._date_index = DateIndex.build(self.text)
+        return self._date_index
+
+    def volume_of(self, positions):
+        """位置 → 所在卷的下标"""
+        return np.searchsorted(self.volume_starts, positions, side='right') - 1
+
+    def date_labels(self, positions):
+        """位置 → 日期标签：优先精确到日，否则到月，未知时为 未知日期"""
+        months, ordinals, _ = self.date_index().lookup(positions)
+        labels = []
+        for month, ordinal in zip(months.tolist(), ordinals.tolist()):
+            if ordinal != UNKNOWN_ORDINAL:
+                labels.append(f"{bucket_label('month', month)} ({bucket_label('day', ordinal)})")
+            elif month >= 0:
+                labels.append(bucket_label('month', month))
+            else:
+                labels.append("未知日期")
+        return labels
+
+    def group(self, positions):
+        """
+        把命中位置按卷、按日期分组
+
+        返回:
+            [{"volume_index": 卷下标, "volume": 卷标, "volume_start": 卷起始偏移,
+              "date": 日期标签, "positions": [...]}, ...]
+            按位置先后排列；日期标签优先精确到日，否则到月，未知为"未知日期"
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        if len(positions) == 0:
+            return []
+
+        volumes = self.volume_of(positions)
+
+        groups = []
+        for pos, vol, date in zip(positions.tolist(), volumes.tolist(), self.date_labels(positions)):
+            if groups and groups[-1]['volume_index'] == vol and groups[-1]['date'] == date:
+                groups[-1]['positions'].append(pos)
+            else:
+                groups.append({
+                    'volume_index': vol,
+                    'volume': self.volume_labels[vol],
+                    'volume_start': int(self.volume_starts[vol]),
+                    'date': date,
+                    'positions': [pos]
+                })
+        return groups
+
+    def search(self, pattern, overlapping=False):
+        """定位并按卷、日期分组（见 group）"""
+        return self.group(self.locate(pattern, overlapping))
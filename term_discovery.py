@@ -0,0 +1,353 @@
+# -*- coding: utf-8 -*-
+"""
+新词发现 - 基于频次、互信息与左右邻接熵的无监督候选词挖掘
+
+解决问题：
+keyword_frequency 只是 2-4 字 n-gram 计数（注释里也说真实应用应使用分词工具），
+毒性/暴虐词表全靠手工整理，语料里反复出现的固定说法（药名、刑名、官署）没有系统地被发现
+
+方法：
+1. 语料按换行切成若干段（每段不超过 chunk_size 字），逐段交给 NGramCounter 统计
+   1..max_len 字 n-gram（非汉字视为边界），汇总表容量固定，内存不随语料长度增长
+2. 凝固度：n-gram 的最小切分互信息 PMI = min log2( c(w)·N / (c(a)·c(b)) )
+3. 自由度：对频次达标的候选再过一遍语料，统计左右邻字分布，求左右邻接熵；
+   边界（标点、换行、文首文尾）每次出现都视为不同的邻字
+4. 得分 = PMI + min(左熵, 右熵)（均以比特计），按得分排序给出候选词
+5. 词表建议：候选词出现位置落在某类已有关键词 ±window 字内的比例，
+   相对全文被覆盖比例的提升（lift）越高，越可能是该类的同义说法
+"""
+import sys
+import json
+from pathlib import Path
+
+import numpy as np
+
+from lexicon import DEFAULT_CONFIG_FILE, load_lexicon
+from ngram_counter import NGramCounter
+from positional_index import corpus_index
+
+if hasattr(sys.stdout, 'reconfigure'):
+    sys.stdout.reconfigure(encoding='utf-8')
+if hasattr(sys.stderr, 'reconfigure'):
+    sys.stderr.reconfigure(encoding='utf-8')
+
+
+def is_hanzi(codes):
+    """Unicode 码数组 → 是否为汉字（含扩展区、〇）"""
+    return (((codes >= 0x3400) & (codes <= 0x9FFF)) |
+            ((codes >= 0xF900) & (codes <= 0xFAFF)) |
+            ((codes >= 0x20000) & (codes <= 0x2FA1F)) |
+            (codes == 0x3007))
+
+
+def segments(text, size):
+    """
+    把文本切成不超过 size 字的段，尽量在换行后切开（段间不会有跨段的候选词）
+
+    产出:
+        (段起始偏移, 段文本)
+    """
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            cut = text.rfind('\n', start, end)
+            if cut > start:
+                end = cut + 1
+        yield start, text[start:end]
+        start = end
+
+
+def _merge_counts(keys_a, counts_a, keys_b, counts_b):
+    """两张 (键升序, 计数) 表相加"""
+    keys = np.concatenate([keys_a, keys_b])
+    if len(keys) == 0:
+        return keys, np.concatenate([counts_a, counts_b])
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    boundary = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+    counts = np.add.reduceat(np.concatenate([counts_a, counts_b])[order], boundary)
+    return keys[boundary], counts
+
+
+def _count_table(keys):
+    """键数组 → (去重键升序, 计数)"""
+    keys = np.sort(keys)
+    if len(keys) == 0:
+        return keys, np.zeros(0, dtype=np.int64)
+    boundary = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+    return keys[boundary], np.diff(np.append(boundary, len(keys)))
+
+
+def _entropy(pair_keys, pair_counts, boundary_counts, bits):
+    """
+    由 (候选ID << bits | 邻字ID) 的计数表与边界次数求每个候选的邻接熵（比特）
+    """
+    n = len(boundary_counts)
+    gids = (pair_keys >> np.uint64(bits)).astype(np.int64)
+    totals = np.bincount(gids, weights=pair_counts, minlength=n) + boundary_counts
+    safe_totals = np.maximum(totals, 1)
+
+    p = pair_counts / safe_totals[gids]
+    entropy = np.bincount(gids, weights=-p * np.log2(p), minlength=n)
+    # 每个边界出现都视为不同的邻字：贡献 b/T · log2(T)
+    entropy += boundary_counts / safe_totals * np.log2(safe_totals)
+    return entropy
+
+
+class TermDiscovery:
+    """候选词发现"""
+
+    def __init__(self, max_len=4, min_freq=5, min_pmi=1.0, min_entropy=1.0,
+                 capacity=1 << 21, chunk_size=1 << 20):
+        """
+        参数:
+            max_len: 候选词最大长度（2..max_len 字，不超过 NGramCounter 的上限 4）
+            min_freq: 候选词最低频次
+            min_pmi / min_entropy: 凝固度（PMI）与自由度（左右熵较小者）的下限
+            capacity: 每种长度 n-gram 汇总表的容量（超出时按频次裁剪，见 NGramCounter）
+            chunk_size: 每段最多字数
+        """
+        self.max_len = max_len
+        self.min_freq = min_freq
+        self.min_pmi = min_pmi
+        self.min_entropy = min_entropy
+        self.capacity = capacity
+        self.chunk_size = chunk_size
+        self.counter = None
+        self.text = None
+
+    def count(self, text):
+        """第一遍：逐段统计 1..max_len 字 n-gram（非汉字为边界）"""
+        codes = np.unique(np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32))
+        stop_chars = ''.join(chr(c) for c in codes[~is_hanzi(codes)].tolist())
+
+        self.counter = NGramCounter(lengths=range(1, self.max_len + 1), stop_chars=stop_chars,
+                                    capacity=self.capacity, chunk_size=self.chunk_size)
+        for _, segment in segments(text, self.chunk_size):
+            self.counter.update(segment)
+        self.text = text
+        return self.counter
+
+    def _lookup(self, n, keys):
+        """在 n 字汇总表中查计数；已被裁剪的键返回 0"""
+        table_keys, table_counts = self.counter.table(n)
+        if len(table_keys) == 0:
+            return np.zeros(len(keys), dtype=np.int64)
+        idx = np.minimum(np.searchsorted(table_keys, keys), len(table_keys) - 1)
+        return np.where(table_keys[idx] == keys, table_counts[idx], 0)
+
+    def _pmi(self, n, keys, counts):
+        """最小切分互信息"""
+        bits = self.counter.BITS
+        total = max(self.counter.total_chars, 1)
+        pmi = np.full(len(keys), np.inf)
+        for k in range(1, n):
+            tail_bits = np.uint64(bits * (n - k))
+            left = self._lookup(k, keys >> tail_bits)
+            right = self._lookup(n - k, keys & ((np.uint64(1) << tail_bits) - np.uint64(1)))
+            # 子串被裁剪时以本词频次代替（子串频次不低于本词）
+            left = np.where(left > 0, left, counts)
+            right = np.where(right > 0, right, counts)
+            pmi = np.minimum(pmi, np.log2(counts * total / (left.astype(np.float64) * right)))
+        return pmi
+
+    def _neighbors(self, candidates):
+        """
+        第二遍：统计候选词的左右邻字
+
+        参数:
+            candidates: {n: 候选键数组（升序）}
+
+        返回:
+            (左熵数组, 右熵数组)，按 n 升序、键升序拼接
+        """
+        bits = self.counter.BITS
+        shift = np.uint64(bits)
+        lengths = sorted(candidates)
+        bases = np.cumsum([0] + [len(candidates[n]) for n in lengths])
+        n_total = int(bases[-1])
+
+        tables = {side: (np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int64))
+                  for side in ('left', 'right')}
+        boundary_counts = {side: np.zeros(n_total, dtype=np.int64) for side in ('left', 'right')}
+
+        for _, segment in segments(self.text, self.chunk_size):
+            codes = np.frombuffer(segment.encode('utf-32-le'), dtype=np.uint32)
+            ids = self.counter.encode(segment)
+            edge = ~is_hanzi(codes)
+            edge_csum = np.concatenate([[0], np.cumsum(edge, dtype=np.int64)])
+            length = len(segment)
+
+            for n, base in zip(lengths, bases[:-1].tolist()):
+                cand_keys = candidates[n]
+                if len(cand_keys) == 0 or length < n:
+                    continue
+                starts = np.arange(length - n + 1)
+                starts = starts[edge_csum[starts + n] == edge_csum[starts]]
+                keys = np.zeros(len(starts), dtype=np.uint64)
+                for k in range(n):
+                    keys = (keys << shift) | ids[starts + k]
+
+                idx = np.minimum(np.searchsorted(cand_keys, keys), len(cand_keys) - 1)
+                member = cand_keys[idx] == keys
+                starts = starts[member]
+                gids = (idx[member] + base).astype(np.uint64)
+
+                for side, neighbor in (('left', starts - 1), ('right', starts + n)):
+                    at_edge = (neighbor < 0) | (neighbor >= length)
+                    at_edge[~at_edge] = edge[neighbor[~at_edge]]
+                    boundary_counts[side] += np.bincount(gids[at_edge].astype(np.int64),
+                                                         minlength=n_total)
+                    inner = ~at_edge
+                    pair_keys, pair_counts = _count_table((gids[inner] << shift) | ids[neighbor[inner]])
+                    tables[side] = _merge_counts(*tables[side], pair_keys, pair_counts)
+
+        return tuple(_entropy(*tables[side], boundary_counts[side], bits)
+                     for side in ('left', 'right'))
+
+    def discover(self, text=None, top=200):
+        """
+        发现候选词
+
+        返回:
+            [{"term", "freq", "pmi", "left_entropy", "right_entropy", "score"}, ...]，按得分降序
+        """
+        if text is not None or self.counter is None:
+            self.count(text if text is not None else self.text)
+
+        candidates, freqs, pmis = {}, [], []
+        for n in range(2, self.max_len + 1):
+            keys, counts = self.counter.table(n)
+            keep = counts >= self.min_freq
+            keys, counts = keys[keep], counts[keep]
+            pmi = self._pmi(n, keys, counts)
+            keep = pmi >= self.min_pmi
+            candidates[n] = keys[keep]
+            freqs.append(counts[keep])
+            pmis.append(pmi[keep])
+
+        left, right = self._neighbors(candidates)
+        freqs = np.concatenate(freqs)
+        pmis = np.concatenate(pmis)
+        free = np.minimum(left, right)
+        score = pmis + free
+
+        order = np.argsort(-score, kind='stable')
+        order = order[free[order] >= self.min_entropy][:top]
+
+        keys = [(n, key) for n in sorted(candidates) for key in candidates[n].tolist()]
+        return [{
+            'term': self.counter.decode(keys[i][1], keys[i][0]),
+            'freq': int(freqs[i]),
+            'pmi': round(float(pmis[i]), 3),
+            'left_entropy': round(float(left[i]), 3),
+            'right_entropy': round(float(right[i]), 3),
+            'score': round(float(score[i]), 3)
+        } for i in order.tolist()]
+
+
+def _coverage(hits, lengths, window, text_length):
+    """
+    关键词命中 ±window 的覆盖区间（并集）
+
+    返回:
+        (区间起点升序数组, 截至各区间的最大终点数组, 覆盖比例)
+    """
+    starts = np.maximum(hits - window, 0)
+    ends = np.minimum(hits + lengths + window, text_length)
+    order = np.argsort(starts, kind='stable')
+    starts, ends = starts[order], ends[order]
+    max_ends = np.maximum.accumulate(ends)
+    prev = np.concatenate([[0], max_ends[:-1]])
+    covered = np.maximum(ends - np.maximum(starts, prev), 0).sum()
+    return starts, max_ends, covered / max(text_length, 1)
+
+
+def suggest_lexicon_terms(text, terms, config_file=DEFAULT_CONFIG_FILE, categories=('toxicity', 'tyranny'),
+                          window=50, min_lift=2.0, min_near=3, top=20):
+    """
+    为词表各类别推荐候选词
+
+    参数:
+        terms: discover() 的结果或词列表
+        window: 与已有关键词的距离（字）
+        min_lift: 候选词出现在关键词附近的比例 / 全文被覆盖比例 的下限
+        min_near: 至少有几次出现在关键词附近
+
+    返回:
+        {类别: [{"term", "freq", "near", "share", "lift"}, ...]}，按 lift 降序；
+        与已有关键词互为子串的候选（已被词表覆盖）不推荐
+    """
+    terms = [t['term'] if isinstance(t, dict) else t for t in terms]
+    lexicon = load_lexicon(config_file)
+    index = corpus_index(text, terms)
+
+    suggestions = {}
+    for category in categories:
+        seeds = list(lexicon.weights(category))
+        hits = index.hits(seeds) if seeds else []
+        if not hits:
+            suggestions[category] = []
+            continue
+        positions = np.array([pos for pos, _ in hits], dtype=np.int64)
+        lengths = np.array([len(seeds[kid]) for _, kid in hits], dtype=np.int64)
+        starts, max_ends, baseline = _coverage(positions, lengths, window, len(text))
+
+        rows = []
+        for term in terms:
+            if any(term in seed or seed in term for seed in seeds):
+                continue
+            occurrences = index.array(term).astype(np.int64)
+            if len(occurrences) == 0:
+                continue
+            j = np.searchsorted(starts, occurrences, side='right') - 1
+            near = int(((j >= 0) & (max_ends[np.maximum(j, 0)] > occurrences)).sum())
+            share = near / len(occurrences)
+            lift = share / baseline if baseline > 0 else 0.0
+            if near >= min_near and lift >= min_lift:
+                rows.append({'term': term, 'freq': len(occurrences), 'near': near,
+                             'share': round(share, 3), 'lift': round(lift, 2)})
+
+        rows.sort(key=lambda r: (-r['lift'], -r['near']))
+        suggestions[category] = rows[:top]
+    return suggestions
+
+
+def main():
+    """主程序"""
+    print("="*60)
+    print("新词发现（互信息 + 左右邻接熵）")
+    print("="*60)
+
+    data_file = Path(sys.argv[1] if len(sys.argv) > 1 else "jiajing_data_from_pdf/complete_vol1-45.txt")
+    with open(data_file, 'r', encoding='utf-8') as f:
+        text = f.read()
+    print(f"✓ 已加载数据: {len(text):,}字")
+
+    discovery = TermDiscovery()
+    terms = discovery.discover(text, top=500)
+
+    print(f"\n🔍 候选词 (Top 30 / 共{len(terms)}):")
+    for t in terms[:30]:
+        print(f"  {t['term']:<6} 频次{t['freq']:>5}  PMI {t['pmi']:5.2f}  "
+              f"左熵 {t['left_entropy']:4.2f}  右熵 {t['right_entropy']:4.2f}")
+
+    suggestions = suggest_lexicon_terms(text, terms)
+    for category, rows in suggestions.items():
+        print(f"\n💡 建议加入 {category} 词表:")
+        if not rows:
+            print("  （无）")
+        for row in rows:
+            print(f"  {row['term']:<6} 频次{row['freq']:>4}  邻近{row['near']:>4}  lift {row['lift']:.1f}")
+
+    output_file = Path("analysis_results") / "term_candidates.json"
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump({'source': str(data_file), 'terms': terms, 'suggestions': suggestions},
+                  f, ensure_ascii=False, indent=2)
+    print(f"\n✓ 结果已保存: {output_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+KeywordMatcher 行为测试 - 两种匹配语义与 str.count / 朴素扫描逐一对照
+
+运行: python -m pytest -q test_keyword_matcher.py  或  python test_keyword_matcher.py
+"""
+import random
+
+from keyword_matcher import KeywordMatcher
+
+
+# 含前缀对（震/震怒、杖/廷杖/廷杖之）、首尾可重叠的词（哈哈、哈哈哈、怒怒）
+KEYWORDS = ['震', '震怒', '怒', '怒怒', '杖', '廷杖', '廷杖之', '哈哈', '哈哈哈', '之']
+ALPHABET = '震怒杖廷之哈上曰。'
+
+
+def random_texts(count=200, seed=0):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 60)))
+
+
+def find_positions(text, keyword, start=0, end=None):
+    """str.find 循环：互不重叠的全部出现位置"""
+    end = len(text) if end is None else end
+    positions = []
+    pos = text.find(keyword, start, end)
+    while pos != -1:
+        positions.append(pos)
+        pos = text.find(keyword, pos + len(keyword), end)
+    return positions
+
+
+def longest_hits(text, keywords):
+    """朴素的最左最长、互不重叠扫描"""
+    hits = []
+    pos = 0
+    while pos < len(text):
+        best = max((k for k in keywords if text.startswith(k, pos)), key=len, default=None)
+        if best is None:
+            pos += 1
+        else:
+            hits.append((pos, best))
+            pos += len(best)
+    return hits
+
+
+def test_default_count_matches_str_count():
+    matcher = KeywordMatcher(KEYWORDS)
+    for text in random_texts():
+        assert matcher.count(text) == [text.count(k) for k in matcher.keywords], text
+
+
+def test_default_count_without_self_overlap_matches_str_count():
+    # 无首尾重叠词时走 Counter(findall) 快速路径
+    matcher = KeywordMatcher(['震', '震怒', '杖', '廷杖', '之'])
+    assert not matcher._self_overlapping
+    for text in random_texts(seed=1):
+        assert matcher.count(text) == [text.count(k) for k in matcher.keywords], text
+
+
+def test_default_finditer_matches_find_loop():
+    matcher = KeywordMatcher(KEYWORDS)
+    for text in random_texts(seed=2):
+        hits = list(matcher.finditer(text))
+        assert hits == sorted(hits)
+        for kid, keyword in enumerate(matcher.keywords):
+            assert [pos for pos, k in hits if k == kid] == find_positions(text, keyword), (text, keyword)
+
+
+def test_self_overlapping_keyword():
+    matcher = KeywordMatcher(['哈哈', '哈'])
+    text = '哈哈哈哈哈'
+    assert matcher.count(text) == [text.count('哈哈'), text.count('哈')] == [2, 5]
+    assert [pos for pos, kid in matcher.finditer(text) if kid == 0] == [0, 2]
+
+
+def test_count_range_and_spans():
+    matcher = KeywordMatcher(KEYWORDS)
+    for text in random_texts(seed=3):
+        start, end = len(text) // 4, len(text) * 3 // 4
+        assert matcher.count(text, start, end) == [text.count(k, start, end) for k in matcher.keywords]
+
+        spans = [(0, start), (start, end), (end, len(text))]
+        expected = [sum(text[s:e].count(k) for s, e in spans) for k in matcher.keywords]
+        assert matcher.count_spans(text, spans) == expected
+
+
+def test_longest_match_matches_naive_scan():
+    matcher = KeywordMatcher(KEYWORDS, longest_match=True)
+    for text in random_texts(seed=4):
+        hits = [(pos, matcher.keywords[kid]) for pos, kid in matcher.finditer(text)]
+        assert hits == longest_hits(text, matcher.keywords), text
+
+        counts = [0] * len(matcher.keywords)
+        for _, keyword in hits:
+            counts[matcher.index[keyword]] += 1
+        assert matcher.count(text) == counts
+
+
+def test_longest_match_does_not_double_count_prefixes():
+    matcher = KeywordMatcher(['怒', '震怒', '杖', '廷杖'], longest_match=True)
+    assert matcher.count_dict('上震怒，命廷杖之，怒未解') == {'震怒': 1, '廷杖': 1, '怒': 1}
+
+    default = KeywordMatcher(['怒', '震怒', '杖', '廷杖'])
+    assert default.count_dict('上震怒，命廷杖之，怒未解') == {'震怒': 1, '廷杖': 1, '怒': 2, '杖': 1}
+
+
+def test_duplicate_and_empty_keywords():
+    matcher = KeywordMatcher(['怒', '', '怒', '震怒'])
+    assert matcher.keywords == ['怒', '震怒']
+    assert matcher.count('震怒') == [1, 1]
+
+    empty = KeywordMatcher([])
+    assert empty.count('震怒') == []
+    assert list(empty.finditer('震怒')) == []
+
+
+def test_category_scores():
+    matcher = KeywordMatcher.from_categories({'toxicity': {'进丹': 10, '醮': 5}, 'tyranny': {'廷杖': 9}})
+    counts = matcher.count('进丹，设醮，又醮，廷杖')
+    assert matcher.category_counts(counts) == {'toxicity': 3, 'tyranny': 1}
+    assert matcher.category_scores(counts) == {'toxicity': 20, 'tyranny': 9}
+
+
+def main():
+    print("=" * 60)
+    print("KeywordMatcher 行为测试")
+    print("=" * 60)
+
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✓ {name}")
+
+    print("\n✓ 全部通过")
+
+
+if __name__ == "__main__":
+    main()
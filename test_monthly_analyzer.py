@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+MonthlyAnalyzer 行为测试 - 多文件并行 map-reduce 与单文件整体扫描结果一致
+
+运行: python -m pytest -q test_monthly_analyzer.py  或  python test_monthly_analyzer.py
+"""
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from monthly_timeseries_analyzer import MonthlyAnalyzer, count_file_partial, merge_partials
+
+
+# 第二卷开头沿用第一卷结束时的年月，第三卷开头只换月份、年份沿用上一卷；
+# 第一卷开头尚无年月的行不计入
+VOLUMES = [
+    "卷一\n序言，进丹之说未起。\n嘉靖二十一年九月\n上设醮于西苑，陶仲文进丹。\n十月\n宫婢谋逆，上震怒，命廷杖。\n",
+    "廷杖诸臣，杖毙二人。又醮。\n嘉靖二十一年十一月\n服食金丹，又设斋醮。\n",
+    "十二月\n上怒，逮系诏狱，廷杖之。\n嘉靖二十二年正月\n祷于太庙，赐药。\n",
+]
+
+
+def write_volumes(directory):
+    files = []
+    for i, content in enumerate(VOLUMES, 1):
+        path = Path(directory) / f"vol{i:03d}.txt"
+        path.write_text(content, encoding='utf-8')
+        files.append(path)
+    combined = Path(directory) / "combined.txt"
+    combined.write_text('\n'.join(VOLUMES), encoding='utf-8')
+    return files, combined
+
+
+def load_matrix(matrix_file):
+    with np.load(matrix_file) as data:
+        return {key: data[key] for key in ('months', 'counts', 'char_counts', 'keywords')}
+
+
+def check_volumes_match_single_file(longest_match):
+    with tempfile.TemporaryDirectory() as tmp:
+        files, combined = write_volumes(tmp)
+        analyzer = MonthlyAnalyzer(longest_match=longest_match)
+
+        single = analyzer.analyze_file(combined, output_dir=Path(tmp) / "single", use_cache=False)
+        parallel = analyzer.analyze_volumes(files, output_dir=Path(tmp) / "parallel",
+                                            workers=2, use_cache=False)
+
+        assert single is not None
+        assert [(m['year'], m['month']) for m in single] == [(21, 9), (21, 10), (21, 11), (21, 12), (22, 1)]
+        assert parallel == single
+
+        single_matrix = load_matrix(Path(tmp) / "single" / "monthly_counts.npz")
+        parallel_matrix = load_matrix(Path(tmp) / "parallel" / "monthly_counts.npz")
+        for key in single_matrix:
+            assert np.array_equal(single_matrix[key], parallel_matrix[key]), key
+
+
+def test_analyze_volumes_matches_analyze_file():
+    check_volumes_match_single_file(longest_match=False)
+
+
+def test_analyze_volumes_matches_analyze_file_longest_match():
+    check_volumes_match_single_file(longest_match=True)
+
+
+def test_glob_pattern_sorted_like_file_list():
+    with tempfile.TemporaryDirectory() as tmp:
+        files, _ = write_volumes(tmp)
+        analyzer = MonthlyAnalyzer()
+        by_list = analyzer.analyze_volumes(files, output_dir=Path(tmp) / "a", workers=1, use_cache=False)
+        by_glob = analyzer.analyze_volumes(str(Path(tmp) / "vol*.txt"), output_dir=Path(tmp) / "b",
+                                           workers=1, use_cache=False)
+        assert by_glob == by_list
+
+
+def test_merge_partials_carries_state_across_files():
+    with tempfile.TemporaryDirectory() as tmp:
+        files, _ = write_volumes(tmp)
+        partials = [count_file_partial(str(f)) for f in files]
+
+        # 第二卷开头年月未定，第三卷开头年份未定
+        assert partials[1]['keys'][0] == (None, None)
+        assert partials[2]['keys'][0] == (None, 12)
+
+        matrix = merge_partials(partials)
+        october = matrix['months'].tolist().index([21, 10])
+        ting_zhang = matrix['keywords'].index('廷杖')
+        # 十月：第一卷的"命廷杖" + 第二卷开头的"廷杖诸臣"
+        assert matrix['counts'][october, ting_zhang] == 2
+
+
+def main():
+    print("=" * 60)
+    print("MonthlyAnalyzer 行为测试")
+    print("=" * 60)
+
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✓ {name}")
+
+    print("\n✓ 全部通过")
+
+
+if __name__ == "__main__":
+    main()
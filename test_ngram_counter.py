@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+NGramCounter 行为测试 - 与原先 Counter(words).most_common 的结果（含同频先后）一致
+
+运行: python -m pytest -q test_ngram_counter.py  或  python test_ngram_counter.py
+"""
+import random
+from collections import Counter
+
+from ngram_counter import NGramCounter
+
+
+STOP_CHARS = '之乎者也、。，'
+ALPHABET = '上曰朕怒震廷杖臣之。，也'
+
+
+def random_text(length, seed):
+    rng = random.Random(seed)
+    return ''.join(rng.choice(ALPHABET) for _ in range(length))
+
+
+def reference_words(text, lengths=(2, 3, 4), stop_chars=STOP_CHARS):
+    """原 keyword_frequency 的写法：逐长度生成全部不含停用字的子串"""
+    words = []
+    for length in lengths:
+        for i in range(len(text) - length + 1):
+            word = text[i:i + length]
+            if not any(c in stop_chars for c in word):
+                words.append(word)
+    return words
+
+
+def test_most_common_matches_counter():
+    for seed in range(20):
+        text = random_text(500, seed)
+        counter = NGramCounter(stop_chars=STOP_CHARS)
+        counter.update(text)
+        for top_n in (1, 10, 50, 10000):
+            assert counter.most_common(top_n) == Counter(reference_words(text)).most_common(top_n)
+        assert counter.error_bound == 0
+
+
+def test_small_chunks_match_counter():
+    text = random_text(2000, seed=100)
+    counter = NGramCounter(stop_chars=STOP_CHARS, chunk_size=7)
+    counter.update(text)
+    assert counter.most_common(10000) == Counter(reference_words(text)).most_common(10000)
+
+
+def test_updates_do_not_cross_boundary():
+    texts = [random_text(300, seed) for seed in (1, 2, 3)]
+    counter = NGramCounter(stop_chars=STOP_CHARS, chunk_size=50)
+    for text in texts:
+        counter.update(text)
+
+    expected = Counter()
+    for text in texts:
+        expected.update(reference_words(text))
+    assert dict(counter.most_common(10000)) == dict(expected)
+    assert counter.total_chars == sum(len(t) for t in texts)
+
+
+def test_short_and_empty_text():
+    counter = NGramCounter(stop_chars=STOP_CHARS)
+    counter.update('')
+    counter.update('朕')
+    assert counter.most_common() == []
+
+    counter.update('上曰')
+    assert counter.most_common() == [('上曰', 1)]
+
+
+def test_capacity_pruning_bounds_error():
+    # 同一 n-gram 可能在多个块的裁剪中反复被丢弃，少计的次数仍不超过 error_bound
+    for seed in range(5):
+        text = random_text(3000, seed)
+        expected = Counter(reference_words(text))
+        counter = NGramCounter(stop_chars=STOP_CHARS, capacity=20, chunk_size=200)
+        counter.update(text)
+
+        assert counter.error_bound > 0
+        for word, count in counter.most_common(20):
+            assert expected[word] - counter.error_bound <= count <= expected[word]
+
+
+def test_lengths_limit():
+    try:
+        NGramCounter(lengths=(2, 5))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("n-gram 长度超过 4 时应报错")
+
+
+def main():
+    print("=" * 60)
+    print("NGramCounter 行为测试")
+    print("=" * 60)
+
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✓ {name}")
+
+    print("\n✓ 全部通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+significance 行为测试 - 分块自助法的统计量、退化序列与可复现性
+
+运行: python -m pytest -q test_significance.py  或  python test_significance.py
+"""
+import numpy as np
+
+from significance import block_bootstrap_ci, permutation_test
+from timeseries_stats import cross_correlation
+
+
+def test_full_length_block_reproduces_cross_correlation():
+    # 块长等于序列长度时，每次重抽都是时间下标的一次循环平移，
+    # 全部 (x[t], y[t+lag]) 配对各出现一次，统计量应与 cross_correlation 完全相同
+    rng = np.random.default_rng(0)
+    x = rng.poisson(3, size=60).astype(float)
+    y = np.roll(x, 2) + rng.normal(0, 1, size=60)
+
+    _, expected = cross_correlation(x, y, 5)
+    result = block_bootstrap_ci(x, y, 5, n_boot=50, block_length=60, workers=1)
+    assert np.allclose(result['corr'], expected)
+    assert np.allclose(result['ci_low'], expected)
+    assert np.allclose(result['ci_high'], expected)
+
+
+def test_constant_series_gives_nan_interval():
+    x = np.full(40, 3.0)
+    y = np.arange(40, dtype=float)
+    result = block_bootstrap_ci(x, y, 3, n_boot=100, workers=1)
+    assert np.all(result['corr'] == 0)
+    assert np.all(np.isnan(result['ci_low']))
+    assert np.all(np.isnan(result['ci_high']))
+
+
+def test_sparse_series_does_not_collapse_to_zero():
+    # 绝大多数重抽不含任何非零点（方差为0）：这些重抽不计入，而不是按相关为0计入
+    x = np.zeros(200)
+    x[[17, 120]] = 5.0
+    result = block_bootstrap_ci(x, x.copy(), 2, n_boot=400, block_length=5, workers=1)
+    lag0 = list(result['lags']).index(0)
+    assert np.isclose(result['ci_low'][lag0], 1.0)
+    assert np.isclose(result['ci_high'][lag0], 1.0)
+
+
+def test_bootstrap_is_reproducible_across_workers():
+    rng = np.random.default_rng(1)
+    x = rng.poisson(2, size=80).astype(float)
+    y = rng.poisson(2, size=80).astype(float)
+    single = block_bootstrap_ci(x, y, 4, n_boot=300, batch_size=100, seed=7, workers=1)
+    pooled = block_bootstrap_ci(x, y, 4, n_boot=300, batch_size=100, seed=7, workers=2)
+    for key in ('ci_low', 'ci_high'):
+        assert np.array_equal(single[key], pooled[key])
+
+
+def test_permutation_detects_lagged_dependence():
+    rng = np.random.default_rng(2)
+    x = rng.normal(size=120)
+    y = np.roll(x, 3) + rng.normal(0, 0.3, size=120)
+    result = permutation_test(x, y, 6, n_perm=500, workers=1)
+    lag3 = list(result['lags']).index(3)
+    assert result['p_values'][lag3] < 0.01
+    assert result['p_max'] < 0.01
+    assert np.argmax(np.abs(result['corr'])) == lag3
+
+
+def main():
+    print("=" * 60)
+    print("significance 行为测试")
+    print("=" * 60)
+
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✓ {name}")
+
+    print("\n✓ 全部通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+window_join 行为测试 - 按天 / 按字符窗口的有序连接与逐对扫描结果一致
+
+运行: python -m pytest -q test_window_join.py  或  python test_window_join.py
+"""
+import numpy as np
+
+from window_join import composite_keys, top_k, window_ranges, window_sums
+
+
+def random_events(rng, count, ordinal_range=(-30, 30), offset_range=5000):
+    """随机事件 (日序号, 偏移, 权重)，按 (日序号, 偏移) 排序"""
+    ordinals = rng.integers(*ordinal_range, size=count)
+    offsets = rng.integers(0, offset_range, size=count)
+    weights = rng.integers(1, 10, size=count).astype(np.float64)
+    order = np.lexsort((offsets, ordinals))
+    return ordinals[order], offsets[order], weights[order]
+
+
+def test_composite_keys_order_with_negative_ordinals():
+    rng = np.random.default_rng(0)
+    ordinals = rng.integers(-1000, 1000, size=500)
+    offsets = rng.integers(0, 1 << 30, size=500)
+    keys = composite_keys(ordinals, offsets)
+
+    assert np.array_equal(np.argsort(keys, kind='stable'), np.lexsort((offsets, ordinals)))
+    assert composite_keys([-1], [0])[0] < composite_keys([0], [0])[0]
+    assert composite_keys([-1], [(1 << 40) - 1])[0] < composite_keys([0], [0])[0]
+
+
+def test_window_ranges_matches_brute_force():
+    rng = np.random.default_rng(1)
+    right = np.sort(rng.integers(0, 100, size=80))
+    lower = rng.integers(-5, 100, size=60)
+    upper = lower + rng.integers(0, 20, size=60)
+
+    for lower_inclusive in (False, True):
+        for upper_inclusive in (False, True):
+            starts, ends = window_ranges(right, lower, upper, lower_inclusive, upper_inclusive)
+            for i in range(len(lower)):
+                above = right >= lower[i] if lower_inclusive else right > lower[i]
+                below = right <= upper[i] if upper_inclusive else right < upper[i]
+                expected = np.flatnonzero(above & below)
+                assert list(range(starts[i], ends[i])) == expected.tolist()
+
+
+def test_empty_window_has_no_range():
+    starts, ends = window_ranges([1, 2, 3], [3], [1])
+    assert ends[0] == starts[0]
+
+
+def test_day_window_matches_pairwise_scan():
+    # 与 find_high_correlation_cases 的按天窗口相同：
+    # 右侧事件 (日序号, 偏移) 在左侧事件之后，且日序号不超过 window 天后
+    rng = np.random.default_rng(2)
+    left_ordinals, left_offsets, _ = random_events(rng, 120)
+    right_ordinals, right_offsets, right_weights = random_events(rng, 200)
+    window = 3
+
+    left_keys = composite_keys(left_ordinals, left_offsets)
+    right_keys = composite_keys(right_ordinals, right_offsets)
+    starts, ends = window_ranges(right_keys, left_keys, composite_keys(left_ordinals + window + 1, 0))
+    totals = window_sums(right_weights, starts, ends)
+
+    for i in range(len(left_keys)):
+        inside = [
+            j for j in range(len(right_keys))
+            if (right_ordinals[j], right_offsets[j]) > (left_ordinals[i], left_offsets[i])
+            and right_ordinals[j] <= left_ordinals[i] + window
+        ]
+        assert list(range(starts[i], ends[i])) == inside
+        assert totals[i] == sum(right_weights[j] for j in inside)
+
+
+def test_char_window_matches_pairwise_scan():
+    # 按字符窗口：left < right < left + window
+    rng = np.random.default_rng(3)
+    left = np.sort(rng.integers(0, 5000, size=150))
+    right = np.sort(rng.integers(0, 5000, size=300))
+    weights = rng.integers(1, 10, size=300).astype(np.float64)
+    window = 100
+
+    starts, ends = window_ranges(right, left, left + window)
+    totals = window_sums(weights, starts, ends)
+
+    for i in range(len(left)):
+        inside = [j for j in range(len(right)) if left[i] < right[j] < left[i] + window]
+        assert list(range(starts[i], ends[i])) == inside
+        assert totals[i] == sum(weights[j] for j in inside)
+
+
+def test_top_k_order_and_mask():
+    scores = np.array([3.0, 9.0, 1.0, 9.0, 5.0])
+    mask = np.array([True, True, True, False, True])
+
+    assert top_k(scores, 2) == [1, 3]
+    assert top_k(scores, 2, mask) == [1, 4]
+    assert top_k(scores, None, mask) == [1, 4, 0, 2]
+
+
+def main():
+    print("=" * 60)
+    print("window_join 行为测试")
+    print("=" * 60)
+
+    for name, func in list(globals().items()):
+        if name.startswith('test_') and callable(func):
+            func()
+            print(f"✓ {name}")
+
+    print("\n✓ 全部通过")
+
+
+if __name__ == "__main__":
+    main()
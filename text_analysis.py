@@ -6,45 +6,52 @@ from pathlib import Path
 from collections import Counter
 import json
 
+from concordance import Concordance
+from corpus_manager import corpus_manager
+from gazetteer import load_gazetteer
+from mention_matrix import MentionMatrix
+from ngram_counter import NGramCounter
+from positional_index import corpus_index
+from suffix_array import SuffixArrayIndex
+
 
 class JiajingTextAnalyzer:
     """嘉靖实录文本分析器"""
 
+    # 默认的大礼议核心人物（gazetteer_data/persons.tsv 中的分组）
+    # 与原先写死的人名表相比：'世宗' 是 明世宗 的别名，与 '明世宗'、'嘉靖帝' 合并计数，
+    # 且 '明世宗' 中的 '世宗' 不再重复计入；'嘉靖' 是年号，实录中几乎都是纪年，不再计为人物
+    CORE_GROUPS = [
+        '大礼议反对派', '大礼议支持派', '大礼议中间派',
+        '皇帝', '皇帝生父'
+    ]
+
     def __init__(self, data_dir="jiajing_data"):
         self.data_dir = Path(data_dir)
+        # 同一目录共享一个语料管理器（内存映射 + 已解码卷 LRU，目录变化时自动重新扫描）
+        self.corpus = corpus_manager(self.data_dir)
+        self._search_index = None
+        self._search_signature = None
 
     def load_volume(self, volume_num):
         """加载指定卷的文本"""
-        filepath = self.data_dir / f"jiajing_shilu_vol{volume_num}.txt"
-
-        if not filepath.exists():
-            return None
-
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return f.read()
+        return self.corpus.text(volume_num)
 
     def load_all_volumes(self):
-        """加载所有已下载的卷"""
-        all_text = []
-        # 只加载单卷文件，排除合并文件
-        volumes = []
-        for f in self.data_dir.glob('jiajing_shilu_vol*.txt'):
-            # 跳过合并文件 (包含"-"的文件名)
-            if '-' in f.stem or 'complete' in f.stem:
-                continue
-            try:
-                vol_num = int(f.stem.replace('jiajing_shilu_vol', ''))
-                volumes.append(vol_num)
-            except ValueError:
-                continue
-        volumes = sorted(volumes)
+        """加载所有已下载的卷（只含单卷文件，排除合并文件）"""
+        return self.corpus.items()
 
-        for vol in volumes:
-            text = self.load_volume(vol)
-            if text:
-                all_text.append((vol, text))
+    def load_all_text(self):
+        """
+        所有已下载卷拼接后的全文（卷间以换行分隔）
+
+        同一会话内重复调用返回同一份字符串，卷文件有变化时才重新拼接
+        """
+        return self.corpus.packed()[0]
 
-        return all_text
+    def core_persons(self):
+        """默认人物名录（CORE_GROUPS 分组的人物，含别名）"""
+        return load_gazetteer().select(types=['persons'], groups=self.CORE_GROUPS)
 
     def basic_stats(self, text):
         """基础统计"""
@@ -66,25 +73,21 @@ class JiajingTextAnalyzer:
 
         Args:
             text: 文本内容
-            name_list: 人物名单列表，如 ['杨廷和', '张璁', '桂萼']
+            name_list: 人物名单列表，如 ['杨廷和', '张璁', '桂萼']；
+                       默认使用人物名录（别名计入规范名，如 张孚敬 → 张璁）
 
         Returns:
             Counter对象，包含每个人名的出现次数
         """
         if name_list is None:
-            # 默认的大礼议核心人物
-            name_list = [
-                '杨廷和', '蒋冕', '毛澄',  # 反对派
-                '张璁', '桂萼', '方献夫',  # 支持派
-                '费宏', '杨一清',  # 中间派
-                '世宗', '明世宗', '嘉靖',  # 皇帝
-                '兴献王', '献皇帝'  # 嘉靖生父
-            ]
+            return Counter(self.core_persons().counts(text))
 
         name_counts = Counter()
 
+        # 全部人名共用一遍扫描（共享倒排索引），计数与 str.count 一致
+        index = corpus_index(text, name_list)
         for name in name_list:
-            count = text.count(name)
+            count = index.count(name)
             if count > 0:
                 name_counts[name] = count
 
@@ -103,13 +106,9 @@ class JiajingTextAnalyzer:
             list: 包含该人物的文本片段
         """
         contexts = []
-        pos = 0
-
-        while True:
-            pos = text.find(person_name, pos)
-            if pos == -1:
-                break
 
+        # 位置取自该文本的共享倒排索引（按内容哈希落盘，重复查询不再扫描）
+        for pos in corpus_index(text, [person_name]).positions(person_name):
             start = max(0, pos - context_length)
             end = min(len(text), pos + len(person_name) + context_length)
 
@@ -122,8 +121,6 @@ class JiajingTextAnalyzer:
                 'after': text[pos + len(person_name):end]
             })
 
-            pos += len(person_name)
-
         return contexts
 
     def extract_dates(self, text):
@@ -145,21 +142,16 @@ class JiajingTextAnalyzer:
         Returns:
             Counter对象
         """
-        # 简单的单字和双字词提取
+        # 简单的2-4字n-gram统计
         # 注意: 这是简化版，真实应用应使用jieba等分词工具
 
         # 过滤常用虚词
-        stop_words = set('之乎者也、。，的了是在有为而於以與其則曰以及')
+        stop_words = '之乎者也、。，的了是在有为而於以與其則曰以及'
 
-        # 提取2-4字的词
-        words = []
-        for length in [2, 3, 4]:
-            for i in range(len(text) - length + 1):
-                word = text[i:i+length]
-                if not any(c in stop_words for c in word):
-                    words.append(word)
-
-        return Counter(words).most_common(top_n)
+        # 流式计数（整数码分块统计，内存固定），结果与 Counter(words).most_common 一致
+        counter = NGramCounter(lengths=(2, 3, 4), stop_chars=stop_words)
+        counter.update(text)
+        return counter.most_common(top_n)
 
     def analyze_volume(self, volume_num):
         """分析单卷"""
@@ -210,7 +202,7 @@ class JiajingTextAnalyzer:
         print(f"{'='*60}\n")
 
         # 合并所有文本
-        all_text = '\n'.join([text for _, text in volumes])
+        all_text = self.load_all_text()
 
         # 总体统计
         stats = self.basic_stats(all_text)
@@ -218,9 +210,10 @@ class JiajingTextAnalyzer:
         for key, value in stats.items():
             print(f"  {key}: {value:,}")
 
-        # 人物统计
+        # 人物统计（人物 × 卷 提及矩阵一次统计，随语料索引落盘）
         print("\n👥 核心人物总提及次数:")
-        person_counts = self.extract_person_names(all_text)
+        matrix = self.mention_matrix()
+        person_counts = Counter({name: count for name, count in matrix.totals().items() if count > 0})
         for name, count in person_counts.most_common(15):
             print(f"  {name}: {count}次")
 
@@ -230,8 +223,7 @@ class JiajingTextAnalyzer:
 
         for person in top_persons:
             print(f"\n  {person}:")
-            for vol, text in volumes[:10]:  # 只显示前10卷
-                count = text.count(person)
+            for vol, count in matrix.volume_counts(person, nonzero=False)[:10]:  # 只显示前10卷
                 if count > 0:
                     bar = '█' * min(count, 50)
                     print(f"    卷{vol:2d}: {bar} ({count})")
@@ -242,6 +234,7 @@ class JiajingTextAnalyzer:
             'volume_range': [volumes[0][0], volumes[-1][0]],
             'stats': stats,
             'persons': dict(person_counts),
+            'person_volumes': {person: dict(matrix.volume_counts(person)) for person in person_counts},
             'keywords': dict(self.keyword_frequency(all_text, top_n=50))
         }
 
@@ -251,28 +244,88 @@ class JiajingTextAnalyzer:
 
         print(f"\n✓ 详细报告已保存: {report_file}")
 
-    def search_keyword(self, keyword, max_results=10):
-        """搜索关键词在所有卷中的出现"""
-        volumes = self.load_all_volumes()
+    def mention_matrix(self, persons=None):
+        """
+        全部已下载卷的 人物 × 卷 / 人物 × 月 提及矩阵
+
+        Args:
+            persons: 人名列表，默认使用人物名录（行为规范名，别名计入规范名）
+
+        Returns:
+            MentionMatrix（按语料哈希 + 人名表保存在位置索引旁，再次调用直接读取）
+        """
+        text, starts, labels = self.corpus.packed()
+        if persons is None:
+            return MentionMatrix.for_entities(text, self.core_persons(), starts, labels)
+        return MentionMatrix.for_text(text, persons, starts, labels)
+
+    def search_index(self):
+        """全部已下载卷拼接后的后缀数组检索（后缀数组按内容哈希落盘，再次打开时内存映射）"""
+        signature = self.corpus.signature()
+        if self._search_index is None or self._search_signature != signature:
+            text, starts, labels = self.corpus.packed()
+            self._search_index = SuffixArrayIndex.for_text(text, starts, labels)
+            self._search_signature = signature
+        return self._search_index
+
+    def search_keyword(self, keyword, max_results=10, context_length=40):
+        """
+        搜索关键词在所有卷中的出现（后缀数组定位，按卷、日期分组）
+
+        Returns:
+            list: [(卷号, 上下文列表), ...]，上下文中的 position 为卷内偏移
+        """
+        index = self.search_index()
+        text = index.text
 
         print(f"\n搜索关键词: '{keyword}'")
         print("=" * 60)
 
         results = []
 
-        for vol, text in volumes:
-            contexts = self.find_person_contexts(text, keyword, context_length=40)
+        for group in index.search(keyword):
+            vol = group['volume']
+            vol_start = group['volume_start']
+            vol_index = group['volume_index']
+            vol_end = (int(index.volume_starts[vol_index + 1]) - 1
+                       if vol_index + 1 < len(index.volume_starts) else len(text))
+
+            if not results or results[-1][0] != vol:
+                results.append((vol, []))
+            contexts = results[-1][1]
+
+            for pos in group['positions']:
+                start = max(vol_start, pos - context_length)
+                end = min(vol_end, pos + len(keyword) + context_length)
+                contexts.append({
+                    'position': pos - vol_start,
+                    'date': group['date'],
+                    'context': text[start:end],
+                    'before': text[start:pos],
+                    'name': keyword,
+                    'after': text[pos + len(keyword):end]
+                })
+
+        for vol, contexts in results:
+            print(f"\n📖 卷{vol} (共{len(contexts)}处):")
+            for i, ctx in enumerate(contexts[:max_results]):
+                print(f"\n  [{i+1}] {ctx['date']} ...{ctx['context']}...")
 
-            if contexts:
-                print(f"\n📖 卷{vol} (共{len(contexts)}处):")
+        print(f"\n✓ 共在{len(results)}卷中找到'{keyword}'")
+        return results
 
-                for i, ctx in enumerate(contexts[:max_results]):
-                    print(f"\n  [{i+1}] ...{ctx['context']}...")
+    def concordance(self, keyword, sort='right', width=30):
+        """
+        关键词的 KWIC 索引行（按左/右侧上下文排序，分页读取）
 
-                results.append((vol, contexts))
+        Args:
+            sort: 'right' / 'left' / 'position'
+            width: 左右各显示的字数
 
-        print(f"\n✓ 共在{len(results)}卷中找到'{keyword}'")
-        return results
+        Returns:
+            Concordance
+        """
+        return Concordance(self.search_index(), keyword, sort=sort, width=width)
 
 
 def main():
@@ -287,9 +340,10 @@ def main():
     print("2. 分析所有已下载的卷")
     print("3. 搜索关键词")
     print("4. 分析特定人物")
+    print("5. 关键词索引行 (KWIC)")
     print("=" * 60)
 
-    choice = input("\n请选择 (1-4): ").strip()
+    choice = input("\n请选择 (1-5): ").strip()
 
     if choice == "1":
         vol = int(input("请输入卷号: "))
@@ -304,8 +358,7 @@ def main():
 
     elif choice == "4":
         person = input("请输入人物名字: ")
-        volumes = analyzer.load_all_volumes()
-        all_text = '\n'.join([text for _, text in volumes])
+        all_text = analyzer.load_all_text()
 
         print(f"\n分析人物: {person}")
         print("=" * 60)
@@ -320,6 +373,28 @@ def main():
         for i, ctx in enumerate(contexts[:5], 1):
             print(f"\n[{i}] ...{ctx['context']}...")
 
+    elif choice == "5":
+        keyword = input("请输入关键词: ")
+        sort = input("排序方式 (right/left/position，默认right): ").strip() or 'right'
+        concordance = analyzer.concordance(keyword, sort=sort)
+        pages = concordance.page_count()
+
+        print(f"\n'{keyword}' 共{len(concordance)}处，{pages}页")
+        number = 0
+        while number < pages:
+            print(concordance.format_page(number))
+            command = input(f"\n第{number + 1}/{pages}页 回车下一页 / 数字跳页 / e 导出TSV / q 退出: ").strip()
+            if command == 'q':
+                break
+            if command == 'e':
+                path = concordance.export_tsv(analyzer.data_dir / f"kwic_{keyword}_{sort}.tsv")
+                print(f"✓ 已导出: {path}")
+                continue
+            if command.isdigit():
+                number = max(0, min(pages - 1, int(command) - 1))
+            else:
+                number += 1
+
     else:
         print("❌ 无效选择")
 
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+时间序列统计 - 滑动统计与全滞后互相关（NumPy向量化）
+
+config.json 的 analysis_parameters 中:
+- moving_average_window_days: 滑动平均窗口（天）
+- lagged_correlation_days: 滞后相关的最大滞后（天）
+
+约定：滞后 lag > 0 表示 y 落后于 x（毒性在前、暴虐在后）
+"""
+import numpy as np
+
+
+# 各粒度一个时间桶约合的天数（用于把"天"换算为桶数）
+DAYS_PER_BUCKET = {'day': 1, 'xun': 10, 'month': 30, 'season': 90, 'year': 360}
+
+
+def days_to_buckets(days, freq):
+    """把以天为单位的窗口换算为指定粒度的桶数（至少为1）"""
+    return max(1, int(round(days / DAYS_PER_BUCKET[freq])))
+
+
+def align(*series):
+    """
+    把若干 (桶编号数组, 数值数组) 对齐到同一段连续桶上，缺失处补0
+
+    返回:
+        (桶编号数组, [数值数组, ...])
+    """
+    series = [(np.asarray(idx), np.asarray(val, dtype=np.float64)) for idx, val in series]
+    non_empty = [idx for idx, _ in series if len(idx)]
+    if not non_empty:
+        return np.zeros(0, dtype=np.int64), [np.zeros(0) for _ in series]
+
+    first = min(idx.min() for idx in non_empty)
+    last = max(idx.max() for idx in non_empty)
+    index = np.arange(first, last + 1, dtype=np.int64)
+
+    aligned = []
+    for idx, val in series:
+        out = np.zeros(len(index))
+        out[idx - first] = val
+        aligned.append(out)
+    return index, aligned
+
+
+def rolling_mean(x, window):
+    """尾随滑动平均（前 window-1 个点按已有长度平均），O(n) 累加和实现"""
+    x = np.asarray(x, dtype=np.float64)
+    csum = np.cumsum(np.insert(x, 0, 0.0))
+    n = len(x)
+    ends = np.arange(1, n + 1)
+    starts = np.maximum(ends - window, 0)
+    return (csum[ends] - csum[starts]) / (ends - starts)
+
+
+def rolling_std(x, window):
+    """尾随滑动标准差（总体标准差）"""
+    x = np.asarray(x, dtype=np.float64)
+    mean = rolling_mean(x, window)
+    mean_sq = rolling_mean(x * x, window)
+    return np.sqrt(np.maximum(mean_sq - mean * mean, 0.0))
+
+
+def rolling_zscore(x, window):
+    """尾随滑动 z 分数：(x - 窗口均值) / 窗口标准差，标准差为0处记0"""
+    x = np.asarray(x, dtype=np.float64)
+    mean = rolling_mean(x, window)
+    std = rolling_std(x, window)
+    return np.divide(x - mean, std, out=np.zeros_like(x), where=std > 0)
+
+
+def cross_correlation(x, y, max_lag=None):
+    """
+    x 与 y 在 -max_lag..max_lag 全部滞后上的皮尔逊互相关（一次FFT）
+
+    corr[lag] = Σ_t x'[t]·y'[t+lag] / (n·σx·σy)，x'、y' 为去均值序列
+
+    参数:
+        x: 一维数组，或二维数组（每行一条序列，与 y 逐行配对）
+        y: 一维数组，或二维数组（每行一条序列，批量计算，供置换检验使用）
+        max_lag: 最大滞后，默认 n-1
+
+    返回:
+        (滞后数组, 相关系数数组)；批量计算时相关系数形状为 (行数, 滞后数)
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = x.shape[-1]
+    if n == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(np.broadcast_shapes(x.shape, y.shape)[:-1] + (0,))
+
+    max_lag = n - 1 if max_lag is None else min(int(max_lag), n - 1)
+
+    xc = x - x.mean(axis=-1, keepdims=True)
+    yc = y - y.mean(axis=-1, keepdims=True)
+
+    size = 1 << (2 * n - 1).bit_length()
+    spectrum = np.conj(np.fft.rfft(xc, size, axis=-1)) * np.fft.rfft(yc, size, axis=-1)
+    cc = np.fft.irfft(spectrum, size, axis=-1)
+
+    # cc[k] = Σ x[t]·y[t+k]；负滞后位于数组尾部
+    cc = np.concatenate([cc[..., size - max_lag:], cc[..., :max_lag + 1]], axis=-1)
+
+    denom = (n * np.sqrt(np.mean(xc * xc, axis=-1, keepdims=True))
+             * np.sqrt(np.mean(yc * yc, axis=-1, keepdims=True)))
+    corr = np.divide(cc, denom, out=np.zeros_like(cc), where=denom > 0)
+    return np.arange(-max_lag, max_lag + 1), corr
+
+
+def lead_lag_profile(x, y, max_lag, window=1):
+    """
+    先做滑动平均平滑，再计算全滞后互相关，并给出峰值滞后
+
+    返回:
+        Dict: {
+            "lags": 滞后数组, "corr": 相关系数数组,
+            "best_lag": |相关| 最大的滞后, "best_corr": 对应相关系数,
+            "zero_lag_corr": 同期相关系数
+        }
+    """
+    if window > 1:
+        x = rolling_mean(x, window)
+        y = rolling_mean(y, window)
+
+    lags, corr = cross_correlation(x, y, max_lag)
+    if len(corr) == 0:
+        return {'lags': lags, 'corr': corr, 'best_lag': 0, 'best_corr': 0.0, 'zero_lag_corr': 0.0}
+
+    best = int(np.argmax(np.abs(corr)))
+    return {
+        'lags': lags,
+        'corr': corr,
+        'best_lag': int(lags[best]),
+        'best_corr': float(corr[best]),
+        'zero_lag_corr': float(corr[len(lags) // 2])
+    }
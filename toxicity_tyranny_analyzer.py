@@ -7,24 +7,55 @@ Toxicity-Tyranny Correlation Analyzer
 嘉靖帝的丹药摄入（重金属中毒）与政治暴虐行为存在时间滞后相关性
 """
 import sys
-import re
 from pathlib import Path
 from collections import defaultdict
 import json
 
+import numpy as np
+
+from date_index import UNKNOWN_ORDINAL, DateIndex
+from event_store import EventStore, build_page_index
+from hit_table import HitTable, bucket_label
+from lexicon import DEFAULT_CONFIG_FILE, load_lexicon
+from positional_index import corpus_index
+from significance import lagged_significance
+from timeseries_stats import align, days_to_buckets, lead_lag_profile, rolling_mean, rolling_zscore
+from window_join import composite_keys, top_k, window_ranges, window_sums
+
 if hasattr(sys.stdout, 'reconfigure'):
     sys.stdout.reconfigure(encoding='utf-8')
 if hasattr(sys.stderr, 'reconfigure'):
     sys.stderr.reconfigure(encoding='utf-8')
 
 
+# 显著性检验的默认重抽次数（交互运行时控制在几秒内；正式结论可调大）
+DEFAULT_PERMUTATIONS = 1000
+DEFAULT_BOOTSTRAPS = 500
+
+# 异常月份：相对此前 12 个月（含当月）的滑动 z 分数不低于阈值
+ZSCORE_WINDOW_MONTHS = 12
+ZSCORE_THRESHOLD = 3.0
+
+
 class ToxicityTyrannyAnalyzer:
     """毒性-暴虐相关性分析器"""
 
-    def __init__(self, data_file):
+    def __init__(self, data_file, config_file=DEFAULT_CONFIG_FILE):
         self.data_file = Path(data_file)
         self.content = ""
         self.events = []
+
+        # 词表统一来自 config.json，与月度分析器共用同一个匹配自动机
+        self.lexicon = load_lexicon(config_file)
+        self.matcher = self.lexicon.compile()
+        self._hits = None
+        self._date_index = None
+        self._page_index = None
+        self._hit_table = None
+        self.lead_lag = None
+        self.significance = None
+        self.high_corr_count = None
+
         self.load_data()
 
     def load_data(self):
@@ -39,66 +70,171 @@ class ToxicityTyrannyAnalyzer:
         print(f"✓ 已加载数据: {len(self.content):,}字")
         return True
 
-    def extract_toxicity_indicators(self):
+    def lexicon_hits(self):
+        """全文关键词命中 [(位置, 关键词ID), ...]，只扫描一遍并缓存，X轴/Y轴提取共用"""
+        if self._hits is None:
+            # 位置取自全语料共享的倒排索引（已落盘时直接映射，不再扫描文本）
+            self._hits = corpus_index(self.content, self.matcher.keywords).hits(self.matcher.keywords)
+        return self._hits
+
+    def date_index(self):
+        """全文日期索引（偏移 → 日序号），只构建一次"""
+        if self._date_index is None:
+            self._date_index = DateIndex.build(self.content)
+        return self._date_index
+
+    def page_index(self):
+        """全文页码索引（偏移 → 点校本页码），只构建一次"""
+        if self._page_index is None:
+            self._page_index = build_page_index(self.content)
+        return self._page_index
+
+    def hit_table(self):
+        """带日期的命中表（复用 lexicon_hits 的结果，不再扫描文本）"""
+        if self._hit_table is None:
+            self._hit_table = HitTable.from_hits(
+                self.lexicon_hits(), self.matcher, self.date_index()
+            )
+        return self._hit_table
+
+    def lead_lag_analysis(self):
         """
-        提取X轴：重金属摄入/修道活动指标
+        毒性→暴虐 全滞后互相关（日度、月度序列各一次FFT），
+        并列出月度序列中滑动 z 分数超过阈值的异常月份
 
-        返回: [(位置, 日期, 关键词, 权重), ...]
+        滑动平均窗口与最大滞后取自 config.json 的 analysis_parameters
         """
-        print("\n" + "="*60)
-        print("第一步：构建重金属摄入指数（X轴）")
-        print("="*60)
-
-        # 定义关键词及其权重
-        keywords = {
-            # 直接代理（高权重）
-            '进丹': 10, '赐药': 10, '红铅': 10, '秋石': 10,
-            '陶仲文': 8, '邵元节': 8,
-
-            # 间接代理（中权重 - 修道活动）
-            '醮': 5, '祷': 5, '祀': 3, '斋': 3, '雷坛': 5,
-            '建醮': 7, '祷祀': 6,
-
-            # 病理反应（中毒症状）
-            '不豫': 4, '甚至': 2, '心悸': 6, '不能视朝': 5
-        }
+        params = self.lexicon.parameters
+        window_days = params.get('moving_average_window_days', 30)
+        lag_days = params.get('lagged_correlation_days', 30)
+        table = self.hit_table()
+
+        print(f"\n📈 滞后相关（滑动平均{window_days}天，最大滞后{lag_days}天）:\n")
+
+        profiles = {}
+        for freq, label, unit in (('day', '日度', '天'), ('month', '月度', '月')):
+            buckets, (tox, tyr) = align(table.resample('toxicity', freq), table.resample('tyranny', freq))
+            profile = lead_lag_profile(
+                tox, tyr,
+                max_lag=days_to_buckets(lag_days, freq),
+                window=days_to_buckets(window_days, freq)
+            )
+            profiles[freq] = profile
+            print(f"  [{label}] 序列长度={len(tox)}  同期相关={profile['zero_lag_corr']:.3f}  "
+                  f"峰值滞后={profile['best_lag']:+d}{unit} (r={profile['best_corr']:.3f})")
+
+            if freq == 'month':
+                profile['spikes'] = {
+                    'toxicity': self._spikes(buckets, tox, freq),
+                    'tyranny': self._spikes(buckets, tyr, freq)
+                }
+
+        spikes = profiles.get('month', {}).get('spikes', {})
+        for category, label in (('toxicity', '毒性'), ('tyranny', '暴虐')):
+            items = spikes.get(category, [])
+            print(f"\n  [{label}异常月份] z≥{ZSCORE_THRESHOLD:g}（前{ZSCORE_WINDOW_MONTHS}个月滑动）共{len(items)}个")
+            for item in items[:5]:
+                print(f"    {item['label']:<16} 分数={item['value']:<8g} z={item['zscore']:.2f}")
+
+        return profiles
+
+    @staticmethod
+    def _spikes(buckets, values, freq, window=ZSCORE_WINDOW_MONTHS, threshold=ZSCORE_THRESHOLD):
+        """
+        滑动 z 分数不低于阈值的时间桶（按 z 分数降序）
 
-        toxicity_events = []
+        返回:
+            [{"label": 桶标签, "value": 分数, "zscore": z 分数}, ...]
+        """
+        z = rolling_zscore(values, window)
+        idx = np.flatnonzero(z >= threshold)
+        idx = idx[np.argsort(-z[idx], kind='stable')]
+        return [
+            {'label': bucket_label(freq, buckets[i]), 'value': float(values[i]), 'zscore': float(z[i])}
+            for i in idx.tolist()
+        ]
+
+    def _smoothed_series(self, freq):
+        """对齐并按 config.json 窗口做滑动平均后的 (毒性, 暴虐) 序列及最大滞后"""
+        params = self.lexicon.parameters
+        window = days_to_buckets(params.get('moving_average_window_days', 30), freq)
+        max_lag = days_to_buckets(params.get('lagged_correlation_days', 30), freq)
+
+        table = self.hit_table()
+        _, (tox, tyr) = align(table.resample('toxicity', freq), table.resample('tyranny', freq))
+        if window > 1:
+            tox = rolling_mean(tox, window)
+            tyr = rolling_mean(tyr, window)
+        return tox, tyr, max_lag
+
+    def lead_lag_significance(self, n_perm=DEFAULT_PERMUTATIONS, n_boot=DEFAULT_BOOTSTRAPS,
+                              seed=0, workers=None):
+        """
+        滞后相关的显著性：循环移位置换检验 p 值 + 分块自助法 95% 置信区间
 
-        for keyword, weight in keywords.items():
-            pos = 0
-            count = 0
+        参数:
+            n_perm: 置换次数
+            n_boot: 自助重抽次数
+            seed: 随机种子（固定种子结果可复现）
+            workers: 进程数，默认CPU核数
+        """
+        print(f"\n🎲 显著性检验（置换{n_perm}次，分块自助{n_boot}次，seed={seed}）:\n")
+
+        results = {}
+        for freq, label, unit in (('day', '日度', '天'), ('month', '月度', '月')):
+            tox, tyr, max_lag = self._smoothed_series(freq)
+            if len(tox) < 3:
+                print(f"  [{label}] 序列过短，跳过")
+                continue
+
+            result = lagged_significance(tox, tyr, max_lag, n_perm=n_perm, n_boot=n_boot,
+                                         seed=seed, workers=workers)
+            best = int(abs(result['corr']).argmax())
+            result['best'] = best
+            results[freq] = result
+
+            print(f"  [{label}] 峰值滞后={int(result['lags'][best]):+d}{unit}  "
+                  f"r={result['corr'][best]:.3f}  "
+                  f"95%CI=[{result['ci_low'][best]:.3f}, {result['ci_high'][best]:.3f}]  "
+                  f"p={result['p_values'][best]:.4f}  全滞后校正p={result['p_max']:.4f}")
+
+        self.significance = results
+        return results
 
-            while True:
-                pos = self.content.find(keyword, pos)
-                if pos == -1:
-                    break
+    def _extract_category(self, category, value_key, context_length=200):
+        """
+        提取某一类别的全部命中事件（列式事件表），并打印各关键词的命中次数
 
-                # 提取上下文
-                start = max(0, pos - 200)
-                end = min(len(self.content), pos + len(keyword) + 200)
-                context = self.content[start:end]
+        参数:
+            category: 'toxicity' 或 'tyranny'
+            value_key: 事件中存放权重的字段名（'weight' 或 'score'）
+            context_length: 上下文前后各取的字数（访问 event['context'] 时才切片）
+        """
+        events = EventStore.from_hits(
+            self.content, self.lexicon_hits(), self.matcher, category,
+            date_index=self.date_index(), page_index=self.page_index(),
+            value_key=value_key, context_length=context_length
+        )
 
-                # 提取日期
-                date_match = re.search(r'(嘉靖\w+年\w+月\w+)', context)
-                date = date_match.group(1) if date_match else "未知日期"
+        label = '权重' if value_key == 'weight' else '分数'
+        counts = events.keyword_counts()
+        for kid, weight in self.matcher.categories[category].items():
+            if counts.get(kid, 0) > 0:
+                print(f"  [{self.matcher.keywords[kid]}]: {counts[kid]}次 ({label}={weight})")
 
-                toxicity_events.append({
-                    'position': pos,
-                    'date': date,
-                    'keyword': keyword,
-                    'weight': weight,
-                    'context': context
-                })
+        return events
 
-                count += 1
-                pos += len(keyword)
+    def extract_toxicity_indicators(self):
+        """
+        提取X轴：重金属摄入/修道活动指标
 
-            if count > 0:
-                print(f"  [{keyword}]: {count}次 (权重={weight})")
+        返回: EventStore，每个事件可按 event['position'] / ['date'] / ['keyword'] / ['weight'] 访问
+        """
+        print("\n" + "="*60)
+        print("第一步：构建重金属摄入指数（X轴）")
+        print("="*60)
 
-        # 按位置排序
-        toxicity_events.sort(key=lambda x: x['position'])
+        toxicity_events = self._extract_category('toxicity', 'weight')
 
         print(f"\n✓ 共找到 {len(toxicity_events)} 个重金属/修道活动指标")
         return toxicity_events
@@ -107,69 +243,26 @@ class ToxicityTyrannyAnalyzer:
         """
         提取Y轴：政治暴虐指标
 
-        返回: [(位置, 日期, 关键词, 暴虐分数), ...]
+        返回: EventStore，每个事件可按 event['position'] / ['date'] / ['keyword'] / ['score'] 访问
         """
         print("\n" + "="*60)
         print("第二步：构建政治暴虐指数（Y轴）")
         print("="*60)
 
-        # 定义关键词及其暴虐分数
-        keywords = {
-            # 一级暴虐（致死/肉体伤害 - 10分）
-            '廷杖': 10, '毙于杖下': 10, '弃市': 10, '斩': 10,
-            '绞': 10, '下诏狱': 9, '锦衣卫': 7,
-
-            # 二级暴虐（政治清洗 - 5分）
-            '削籍': 5, '为民': 4, '致仕': 2, '褫夺': 6, '切责': 5,
-            '罢黜': 4, '贬谪': 5, '戍边': 6,
-
-            # 三级暴虐（情绪宣泄 - 2分）
-            '震怒': 3, '大怒': 4, '掷表': 3, '叱退': 2
-        }
-
-        tyranny_events = []
-
-        for keyword, score in keywords.items():
-            pos = 0
-            count = 0
-
-            while True:
-                pos = self.content.find(keyword, pos)
-                if pos == -1:
-                    break
-
-                # 提取上下文
-                start = max(0, pos - 200)
-                end = min(len(self.content), pos + len(keyword) + 200)
-                context = self.content[start:end]
-
-                # 提取日期
-                date_match = re.search(r'(嘉靖\w+年\w+月\w+)', context)
-                date = date_match.group(1) if date_match else "未知日期"
-
-                tyranny_events.append({
-                    'position': pos,
-                    'date': date,
-                    'keyword': keyword,
-                    'score': score,
-                    'context': context
-                })
-
-                count += 1
-                pos += len(keyword)
-
-            if count > 0:
-                print(f"  [{keyword}]: {count}次 (分数={score})")
-
-        # 按位置排序
-        tyranny_events.sort(key=lambda x: x['position'])
+        tyranny_events = self._extract_category('tyranny', 'score')
 
         print(f"\n✓ 共找到 {len(tyranny_events)} 个暴虐事件指标")
         return tyranny_events
 
-    def analyze_correlation(self, toxicity_events, tyranny_events):
+    def analyze_correlation(self, toxicity_events, tyranny_events,
+                            n_perm=DEFAULT_PERMUTATIONS, n_boot=DEFAULT_BOOTSTRAPS, seed=0):
         """
         分析X与Y的相关性
+
+        参数:
+            n_perm: 显著性检验的置换次数
+            n_boot: 置信区间的分块自助重抽次数
+            seed: 随机种子
         """
         print("\n" + "="*60)
         print("第三步：相关性分析")
@@ -179,17 +272,23 @@ class ToxicityTyrannyAnalyzer:
             print("⚠️ 数据不足，无法进行相关性分析")
             return
 
-        # 按日期分组
+        # 按日期分组：有日序号的按日序号（公历日期，时间先后），
+        # 其余按上下文中的日期字样或"未知日期"，排在最后
+        def date_key(event):
+            if event['ordinal'] != UNKNOWN_ORDINAL:
+                return (0, event['ordinal'])
+            return (1, event['date'])
+
         toxicity_by_date = defaultdict(list)
         for event in toxicity_events:
-            toxicity_by_date[event['date']].append(event)
+            toxicity_by_date[date_key(event)].append(event)
 
         tyranny_by_date = defaultdict(list)
         for event in tyranny_events:
-            tyranny_by_date[event['date']].append(event)
+            tyranny_by_date[date_key(event)].append(event)
 
         # 计算每个日期的累积分数
-        print("\n📊 按日期的毒性-暴虐分数对照:\n")
+        print("\n📊 按日期的毒性-暴虐分数对照（日期为公历，由干支推算）:\n")
 
         all_dates = sorted(set(list(toxicity_by_date.keys()) + list(tyranny_by_date.keys())))
 
@@ -197,10 +296,11 @@ class ToxicityTyrannyAnalyzer:
         for date in all_dates:
             tox_score = sum(e['weight'] for e in toxicity_by_date.get(date, []))
             tyr_score = sum(e['score'] for e in tyranny_by_date.get(date, []))
+            dated, value = date
 
             if tox_score > 0 or tyr_score > 0:
                 results.append({
-                    'date': date,
+                    'date': bucket_label('day', value) if dated == 0 else value,
                     'toxicity': tox_score,
                     'tyranny': tyr_score,
                     'tox_events': len(toxicity_by_date.get(date, [])),
@@ -217,58 +317,89 @@ class ToxicityTyrannyAnalyzer:
         if len(results) > 20:
             print(f"\n... 还有 {len(results) - 20} 条记录未显示")
 
+        # 全滞后互相关
+        self.lead_lag = self.lead_lag_analysis()
+        self.lead_lag_significance(n_perm=n_perm, n_boot=n_boot, seed=seed)
+
         return results
 
-    def find_high_correlation_cases(self, toxicity_events, tyranny_events, window=100000):
+    def find_high_correlation_cases(self, toxicity_events, tyranny_events, window_days=None,
+                                    window_chars=None, top=100, min_weight=5, min_total=5):
         """
-        查找高度相关的案例
+        查找高度相关的案例：毒性事件之后窗口内暴虐总分高的情形
 
-        window: 位置窗口大小（字符数），用于判断事件的"时间接近度"
+        参数:
+            window_days: 时间窗口（天），默认取 config.json 的 lagged_correlation_days；
+                         窗口为同日稍后至 window_days 天后
+            window_chars: 改用字符距离窗口（给出时忽略 window_days）
+            top: 保留暴虐总分最高的前 top 个案例，None 为全部
+            min_weight / min_total: 毒性事件权重、窗口内暴虐总分的下限
+
+        两侧按键排序后做窗口连接（见 window_join），复杂度 O((N+M)·log M)
         """
         print("\n" + "="*60)
         print("第四步：高度相关案例挖掘")
         print("="*60)
 
-        print(f"\n⏱️ 时间窗口: {window:,}字符 (约等于几天到几周)\n")
+        if window_chars is not None:
+            unit = '字符'
+            window = window_chars
+            tox = toxicity_events
+            tyr = tyranny_events.take(np.argsort(tyranny_events.offsets, kind='stable'))
+            tox_keys = tox.offsets.astype(np.int64)
+            tyr_keys = tyr.offsets.astype(np.int64)
+            # 与原先一致：tox_pos < tyr_pos < tox_pos + window
+            starts, ends = window_ranges(tyr_keys, tox_keys, tox_keys + window)
+        else:
+            unit = '天'
+            window = window_days
+            if window is None:
+                window = self.lexicon.parameters.get('lagged_correlation_days', 30)
+            # 日期未知的事件不参与按天连接
+            tox = toxicity_events.take(toxicity_events.ordinals != UNKNOWN_ORDINAL)
+            tyr = tyranny_events.take(tyranny_events.ordinals != UNKNOWN_ORDINAL)
+            tyr = tyr.take(np.lexsort((tyr.offsets, tyr.ordinals)))
+            tox_ordinals = tox.ordinals.astype(np.int64)
+            tox_keys = composite_keys(tox_ordinals, tox.offsets)
+            tyr_keys = composite_keys(tyr.ordinals, tyr.offsets)
+            # (日序号, 偏移) 在毒性事件之后，且日序号不超过 window 天后
+            starts, ends = window_ranges(tyr_keys, tox_keys,
+                                         composite_keys(tox_ordinals + window + 1, 0))
+
+        print(f"\n⏱️ 时间窗口: {window:,}{unit}\n")
+
+        totals = window_sums(tyr.weights, starts, ends)
+        qualified = (ends > starts) & (tox.weights >= min_weight) & (totals >= min_total)
 
         high_corr_cases = []
-
-        # 对每个修道活动，查找其后window范围内的暴虐事件
-        for tox_event in toxicity_events:
-            tox_pos = tox_event['position']
-
-            # 查找窗口内的暴虐事件
-            nearby_tyranny = [
-                tyr for tyr in tyranny_events
-                if tox_pos < tyr['position'] < tox_pos + window
-            ]
-
-            if nearby_tyranny:
-                total_tyranny_score = sum(t['score'] for t in nearby_tyranny)
-
-                # 只记录高分案例
-                if tox_event['weight'] >= 5 and total_tyranny_score >= 5:
-                    high_corr_cases.append({
-                        'tox_event': tox_event,
-                        'tyranny_events': nearby_tyranny,
-                        'total_tyranny': total_tyranny_score,
-                        'distance': nearby_tyranny[0]['position'] - tox_pos
-                    })
-
-        # 按暴虐总分排序
-        high_corr_cases.sort(key=lambda x: x['total_tyranny'], reverse=True)
-
-        print(f"🔍 发现 {len(high_corr_cases)} 个高相关性案例\n")
+        for i in top_k(totals, top, qualified):
+            tox_event = tox[i]
+            nearby_tyranny = list(tyr[starts[i]:ends[i]])
+            if unit == '天':
+                distance = nearby_tyranny[0]['ordinal'] - tox_event['ordinal']
+            else:
+                distance = nearby_tyranny[0]['position'] - tox_event['position']
+            total = float(totals[i])
+            high_corr_cases.append({
+                'tox_event': tox_event,
+                'tyranny_events': nearby_tyranny,
+                'total_tyranny': int(total) if total.is_integer() else total,
+                'distance': int(distance),
+                'distance_unit': unit
+            })
+
+        self.high_corr_count = int(qualified.sum())
+        print(f"🔍 发现 {self.high_corr_count} 个高相关性案例\n")
 
         # 显示前10个案例
         for i, case in enumerate(high_corr_cases[:10], 1):
-            tox = case['tox_event']
+            tox_event = case['tox_event']
             print(f"【案例 {i}】")
-            print(f"  毒性事件: [{tox['keyword']}] (权重={tox['weight']}) @ {tox['date']}")
+            print(f"  毒性事件: [{tox_event['keyword']}] (权重={tox_event['weight']}) @ {tox_event['date']}")
             print(f"  随后发生的暴虐事件 ({len(case['tyranny_events'])}个，总分={case['total_tyranny']}):")
-            for tyr in case['tyranny_events'][:3]:  # 只显示前3个
-                print(f"    - [{tyr['keyword']}] (分数={tyr['score']}) @ {tyr['date']}")
-            print(f"  时间间隔: 约{case['distance']:,}字符")
+            for tyr_event in case['tyranny_events'][:3]:  # 只显示前3个
+                print(f"    - [{tyr_event['keyword']}] (分数={tyr_event['score']}) @ {tyr_event['date']}")
+            print(f"  时间间隔: 约{case['distance']:,}{unit}")
             print()
 
         return high_corr_cases
@@ -287,20 +418,51 @@ class ToxicityTyrannyAnalyzer:
             },
             'toxicity_summary': {
                 'total_events': len(toxicity_events),
-                'total_weight': sum(e['weight'] for e in toxicity_events),
-                'keywords': list(set(e['keyword'] for e in toxicity_events))
+                'total_weight': toxicity_events.total(),
+                'keywords': [self.matcher.keywords[kid] for kid in toxicity_events.keyword_counts()]
             },
             'tyranny_summary': {
                 'total_events': len(tyranny_events),
-                'total_score': sum(e['score'] for e in tyranny_events),
-                'keywords': list(set(e['keyword'] for e in tyranny_events))
+                'total_score': tyranny_events.total(),
+                'keywords': [self.matcher.keywords[kid] for kid in tyranny_events.keyword_counts()]
             },
             'correlation': {
                 'date_count': len(correlation_results) if correlation_results else 0,
-                'high_corr_cases': len(high_corr_cases)
+                'high_corr_cases': (self.high_corr_count if self.high_corr_count is not None
+                                    else len(high_corr_cases))
             }
         }
 
+        if self.lead_lag:
+            report['correlation']['lead_lag'] = {
+                freq: {
+                    'best_lag': profile['best_lag'],
+                    'best_corr': round(profile['best_corr'], 4),
+                    'zero_lag_corr': round(profile['zero_lag_corr'], 4)
+                }
+                for freq, profile in self.lead_lag.items()
+            }
+            spikes = self.lead_lag.get('month', {}).get('spikes')
+            if spikes:
+                report['correlation']['monthly_spikes'] = {
+                    category: [dict(item, zscore=round(item['zscore'], 2)) for item in items]
+                    for category, items in spikes.items()
+                }
+
+        if self.significance:
+            report['correlation']['significance'] = {
+                freq: {
+                    'best_lag': int(result['lags'][result['best']]),
+                    'p_value': round(float(result['p_values'][result['best']]), 4),
+                    'p_max': round(float(result['p_max']), 4),
+                    'ci_low': round(float(result['ci_low'][result['best']]), 4),
+                    'ci_high': round(float(result['ci_high'][result['best']]), 4),
+                    'lags': result['lags'].tolist(),
+                    'p_values': [round(float(p), 4) for p in result['p_values']]
+                }
+                for freq, result in self.significance.items()
+            }
+
         # 保存JSON报告
         json_file = Path("toxicity_tyranny_analysis.json")
         with open(json_file, 'w', encoding='utf-8') as f:
@@ -322,15 +484,26 @@ class ToxicityTyrannyAnalyzer:
 
             f.write("## X轴：重金属摄入/修道活动指数\n\n")
             f.write(f"- 总事件数: {len(toxicity_events)}\n")
-            f.write(f"- 累积权重: {sum(e['weight'] for e in toxicity_events)}\n")
-            f.write(f"- 关键词: {', '.join(set(e['keyword'] for e in toxicity_events))}\n\n")
+            f.write(f"- 累积权重: {report['toxicity_summary']['total_weight']}\n")
+            f.write(f"- 关键词: {', '.join(report['toxicity_summary']['keywords'])}\n\n")
 
             f.write("## Y轴：政治暴虐指数\n\n")
             f.write(f"- 总事件数: {len(tyranny_events)}\n")
-            f.write(f"- 累积分数: {sum(e['score'] for e in tyranny_events)}\n")
-            f.write(f"- 关键词: {', '.join(set(e['keyword'] for e in tyranny_events))}\n\n")
+            f.write(f"- 累积分数: {report['tyranny_summary']['total_score']}\n")
+            f.write(f"- 关键词: {', '.join(report['tyranny_summary']['keywords'])}\n\n")
+
+            spikes = report['correlation'].get('monthly_spikes')
+            if spikes:
+                f.write("## 异常月份\n\n")
+                f.write(f"相对此前{ZSCORE_WINDOW_MONTHS}个月的滑动 z 分数 ≥ {ZSCORE_THRESHOLD:g}：\n\n")
+                for category, label in (('toxicity', '毒性'), ('tyranny', '暴虐')):
+                    items = spikes.get(category, [])
+                    months = '、'.join(f"{item['label']}(z={item['zscore']})" for item in items[:10])
+                    f.write(f"- {label}: {months or '无'}\n")
+                f.write("\n")
 
             f.write("## 高度相关案例\n\n")
+            f.write("日期为公历，由实录干支推算；无法推算的取上下文中的纪年字样或记为未知日期。\n\n")
             for i, case in enumerate(high_corr_cases[:10], 1):
                 tox = case['tox_event']
                 f.write(f"### 案例 {i}\n\n")
@@ -338,7 +511,7 @@ class ToxicityTyrannyAnalyzer:
                 f.write(f"**随后的暴虐事件** ({len(case['tyranny_events'])}个，总分={case['total_tyranny']}):\n\n")
                 for tyr in case['tyranny_events']:
                     f.write(f"- [{tyr['keyword']}] (分数={tyr['score']}) @ {tyr['date']}\n")
-                f.write(f"\n**时间间隔**: 约{case['distance']:,}字符\n\n")
+                f.write(f"\n**时间间隔**: 约{case['distance']:,}{case['distance_unit']}\n\n")
                 f.write("---\n\n")
 
         print(f"✓ Markdown报告已保存: {md_file}")
@@ -367,7 +540,7 @@ def main():
     correlation_results = analyzer.analyze_correlation(toxicity_events, tyranny_events)
 
     # 第四步：高度相关案例挖掘
-    high_corr_cases = analyzer.find_high_correlation_cases(toxicity_events, tyranny_events, window=50000)
+    high_corr_cases = analyzer.find_high_correlation_cases(toxicity_events, tyranny_events)
 
     # 第五步：生成报告
     report = analyzer.generate_report(toxicity_events, tyranny_events, correlation_results, high_corr_cases)